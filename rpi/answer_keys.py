@@ -0,0 +1,213 @@
+"""
+Answer key registry for Raspberry Pi server
+Stores versioned answer keys and caches compiled matchers
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.grading.similarity_matcher import SimilarityMatcher
+
+
+KEY_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class AnswerKeyRegistry:
+    """
+    Versioned answer keys persisted as JSON files
+    Each key id maps to an immutable list of versions
+    """
+
+    def __init__(self, folder: Path):
+        """
+        Initialize registry
+
+        Args:
+            folder: Folder to store key files in
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key_id: str) -> Path:
+        """Path of the file holding all versions of a key"""
+        return self.folder / f"{key_id}.json"
+
+    def _read(self, key_id: str) -> Optional[Dict]:
+        """Load key file or None"""
+        if not KEY_ID_PATTERN.match(key_id):
+            return None
+        path = self._path(key_id)
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def create(self, answers: List[str], name: str = None,
+               key_id: str = None) -> Dict:
+        """
+        Create a key, or add a new version if key_id already exists
+
+        Args:
+            answers: List of correct answers
+            name: Human-readable name (e.g. "Biology midterm")
+            key_id: Optional id; generated if omitted
+
+        Returns:
+            Dict: Stored version record
+        """
+        if not isinstance(answers, list) or not answers:
+            raise ValueError("answers must be a non-empty list")
+        if not all(isinstance(a, str) for a in answers):
+            raise ValueError("answers must be strings")
+        SimilarityMatcher(answers)  # Raises ValueError for a key with no gradable words
+
+        key_id = key_id or uuid.uuid4().hex[:12]
+        if not KEY_ID_PATTERN.match(key_id):
+            raise ValueError("key_id may only contain letters, digits, '-' and '_'")
+
+        with self._lock:
+            data = self._read(key_id) or {"key_id": key_id, "versions": []}
+            data["name"] = name or data.get("name") or key_id
+
+            record = {
+                "version": len(data["versions"]) + 1,
+                "answers": answers,
+                "created": datetime.now().isoformat()
+            }
+            data["versions"].append(record)
+
+            path = self._path(key_id)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, path)
+
+        return self._record(data, record)
+
+    def get(self, key_id: str, version: int = None) -> Optional[Dict]:
+        """
+        Fetch a key version
+
+        Args:
+            key_id: Key id
+            version: Version number (latest if omitted)
+
+        Returns:
+            Dict or None if not found
+        """
+        data = self._read(key_id)
+        if data is None or not data["versions"]:
+            return None
+
+        if version is None:
+            return self._record(data, data["versions"][-1])
+
+        for record in data["versions"]:
+            if record["version"] == version:
+                return self._record(data, record)
+        return None
+
+    def list(self) -> List[Dict]:
+        """List all keys with their latest version"""
+        keys = []
+        for path in sorted(self.folder.glob("*.json")):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            latest = data["versions"][-1]
+            keys.append({
+                "key_id": data["key_id"],
+                "name": data.get("name", data["key_id"]),
+                "latest_version": latest["version"],
+                "questions": len(latest["answers"]),
+                "created": latest["created"]
+            })
+        return keys
+
+    @staticmethod
+    def _record(data: Dict, record: Dict) -> Dict:
+        """Flatten a version record with its key metadata"""
+        return {
+            "key_id": data["key_id"],
+            "name": data.get("name", data["key_id"]),
+            "version": record["version"],
+            "answers": record["answers"],
+            "created": record["created"]
+        }
+
+
+class MatcherCache:
+    """
+    Size-bounded LRU cache of compiled SimilarityMatchers
+    Repeated grading against the same key skips vectorizer fitting
+    """
+
+    def __init__(self, max_size: int = 16):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Maximum number of compiled matchers kept
+        """
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def inline_key(answers: List[str]) -> Hashable:
+        """Cache key for an answer key sent inline with a request"""
+        digest = hashlib.sha1(json.dumps(answers).encode('utf-8')).hexdigest()
+        return ("inline", digest)
+
+    def get(self, cache_key: Hashable, answers: List[str]) -> SimilarityMatcher:
+        """
+        Return cached matcher, compiling it on a miss
+
+        Args:
+            cache_key: e.g. (key_id, version) or inline_key(answers)
+            answers: Answers used to compile the matcher on a miss
+
+        Returns:
+            SimilarityMatcher
+        """
+        with self._lock:
+            matcher = self._cache.get(cache_key)
+            if matcher is not None:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return matcher
+            self.misses += 1
+
+        # Compile outside the lock; a concurrent duplicate build is harmless
+        matcher = SimilarityMatcher(answers)
+
+        with self._lock:
+            self._cache[cache_key] = matcher
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return matcher
+
+    def stats(self) -> Dict:
+        """Cache statistics"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
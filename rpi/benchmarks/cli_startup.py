@@ -0,0 +1,152 @@
+"""
+CLI cold-start benchmark: wall time and import breakdown per subcommand
+
+Each CLI invocation runs in a fresh interpreter with `python -X importtime`
+and is repeated; the report has the median wall time, the total time spent
+importing, the slowest top-level imports and which heavy modules (torch,
+transformers, scikit-learn, OpenCV) were loaded at all. Subcommands that
+need no model (help, camera listing, argument errors) should not import
+torch or transformers.
+
+With --baseline REV the same commands also run against a `git archive` of
+that revision, to show the change side by side.
+
+Usage (from rpi/):
+    python3 benchmarks/cli_startup.py
+    python3 benchmarks/cli_startup.py --baseline HEAD~1 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+
+# CLI arguments per subcommand; all of them exit before grading anything
+SUBCOMMANDS = {
+    "help": ["--help"],
+    "list_cameras": ["--list-cameras"],
+    "missing_answer_key": ["--image", "missing.jpg"],
+    "missing_watch_folder": ["--watch", "/nonexistent", "--answers", "A"],
+    "missing_template": ["--image", "missing.jpg", "--answers", "A", "--template", "nonexistent"],
+}
+
+HEAVY_MODULES = ("torch", "transformers", "sklearn", "cv2")
+
+
+def parse_importtime(stderr: str) -> Dict:
+    """
+    Summarize `-X importtime` output
+
+    Args:
+        stderr: Interpreter stderr
+
+    Returns:
+        Dict with total import ms, slowest top-level imports and heavy modules seen
+    """
+    top_level = {}
+    seen = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # Header line
+        name = fields[2].rstrip()
+        module = name.strip()
+        seen.add(module.split(".")[0])
+        if not name.startswith("  "):
+            # Not nested under another import
+            top_level[module] = top_level.get(module, 0) + int(fields[1])
+
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:8]
+    return {
+        "import_ms": round(sum(top_level.values()) / 1000, 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "heavy_modules": [name for name in HEAVY_MODULES if name in seen]
+    }
+
+
+def run_subcommand(rpi_dir: Path, args: List[str], repeat: int, timeout: float) -> Dict:
+    """Run one subcommand `repeat` times in fresh interpreters"""
+    walls = []
+    stderr = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = subprocess.run([sys.executable, "-X", "importtime", "cli.py", *args],
+                                    cwd=rpi_dir, capture_output=True, text=True, timeout=timeout,
+                                    env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+        except subprocess.TimeoutExpired:
+            # e.g. a model download started before the argument check
+            return {"wall_ms": None, "timed_out_after_sec": timeout}
+        walls.append((time.perf_counter() - start) * 1000)
+        stderr = result.stderr
+    return {
+        "wall_ms": round(statistics.median(walls), 1),
+        "wall_ms_min": round(min(walls), 1),
+        **parse_importtime(stderr)
+    }
+
+
+def run_all(rpi_dir: Path, subcommands: List[str], repeat: int, timeout: float) -> Dict:
+    """Every subcommand against one tree"""
+    report = {}
+    for name in subcommands:
+        report[name] = run_subcommand(rpi_dir, SUBCOMMANDS[name], repeat, timeout)
+        wall = report[name]["wall_ms"]
+        print(f"   {name}: " + (f"{wall:.0f} ms" if wall is not None else "timed out"),
+              file=sys.stderr)
+    return report
+
+
+def export_revision(revision: str, folder: Path) -> Path:
+    """Extract rpi/ and src/ of a git revision, return its rpi/ folder"""
+    archive = folder / "tree.tar"
+    with open(archive, "wb") as f:
+        subprocess.run(["git", "archive", revision, "rpi", "src"],
+                       cwd=RPI_DIR.parent, stdout=f, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(folder)
+    return folder / "rpi"
+
+
+def main():
+    """Run the benchmark and print a JSON report"""
+    parser = argparse.ArgumentParser(description='CLI cold-start benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per subcommand')
+    parser.add_argument('--subcommands', nargs='+', choices=list(SUBCOMMANDS),
+                        default=list(SUBCOMMANDS))
+    parser.add_argument('--baseline', help='Git revision to compare against (e.g. HEAD~1)')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds per run')
+    args = parser.parse_args()
+
+    print(f"⏱️  Current tree ({RPI_DIR})", file=sys.stderr)
+    report = {"repeat": args.repeat,
+              "current": run_all(RPI_DIR, args.subcommands, args.repeat, args.timeout)}
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"⏱️  Baseline {args.baseline}", file=sys.stderr)
+            baseline_dir = export_revision(args.baseline, Path(tmp))
+            baseline = run_all(baseline_dir, args.subcommands, args.repeat, args.timeout)
+            report["baseline"] = {"revision": args.baseline, **baseline}
+        report["speedup"] = {
+            name: round(report["baseline"][name]["wall_ms"] / row["wall_ms"], 2)
+            for name, row in report["current"].items()
+            if row["wall_ms"] and report["baseline"][name]["wall_ms"]
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
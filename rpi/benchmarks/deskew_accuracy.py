@@ -0,0 +1,99 @@
+"""
+Deskew benchmark: angle accuracy vs time on synthetically rotated sheets
+
+Rotates rendered answer sheets by known angles and compares the
+downsampled projection-profile and Hough estimators with the previous
+full-resolution Hough approach.
+
+Usage (from rpi/):
+    python3 benchmarks/deskew_accuracy.py --sheets 30 --max-angle 10
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR.parent))
+
+from src.processing.image_processor import ImageProcessor
+from page_detection import render_sheet
+
+
+def full_resolution_hough(image: np.ndarray) -> float:
+    """Previous estimator: Canny + HoughLinesP on the full image, plain median"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, 100, 200)
+    lines = cv2.HoughLinesP(edges, 1, np.pi / 180, 50, minLineLength=50, maxLineGap=10)
+    if lines is None or len(lines) == 0:
+        return 0.0
+    angles = [np.degrees(np.arctan2(y2 - y1, x2 - x1)) for x1, y1, x2, y2 in lines.reshape(-1, 4)]
+    return float(np.median(angles))
+
+
+def rotate(image: np.ndarray, angle: float) -> np.ndarray:
+    """Rotate content by angle degrees (the estimator should return -angle)"""
+    h, w = image.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(image, M, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+
+def main():
+    """Run the benchmark and print a JSON report"""
+    parser = argparse.ArgumentParser(description='Deskew accuracy benchmark')
+    parser.add_argument('--sheets', type=int, default=30, help='Rotated sheets')
+    parser.add_argument('--max-angle', type=float, default=10.0, help='Max rotation (deg)')
+    parser.add_argument('--lines', type=int, default=10, help='Answer lines per sheet')
+    parser.add_argument('--analysis-width', type=int, default=600,
+                        help='Width of the binary used for estimation')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    processor = ImageProcessor(analysis_width=args.analysis_width)
+    methods = {
+        "projection": lambda image: processor.estimate_skew(image, "projection"),
+        "hough_downsampled": lambda image: processor.estimate_skew(image, "hough"),
+        "hough_full_resolution": full_resolution_hough
+    }
+
+    samples = []
+    for _ in range(args.sheets):
+        angle = float(rng.uniform(-args.max_angle, args.max_angle))
+        samples.append((rotate(render_sheet(args.lines, rng), angle), -angle))
+
+    report = {"sheets": args.sheets, "max_angle": args.max_angle,
+              "analysis_width": args.analysis_width, "methods": {}}
+    for name, estimate in methods.items():
+        errors, times = [], []
+        for image, truth in samples:
+            start = time.perf_counter()
+            angle = estimate(image)
+            times.append((time.perf_counter() - start) * 1000)
+            errors.append(abs(angle - truth))
+        errors = np.array(errors)
+        report["methods"][name] = {
+            "mean_abs_error_deg": round(float(errors.mean()), 3),
+            "p95_abs_error_deg": round(float(np.percentile(errors, 95)), 3),
+            "within_0_5_deg": round(float((errors <= 0.5).mean()), 3),
+            "mean_ms": round(float(np.mean(times)), 2),
+            "p95_ms": round(float(np.percentile(times, 95)), 2)
+        }
+
+    # Cost of the single rotation at working resolution
+    image = samples[0][0]
+    start = time.perf_counter()
+    for _ in range(10):
+        processor.deskew(image)
+    report["deskew_total_ms"] = round((time.perf_counter() - start) * 100, 2)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
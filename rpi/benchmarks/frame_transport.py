@@ -0,0 +1,176 @@
+"""
+Frame hand-off benchmark: producer process -> OCR consumer process
+
+Measures the latency of handing one frame to another process and getting
+an acknowledgement back, for several frame sizes and transports:
+
+    shm_inplace  frame already captured into a FramePool slot; only the
+                 FrameRef crosses the pipe (camera capture path)
+    shm_put      frame copied into a slot with FramePool.put(), then the ref
+                 is sent (HTTP upload path: decoded image -> slot)
+    queue        frame pickled through a multiprocessing.Queue
+    jpeg_file    frame written as JPEG to disk, path sent, consumer re-decodes
+
+The consumer computes a strided checksum over the frame it received (so
+the pages are actually touched) before it acknowledges. The report has
+p50/p95 latency and effective throughput (frame MB / mean latency).
+
+Usage (from rpi/):
+    python3 benchmarks/frame_transport.py
+    python3 benchmarks/frame_transport.py --iterations 100 --sizes 1280x960 4056x3040
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR))
+
+from frame_transport import FramePool
+
+# Camera resolutions (BGR): RPiCameraCapture default and HQ camera full sensor
+SIZES = {
+    "1280x960": (960, 1280, 3),
+    "1920x1440": (1440, 1920, 3),
+    "4056x3040": (3040, 4056, 3),
+}
+
+METHODS = ("shm_inplace", "shm_put", "queue", "jpeg_file")
+
+
+def synthetic_frame(shape: Tuple[int, int, int]) -> np.ndarray:
+    """Sheet-like frame: paper background, handwriting-ish strokes, sensor noise"""
+    width = shape[1]
+    rng = np.random.default_rng(0)
+    frame = np.full(shape, 235, np.uint8)
+    scale = width / 1280
+    for row in range(12):
+        y = int((80 + row * 70) * scale)
+        cv2.putText(frame, f"{row + 1}. answer {row * 37 % 101}", (int(60 * scale), y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.4 * scale, (40, 40, 40), max(1, int(3 * scale)))
+    noise = rng.integers(0, 12, size=shape, dtype=np.uint8)
+    return cv2.subtract(frame, noise)
+
+
+def checksum(frame: np.ndarray) -> int:
+    """Strided checksum: touches every page of the frame without summing every byte"""
+    return int(frame.reshape(-1)[::4096].sum())
+
+
+def _consumer(method: str, frames: FramePool, conn, frame_queue):
+    """Receive frames until None and acknowledge each with its checksum"""
+    while True:
+        if method == "queue":
+            frame = frame_queue.get()
+            if frame is None:
+                break
+            conn.send(checksum(frame))
+            continue
+
+        message = conn.recv()
+        if message is None:
+            break
+        if method == "jpeg_file":
+            conn.send(checksum(cv2.imread(message)))
+        else:
+            view = frames.view(message)
+            total = checksum(view)
+            del view
+            frames.release(message)
+            conn.send(total)
+
+
+def run_method(method: str, frame: np.ndarray, iterations: int, warmup: int,
+               workdir: Path) -> List[float]:
+    """Hand `frame` to a consumer process iterations times, return latencies in ms"""
+    ctx = mp.get_context("fork")
+    frames = FramePool(slots=2, slot_bytes=frame.nbytes)
+    parent_conn, child_conn = ctx.Pipe()
+    frame_queue = ctx.Queue() if method == "queue" else None
+    consumer = ctx.Process(target=_consumer, args=(method, frames, child_conn, frame_queue),
+                           daemon=True)
+    consumer.start()
+    jpeg_path = str(workdir / "frame.jpg")
+
+    latencies = []
+    try:
+        for i in range(warmup + iterations):
+            if method == "shm_inplace":
+                # The capture wrote this frame into the slot; not part of the hand-off
+                ref, view = frames.acquire(frame.shape, frame.dtype)
+                np.copyto(view, frame)
+                del view
+
+            start = time.perf_counter()
+            if method == "shm_inplace":
+                parent_conn.send(ref)
+            elif method == "shm_put":
+                parent_conn.send(frames.put(frame))
+            elif method == "queue":
+                frame_queue.put(frame)
+            else:
+                cv2.imwrite(jpeg_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                parent_conn.send(jpeg_path)
+            parent_conn.recv()
+            if i >= warmup:
+                latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        if frame_queue is not None:
+            frame_queue.put(None)
+        else:
+            parent_conn.send(None)
+        consumer.join(10)
+        frames.close()
+    return latencies
+
+
+def summarize(latencies: List[float], nbytes: int) -> Dict:
+    """p50/p95 latency and throughput"""
+    ordered = sorted(latencies)
+    mean_sec = statistics.mean(ordered) / 1000
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "mb_per_s": round(nbytes / 1024 ** 2 / mean_sec, 1)
+    }
+
+
+def main():
+    """Run the benchmark and print a JSON report"""
+    parser = argparse.ArgumentParser(description='Frame hand-off benchmark')
+    parser.add_argument('--iterations', type=int, default=50, help='Frames per method and size')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed frames first')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=list(METHODS))
+    args = parser.parse_args()
+
+    report = {"iterations": args.iterations, "sizes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            frame = synthetic_frame(SIZES[size])
+            row = {"frame_mb": round(frame.nbytes / 1024 ** 2, 2)}
+            for method in args.methods:
+                latencies = run_method(method, frame, args.iterations, args.warmup, Path(tmp))
+                row[method] = summarize(latencies, frame.nbytes)
+                print(f"   {size} {method}: p50 {row[method]['p50_ms']:.2f} ms",
+                      file=sys.stderr)
+            if "queue" in row and "shm_put" in row:
+                row["shm_put_speedup_vs_queue"] = round(
+                    row["queue"]["p50_ms"] / row["shm_put"]["p50_ms"], 1)
+            report["sizes"][size] = row
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Image loading benchmark: full decode vs decode-time downscaling
+
+Each method runs in a fresh subprocess so peak RSS is attributable to the
+decode alone. Methods:
+    imread_color          cv2.imread at full resolution (previous process_image)
+    imread_color_resize   full decode + INTER_AREA resize (previous optimize_image_for_rpi)
+    loader_gray           ImageLoader, grayscale, reduced by libjpeg (pipeline default)
+    loader_color          ImageLoader, color, reduced by libjpeg
+    loader_gray_bytes     ImageLoader from in-memory bytes
+
+Usage (from rpi/):
+    python3 benchmarks/image_loading.py                    # synthetic 12 MP + 3 MP JPEGs
+    python3 benchmarks/image_loading.py --image photo.jpg
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR.parent))
+
+METHODS = ("imread_color", "imread_color_resize", "loader_gray",
+           "loader_color", "loader_gray_bytes")
+
+
+def _status_mb(field: str):
+    """Read a VmXXX field of /proc/self/status in MB (None if unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process (MB)"""
+    peak = _status_mb("VmHWM")
+    return peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reset_peak():
+    """Reset the peak RSS counter so import-time peaks don't mask the decode"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def run_child(method: str, path: str, repeat: int, working_size):
+    """Decode `repeat` times with one method and print a JSON line"""
+    import cv2
+    import numpy as np
+    from src.processing.image_loader import ImageLoader
+
+    data = Path(path).read_bytes() if method.endswith("_bytes") else None
+    gray_loader = ImageLoader(working_size, grayscale=True)
+    color_loader = ImageLoader(working_size, grayscale=False)
+
+    def decode():
+        if method == "imread_color":
+            return cv2.imread(path)
+        if method == "imread_color_resize":
+            image = cv2.imread(path)
+            height, width = image.shape[:2]
+            scale = min(working_size[0] / width, working_size[1] / height)
+            return cv2.resize(image, (int(width * scale), int(height * scale)),
+                              interpolation=cv2.INTER_AREA) if scale < 1 else image
+        if method == "loader_gray":
+            return gray_loader.load(path)
+        if method == "loader_color":
+            return color_loader.load(path)
+        return gray_loader.load(data)
+
+    # Warm up codecs outside the measurement
+    cv2.imdecode(np.frombuffer(cv2.imencode(".jpg", np.zeros((8, 8), np.uint8))[1], np.uint8),
+                 cv2.IMREAD_GRAYSCALE)
+    _reset_peak()
+    baseline = _status_mb("VmRSS") or _peak_rss_mb()
+
+    times = []
+    image = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image = decode()
+        times.append((time.perf_counter() - start) * 1000)
+
+    times.sort()
+    print(json.dumps({
+        "method": method,
+        "median_ms": round(times[len(times) // 2], 2),
+        "min_ms": round(times[0], 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "decode_peak_mb": round(_peak_rss_mb() - baseline, 1),
+        "output_shape": list(image.shape) if image is not None else None,
+        "output_mb": round(image.nbytes / 1e6, 2) if image is not None else None
+    }))
+
+
+def make_jpeg(folder: Path, width: int, height: int) -> str:
+    """Write a synthetic answer-sheet photo of the given size"""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    image = np.full((height, width, 3), 235, np.uint8)
+    image += rng.integers(0, 12, image.shape, dtype=np.uint8)
+    for i in range(40):
+        y = int(height * (0.05 + i * 0.023))
+        cv2.putText(image, f"{i + 1}. the quick brown fox jumps over the lazy dog",
+                    (width // 20, y), cv2.FONT_HERSHEY_SCRIPT_SIMPLEX,
+                    width / 1500, (40, 40, 40), max(1, width // 800), cv2.LINE_AA)
+    path = folder / f"sheet_{width}x{height}.jpg"
+    cv2.imwrite(str(path), image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    return str(path)
+
+
+def main():
+    """Run every method on every image and print a JSON report"""
+    parser = argparse.ArgumentParser(description='Image loading benchmark')
+    parser.add_argument('--image', nargs='+', help='JPEG/PNG files (default: synthetic)')
+    parser.add_argument('--repeat', type=int, default=10, help='Decodes per method')
+    parser.add_argument('--working-size', type=int, nargs=2, default=[1280, 960])
+    parser.add_argument('--child', nargs=2, metavar=('METHOD', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.repeat, tuple(args.working_size))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = args.image or [make_jpeg(Path(tmp), 4000, 3000),
+                                make_jpeg(Path(tmp), 1920, 1440)]
+        report = {"working_size": args.working_size, "repeat": args.repeat, "images": {}}
+        for path in images:
+            rows = {}
+            for method in METHODS:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", method, path,
+                     "--repeat", str(args.repeat),
+                     "--working-size", *map(str, args.working_size)],
+                    capture_output=True, text=True, check=True).stdout
+                rows[method] = json.loads(output.strip().splitlines()[-1])
+            base = rows["imread_color_resize"]["median_ms"]
+            for row in rows.values():
+                row["speedup_vs_resize"] = round(base / row["median_ms"], 2) if row["median_ms"] else None
+            report["images"][Path(path).name] = rows
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Model memory benchmark: default vs low-memory TrOCR loading
+
+Each configuration loads TextExtractor in a fresh subprocess so load peaks
+are not hidden by an earlier load. Configurations:
+    default           from_pretrained, float32 weights (previous behaviour)
+    low_memory        memory-mapped safetensors into an uninitialized model
+    low_memory_bf16   low_memory + bfloat16 weights, per-layer float32 compute
+    low_memory_fp16   low_memory + float16 weights, per-layer float32 compute
+
+Reported per configuration: RSS after importing torch/transformers, peak RSS
+while loading, steady RSS after load, peak RSS after one OCR batch, load and
+batch time, and the batch size the memory budget allows. Memory-mapped
+weights count towards RSS once touched but are clean file pages the kernel
+can drop, so anonymous RSS (RssAnon) after load and after the batch is
+reported as well.
+
+Usage (from rpi/):
+    python3 benchmarks/model_memory.py
+    python3 benchmarks/model_memory.py --model /path/to/trocr-small --batch 8
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR.parent))
+
+CONFIGS = {
+    "default": {},
+    "low_memory": {"low_memory": True},
+    "low_memory_bf16": {"low_memory": True, "weight_dtype": "bf16"},
+    "low_memory_fp16": {"low_memory": True, "weight_dtype": "fp16"},
+}
+
+
+def _status_mb(field: str):
+    """Read a VmXXX field of /proc/self/status in MB (None if unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak():
+    """Reset the peak RSS counter so earlier peaks don't mask the next stage"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def run_child(config: str, model: str, batch: int):
+    """Load one configuration, run one batch and print a JSON line"""
+    import numpy as np
+    from src.ocr.text_extractor import TextExtractor
+
+    import_rss = _status_mb("VmRSS")
+    _reset_peak()
+    start = time.perf_counter()
+    extractor = TextExtractor(model_name=model, max_batch_size=batch, **CONFIGS[config])
+    load_ms = (time.perf_counter() - start) * 1000
+    load_peak = _status_mb("VmHWM")
+    steady_rss = _status_mb("VmRSS")
+    steady_anon = _status_mb("RssAnon")
+
+    rng = np.random.default_rng(0)
+    crops = [np.full((64, 480), 235, np.uint8) - rng.integers(0, 20, (64, 480), dtype=np.uint8)
+             for _ in range(batch)]
+    extractor.recognize_batch(crops[:1], batch_size=1)  # Warm up
+    _reset_peak()
+    start = time.perf_counter()
+    extractor.recognize_batch(crops, batch_size=batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    info = extractor.memory_info()
+    print(json.dumps({
+        "config": config,
+        "weights_mb": info["weights_mb"],
+        "batch_limit": info["batch_limit"],
+        "import_rss_mb": _round(import_rss),
+        "load_peak_mb": _round(load_peak),
+        "steady_rss_mb": _round(steady_rss),
+        "steady_anon_mb": _round(steady_anon),
+        "batch_peak_mb": _round(_status_mb("VmHWM")),
+        "batch_anon_mb": _round(_status_mb("RssAnon")),
+        "load_ms": round(load_ms, 1),
+        "batch_ms": round(batch_ms, 1)
+    }))
+
+
+def main():
+    """Run every configuration and print a JSON report"""
+    parser = argparse.ArgumentParser(description='Model memory benchmark')
+    parser.add_argument('--model', default="microsoft/trocr-base-handwritten",
+                        help='Hugging Face model id or local directory')
+    parser.add_argument('--batch', type=int, default=8, help='Crops in the measured batch')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.model, args.batch)
+        return
+
+    report = {"model": args.model, "batch": args.batch, "configs": {}}
+    for config in args.configs:
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", config,
+             "--model", args.model, "--batch", str(args.batch)],
+            capture_output=True, text=True)
+        lines = result.stdout.strip().splitlines()
+        if result.returncode != 0 or not lines or not lines[-1].startswith("{"):
+            error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+            report["configs"][config] = {"error": error}
+            continue
+        report["configs"][config] = json.loads(lines[-1])
+
+    base = report["configs"].get("default", {})
+    for row in report["configs"].values():
+        if "error" not in row and base.get("load_peak_mb") and row is not base:
+            row["load_peak_saved_mb"] = round(base["load_peak_mb"] - row["load_peak_mb"], 1)
+            row["steady_saved_mb"] = round(base["steady_rss_mb"] - row["steady_rss_mb"], 1)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
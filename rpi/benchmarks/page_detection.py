@@ -0,0 +1,195 @@
+"""
+Page detection benchmark: full frame vs rectified sheet before OCR
+
+Renders synthetic camera frames (an answer sheet under perspective on a
+cluttered table) or uses real photos, then reports page detection time,
+corner error, pixels sent to OCR and how far the number of line crops
+from _detect_text_lines is from the number of answer lines
+(|crops - expected|), with and without rectification. Real photos have no
+known line count, so only the raw crop counts are reported for them.
+
+Usage (from rpi/):
+    python3 benchmarks/page_detection.py --frames 20
+    python3 benchmarks/page_detection.py --image photo1.jpg photo2.jpg
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR.parent))
+
+from src.ocr.text_extractor import TextExtractor
+from src.processing.page_detector import PageDetector
+
+
+def render_sheet(lines: int, rng: np.random.Generator,
+                 size=(1000, 1414)) -> np.ndarray:
+    """Render a white answer sheet with handwritten-looking lines"""
+    width, height = size
+    sheet = np.full((height, width, 3), 245, np.uint8)
+    spacing = (height - 200) // lines
+    for i in range(lines):
+        y = 150 + i * spacing
+        text = f"{i + 1}. " + "".join(rng.choice(list("abcdefghij klmnop"), 18))
+        cv2.putText(sheet, text, (80, y), cv2.FONT_HERSHEY_SCRIPT_SIMPLEX,
+                    1.6, (40, 40, 40), 3, cv2.LINE_AA)
+    return sheet
+
+
+def render_frame(sheet: np.ndarray, rng: np.random.Generator,
+                 frame_size=(1920, 1440), max_angle: float = 12):
+    """
+    Place a sheet on a textured table under random perspective
+    (rotated by up to max_angle degrees)
+
+    Returns:
+        Tuple (frame, true corners tl/tr/br/bl)
+    """
+    width, height = frame_size
+    # Wood-like table: low-frequency noise plus grain stripes
+    noise = cv2.resize(rng.integers(60, 140, (18, 24), dtype=np.uint8),
+                       (width, height), interpolation=cv2.INTER_CUBIC)
+    grain = (np.sin(np.arange(height) / 7.0)[:, None] * 12).astype(np.int16)
+    table = np.clip(noise.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+    frame = cv2.merge([table // 2, (table * 0.7).astype(np.uint8), table])
+
+    # Clutter: pens, a phone, printed text on a box
+    for _ in range(6):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        cv2.line(frame, (x, y), (x + int(rng.integers(-300, 300)), y + int(rng.integers(-60, 60))),
+                 tuple(int(c) for c in rng.integers(0, 255, 3)), int(rng.integers(6, 14)))
+    cv2.putText(frame, "CLASS 7B  BOX", (40, height - 60), cv2.FONT_HERSHEY_SIMPLEX,
+                2.0, (20, 20, 20), 5)
+
+    # Sheet covers ~55-70% of the frame height, tilted and off-center
+    sheet_h = height * rng.uniform(0.75, 0.9)
+    sheet_w = sheet_h * sheet.shape[1] / sheet.shape[0]
+    cx = width / 2 + rng.uniform(-200, 200)
+    cy = height / 2 + rng.uniform(-40, 40)
+    angle = np.deg2rad(rng.uniform(-max_angle, max_angle))
+    base = np.array([[-sheet_w / 2, -sheet_h / 2], [sheet_w / 2, -sheet_h / 2],
+                     [sheet_w / 2, sheet_h / 2], [-sheet_w / 2, sheet_h / 2]])
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    corners = base @ rotation.T + [cx, cy]
+    corners += rng.uniform(-25, 25, corners.shape)  # Keystone from camera tilt
+    corners = corners.astype(np.float32)
+
+    source = np.array([[0, 0], [sheet.shape[1], 0], [sheet.shape[1], sheet.shape[0]],
+                       [0, sheet.shape[0]]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(source, corners)
+    warped = cv2.warpPerspective(sheet, matrix, (width, height))
+    mask = cv2.warpPerspective(np.full(sheet.shape[:2], 255, np.uint8), matrix, (width, height))
+    frame[mask > 0] = warped[mask > 0]
+
+    # A hand resting on the sheet edge
+    hand_center = (int(corners[2][0]), int(corners[2][1] - sheet_h * 0.3))
+    cv2.ellipse(frame, hand_center, (140, 90), 30, 0, 360, (120, 150, 200), -1)
+    return frame, corners
+
+
+def count_crops(image: np.ndarray) -> int:
+    """Line crops the OCR stage would run TrOCR on"""
+    return len(TextExtractor._detect_text_lines(None, image))
+
+
+def timed(fn, *args):
+    """Call fn and return (result, milliseconds)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    """Run the benchmark and print a JSON report"""
+    parser = argparse.ArgumentParser(description='Page detection benchmark')
+    parser.add_argument('--image', nargs='+', help='Real frames instead of synthetic ones')
+    parser.add_argument('--frames', type=int, default=20, help='Synthetic frames')
+    parser.add_argument('--lines', type=int, default=10, help='Answer lines per sheet')
+    parser.add_argument('--detect-width', type=int, default=500,
+                        help='Width used for quad detection')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    detector = PageDetector(detect_width=args.detect_width)
+
+    if args.image:
+        samples = [(cv2.imread(path), None) for path in args.image]
+        expected = None
+    else:
+        samples = [render_frame(render_sheet(args.lines, rng), rng) for _ in range(args.frames)]
+        expected = args.lines
+
+    per_frame = []
+    for frame, truth in samples:
+        if frame is None:
+            continue
+        (page, info), detect_ms = timed(detector.extract_page, frame)
+        raw_crops, raw_lines_ms = timed(count_crops, frame)
+        row = {
+            "detect_ms": round(detect_ms, 2),
+            "found": info["found"],
+            "input_pixels": info["input_pixels"],
+            "ocr_pixels": info["output_pixels"] or info["input_pixels"],
+            "crops_full_frame": raw_crops,
+            "crop_error_full_frame": abs(raw_crops - expected) if expected else None,
+            "line_detect_ms_full_frame": round(raw_lines_ms, 2)
+        }
+        if page is not None:
+            page_crops, page_lines_ms = timed(count_crops, page)
+            row["crops_rectified"] = page_crops
+            row["crop_error_rectified"] = abs(page_crops - expected) if expected else None
+            row["line_detect_ms_rectified"] = round(page_lines_ms, 2)
+            if truth is not None:
+                error = np.linalg.norm(np.array(info["corners"]) - truth, axis=1)
+                row["corner_error_px"] = round(float(error.max()), 1)
+        per_frame.append(row)
+
+    found = [r for r in per_frame if r["found"]]
+
+    def mean(key, rows=per_frame):
+        values = [r[key] for r in rows if r.get(key) is not None]
+        return round(float(np.mean(values)), 2) if values else None
+
+    report = {
+        "frames": len(per_frame),
+        "expected_lines": expected,
+        "detection_rate": round(len(found) / len(per_frame), 3) if per_frame else 0.0,
+        "mean_detect_ms": mean("detect_ms"),
+        "p95_detect_ms": round(float(np.percentile([r["detect_ms"] for r in per_frame], 95)), 2)
+        if per_frame else None,
+        "mean_corner_error_px": mean("corner_error_px", found),
+        "mean_input_pixels": mean("input_pixels"),
+        "mean_ocr_pixels": mean("ocr_pixels"),
+        "pixel_reduction": round(1 - mean("ocr_pixels") / mean("input_pixels"), 3)
+        if per_frame else None
+    }
+    if expected:
+        report.update({
+            "mean_crop_error_full_frame": mean("crop_error_full_frame", found),
+            "mean_crop_error_rectified": mean("crop_error_rectified", found),
+            "exact_crops_rectified": round(
+                sum(1 for r in found if r.get("crop_error_rectified") == 0) / len(found), 3)
+            if found else None
+        })
+    else:
+        report.update({
+            "mean_crops_full_frame": mean("crops_full_frame", found),
+            "mean_crops_rectified": mean("crops_rectified", found)
+        })
+    report.update({
+        "mean_line_detect_ms_full_frame": mean("line_detect_ms_full_frame", found),
+        "mean_line_detect_ms_rectified": mean("line_detect_ms_rectified", found)
+    })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+End-to-end pipeline benchmark on synthetic answer sheets
+
+Renders sheets from an answer key (synthetic_sheets.py), writes them as
+JPEGs and runs RPiPipeline.full_pipeline on each: load → page detection
+and deskew → line segmentation → recognition → grading. Recognition uses
+either real TrOCR weights or StubTextExtractor, a deterministic stand-in
+that needs no network or model download.
+
+Per-stage times come from the pipeline's own trace spans. Accuracy
+compares what the pipeline graded with grading the true rendered text:
+    text_accuracy    extracted line == rendered answer
+    grade_agreement  PASS/FAIL matches the grade of the rendered answer
+With the stub, both measure page detection, deskew and segmentation only.
+
+Usage (from rpi/):
+    python3 benchmarks/pipeline_e2e.py --sheets 20
+    python3 benchmarks/pipeline_e2e.py --sheets 20 --blur 1.5 --noise 10 --skew 8
+    python3 benchmarks/pipeline_e2e.py --ocr trocr --model microsoft/trocr-base-handwritten
+    python3 benchmarks/pipeline_e2e.py --output run.json --compare baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR.parent))
+sys.path.insert(0, str(RPI_DIR))
+
+from src.ocr.text_extractor import TextExtractor
+from src.profiling.tracer import tracing
+from pipeline import RPiPipeline
+from synthetic_sheets import degrade, make_responses, render_answer_sheet
+
+# Report stage -> trace spans summed per sheet
+STAGES = {
+    "load": ("load_image",),
+    "page_detect": ("detect_page",),
+    "deskew": ("deskew",),
+    "segment": ("detect_text_lines",),
+    "recognize": ("recognize_line",),
+    "grade": ("grade_answers",),
+    "total": ("full_pipeline",),
+}
+
+
+class StubTextExtractor(TextExtractor):
+    """
+    Deterministic TextExtractor without a model
+
+    Line segmentation is the real _detect_text_lines. Each crop is then
+    "recognized" as the ground-truth line whose position on the page is
+    nearest to the crop's center (within half a line spacing), or as ''
+    if none is. Each truth line is read at most once, so missed, merged
+    or split lines cost accuracy just like with a real model.
+    """
+
+    def __init__(self, ms_per_line: float = 0.0):
+        """
+        Initialize stub
+
+        Args:
+            ms_per_line: Simulated recognition time per crop
+        """
+        self.model_name = "stub"
+        self.device = "cpu"
+        self.ms_per_line = ms_per_line
+        self.last_line_count = 0
+        self.generate_kwargs = {}
+        self.truth: List[Dict] = []
+        self._crops: List[tuple] = []
+        self._used = set()
+
+    def expect(self, lines: List[Dict]):
+        """Set the ground truth of the next sheet ([{"text", "y"}])"""
+        self.truth = lines
+        self._used = set()
+
+    def _detect_text_lines(self, image: np.ndarray) -> List[tuple]:
+        """Real line segmentation; remembers crop centers for _recognize_line"""
+        lines = super()._detect_text_lines(image)
+        height = image.shape[0]
+        self._crops = [((start + end) / 2 / height) for start, end in lines]
+        return lines
+
+    def _recognize_line(self, line_image: np.ndarray) -> str:
+        """Truth line nearest to the next crop ('' if none is close)"""
+        if self.ms_per_line:
+            time.sleep(self.ms_per_line / 1000)
+        if not self._crops or not self.truth:
+            return ""
+        center = self._crops.pop(0)
+        positions = sorted(line["y"] for line in self.truth)
+        spacing = float(np.median(np.diff(positions))) if len(positions) > 1 else 1.0
+        best = min(range(len(self.truth)), key=lambda i: abs(self.truth[i]["y"] - center))
+        if best in self._used or abs(self.truth[best]["y"] - center) > spacing / 2:
+            return ""
+        self._used.add(best)
+        return f"{best + 1}. {self.truth[best]['text']}"
+
+    def recognize_batch(self, line_images: List[np.ndarray], batch_size: int = 8) -> List[str]:
+        # Template crops carry no page position; the stub can't place them
+        return [""] * len(line_images)
+
+    def memory_info(self) -> Dict:
+        """No weights to report"""
+        return {"model": "stub", "weights_mb": 0}
+
+
+def _status_mb(field: str):
+    """Read a VmXXX field of /proc/self/status in MB (None if unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak():
+    """Reset the peak RSS counter so setup peaks don't mask the run"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def git_revision() -> Dict:
+    """Commit hash and whether the working tree has local changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RPI_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    cwd=RPI_DIR, capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def strip_number(text: str) -> str:
+    """Drop the '3. ' prefix written in front of each answer"""
+    head, _, rest = text.partition(". ")
+    return rest if head.strip().isdigit() else text
+
+
+def percentile(values: List[float], q: float):
+    """Rounded percentile (None for no values)"""
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+def generate(args, folder: Path, answer_key: List[str]) -> List[Dict]:
+    """Render all sheets to JPEG files with their ground truth"""
+    rng = np.random.default_rng(args.seed)
+    sheets = []
+    for index in range(args.sheets + args.warmup):
+        key, answers = make_responses(answer_key, args.lines, rng,
+                                      wrong_rate=args.wrong_rate, typo_rate=args.typo_rate)
+        sheet, lines = render_answer_sheet(answers, rng)
+        image = degrade(sheet, rng, skew=args.skew, blur=args.blur, noise=args.noise,
+                        photo=not args.scan, frame_size=tuple(args.frame_size))
+        path = folder / f"sheet_{index:04d}.jpg"
+        cv2.imwrite(str(path), image, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+        sheets.append({"path": str(path), "key": key, "lines": lines})
+    return sheets
+
+
+def run(args, pipeline: RPiPipeline, sheets: List[Dict]) -> Dict:
+    """Grade every sheet and aggregate timings and accuracy"""
+    stub = pipeline.extractor if isinstance(pipeline.extractor, StubTextExtractor) else None
+    stage_ms = {stage: [] for stage in STAGES}
+    wall_ms, texts_ok, grades_ok, questions, failures = [], 0, 0, 0, 0
+    matchers = {}
+
+    _reset_peak()
+    start_rss = _status_mb("VmRSS")
+    started = time.perf_counter()
+    for index, sheet in enumerate(sheets):
+        key = sheet["key"]
+        matcher_key = tuple(key)
+        if matcher_key not in matchers:
+            pipeline.set_answer_key(key)
+            matchers[matcher_key] = pipeline.matcher
+        if stub is not None:
+            stub.expect(sheet["lines"])
+
+        sheet_start = time.perf_counter()
+        with tracing() as tracer:
+            results = pipeline.full_pipeline(sheet["path"], key, matcher=matchers[matcher_key])
+        elapsed = (time.perf_counter() - sheet_start) * 1000
+
+        if index < args.warmup:
+            started = time.perf_counter()
+            continue
+        wall_ms.append(elapsed)
+
+        totals = {stage: 0.0 for stage in STAGES}
+        for event in tracer.to_dict()["traceEvents"]:
+            for stage, names in STAGES.items():
+                if event.get("ph") == "X" and event["name"] in names:
+                    totals[stage] += event["dur"] / 1000
+        for stage, value in totals.items():
+            stage_ms[stage].append(value)
+
+        # Grade the true text with the same matcher to get the expected outcome
+        truth = [line["text"] for line in sheet["lines"]]
+        written = [f"{q}. {text}" for q, text in enumerate(truth, 1)]
+        expected = matchers[matcher_key].score_all(written) >= pipeline.threshold
+        questions += len(truth)
+        if not results.get("success"):
+            failures += 1
+            continue
+        for q, should_pass in enumerate(expected, 1):
+            result = results.get(q)
+            if result is None:
+                continue
+            texts_ok += int(strip_number(result["student"]).strip() == truth[q - 1])
+            grades_ok += int((result["similarity"] >= pipeline.threshold) == bool(should_pass))
+
+    total_sec = time.perf_counter() - started
+    peak = _status_mb("VmHWM")
+    return {
+        "sheets": len(wall_ms),
+        "failed_sheets": failures,
+        "sheets_per_sec": round(len(wall_ms) / total_sec, 3) if total_sec > 0 else None,
+        "latency_ms": {"p50": percentile(wall_ms, 50), "p95": percentile(wall_ms, 95),
+                       "mean": round(float(np.mean(wall_ms)), 2) if wall_ms else None},
+        "stages_ms": {stage: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+                      for stage, values in stage_ms.items()},
+        "accuracy": {
+            "questions": questions,
+            "text_accuracy": round(texts_ok / questions, 4) if questions else None,
+            "grade_agreement": round(grades_ok / questions, 4) if questions else None
+        },
+        "memory_mb": {
+            "rss_before": round(start_rss, 1) if start_rss else None,
+            "peak_rss": round(peak, 1) if peak else None
+        }
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> Dict:
+    """Relative change of throughput, latency, stages and accuracy vs a baseline"""
+    def change(new, old):
+        return round((new - old) / old, 4) if new is not None and old else None
+
+    return {
+        "baseline_commit": baseline.get("git", {}).get("commit"),
+        "sheets_per_sec": change(report["sheets_per_sec"], baseline.get("sheets_per_sec")),
+        "latency_p50": change(report["latency_ms"]["p50"], baseline.get("latency_ms", {}).get("p50")),
+        "stages_p50": {stage: change(values["p50"],
+                                     baseline.get("stages_ms", {}).get(stage, {}).get("p50"))
+                       for stage, values in report["stages_ms"].items()},
+        "grade_agreement": change(report["accuracy"]["grade_agreement"],
+                                  baseline.get("accuracy", {}).get("grade_agreement")),
+        "peak_rss": change(report["memory_mb"]["peak_rss"],
+                           baseline.get("memory_mb", {}).get("peak_rss"))
+    }
+
+
+def main():
+    """Run the benchmark and print a JSON report"""
+    parser = argparse.ArgumentParser(description='End-to-end pipeline benchmark')
+    parser.add_argument('--answer-file', default=str(RPI_DIR / "example_answers.json"))
+    parser.add_argument('--sheets', type=int, default=20, help='Measured sheets')
+    parser.add_argument('--warmup', type=int, default=1, help='Unmeasured sheets first')
+    parser.add_argument('--lines', type=int, default=5, help='Answer lines per sheet')
+    parser.add_argument('--skew', type=float, default=3.0, help='Max sheet rotation (deg)')
+    parser.add_argument('--blur', type=float, default=0.0, help='Gaussian blur sigma')
+    parser.add_argument('--noise', type=float, default=4.0, help='Gaussian noise sigma')
+    parser.add_argument('--wrong-rate', type=float, default=0.3,
+                        help='Fraction of answers copied from another question')
+    parser.add_argument('--typo-rate', type=float, default=0.02, help='Per-letter typo chance')
+    parser.add_argument('--scan', action='store_true', help='Flat scans instead of camera photos')
+    parser.add_argument('--frame-size', type=int, nargs=2, default=[1920, 1440])
+    parser.add_argument('--jpeg-quality', type=int, default=90)
+    parser.add_argument('--ocr', choices=['stub', 'trocr'], default='stub')
+    parser.add_argument('--model', default="microsoft/trocr-base-handwritten",
+                        help='TrOCR model id or local directory (--ocr trocr)')
+    parser.add_argument('--stub-ms-per-line', type=float, default=0.0,
+                        help='Simulated recognition time per crop (--ocr stub)')
+    parser.add_argument('--no-rectify', action='store_true')
+    parser.add_argument('--no-deskew', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the report to this file')
+    parser.add_argument('--compare', help='Previous report to compare against')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline output')
+    args = parser.parse_args()
+
+    with open(args.answer_file) as f:
+        data = json.load(f)
+    answer_key = data if isinstance(data, list) else data.get("answers", [])
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with tempfile.TemporaryDirectory() as tmp:
+        sheets = generate(args, Path(tmp), answer_key)
+        with quiet:
+            extractor = StubTextExtractor(args.stub_ms_per_line) if args.ocr == "stub" else None
+            pipeline = RPiPipeline(model_name=args.model, rectify=not args.no_rectify,
+                                   deskew=not args.no_deskew, extractor=extractor)
+        if pipeline.extractor is None:
+            print(json.dumps({"error": f"Failed to load OCR model {args.model}"}))
+            sys.exit(1)
+        with quiet:
+            results = run(args, pipeline, sheets)
+
+    report = {
+        "git": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": {"machine": platform.machine(), "python": platform.python_version(),
+                     "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "compare", "verbose")},
+        **results
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report["vs_baseline"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Throughput and memory benchmark: single-process vs pre-fork server
+
+Starts server.py in each mode, fires concurrent /api/grade requests and
+reports sheets/second plus RSS/PSS per process.
+
+Usage (from rpi/):
+    python3 benchmarks/prefork_throughput.py --image answer.jpg \
+        --answer-file example_answers.json --workers 4 --requests 40
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR))
+
+from procstats import read_memory, child_pids
+
+
+def _post_json(url: str, payload: dict, timeout: float = 600) -> dict:
+    """POST JSON and decode the response"""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _wait_ready(base_url: str, timeout: float = 300) -> bool:
+    """Poll /api/health until the server answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/health", timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def run_mode(workers: int, args) -> dict:
+    """
+    Benchmark one server configuration
+
+    Args:
+        workers: Number of workers (1 = threaded single process)
+        args: Parsed command-line arguments
+
+    Returns:
+        dict: Throughput and memory figures
+    """
+    command = [sys.executable, "server.py", "--port", str(args.port),
+               "--workers", str(workers)]
+    if args.torch_threads:
+        command += ["--torch-threads", str(args.torch_threads)]
+
+    server = subprocess.Popen(command, cwd=str(RPI_DIR),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not _wait_ready(base_url):
+            raise RuntimeError("server did not start")
+
+        with open(args.answer_file, 'r') as f:
+            data = json.load(f)
+        answer_key = data if isinstance(data, list) else data.get('answers', [])
+        payload = {"image_path": str(Path(args.image).resolve()), "answer_key": answer_key}
+
+        # Warm-up request (first-call allocations, lazy threads)
+        _post_json(f"{base_url}/api/grade", payload)
+
+        latencies = []
+
+        def one_request(_):
+            start = time.perf_counter()
+            _post_json(f"{base_url}/api/grade", payload)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(one_request, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        processes = [server.pid] + child_pids(server.pid)
+        memory = {str(pid): read_memory(pid) for pid in processes}
+        latencies.sort()
+
+        return {
+            "workers": workers,
+            "requests": args.requests,
+            "elapsed_sec": round(elapsed, 2),
+            "sheets_per_sec": round(args.requests / elapsed, 3),
+            "p50_latency_sec": round(latencies[len(latencies) // 2], 3),
+            "p95_latency_sec": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+            "memory_mb": memory,
+            "total_pss_mb": round(sum(m.get("pss_mb") or 0 for m in memory.values()), 1)
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    """Run both modes and print a JSON report"""
+    parser = argparse.ArgumentParser(description='Pre-fork server benchmark')
+    parser.add_argument('--image', required=True, help='Answer sheet image')
+    parser.add_argument('--answer-file', required=True, help='JSON answer key')
+    parser.add_argument('--workers', type=int, default=4, help='Pre-fork workers')
+    parser.add_argument('--torch-threads', type=int, help='Torch threads per worker')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--port', type=int, default=5099, help='Port to use')
+    args = parser.parse_args()
+
+    report = {
+        "single_process": run_mode(1, args),
+        "prefork": run_mode(args.workers, args)
+    }
+    single = report["single_process"]["sheets_per_sec"]
+    if single:
+        report["speedup"] = round(report["prefork"]["sheets_per_sec"] / single, 2)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Synthetic answer-sheet generator for benchmarks
+
+Renders one handwriting-style line per answer (per-word jitter in
+baseline, size and stroke), then degrades the sheet like a scan or a
+camera photo: rotation, perspective on a table, blur, sensor noise and
+JPEG compression. The ground-truth text and line positions are returned
+alongside every image.
+
+Usage (from rpi/), to look at a few samples:
+    python3 benchmarks/synthetic_sheets.py --answer-file example_answers.json --out /tmp/sheets
+"""
+
+import argparse
+import json
+import string
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+RPI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RPI_DIR.parent))
+
+from page_detection import render_frame
+
+INK_COLORS = [(40, 40, 40), (110, 40, 20), (30, 30, 90)]  # Pencil, blue pen, dark pen
+
+
+def make_responses(answer_key: List[str], lines: int, rng: np.random.Generator,
+                   wrong_rate: float = 0.3, typo_rate: float = 0.02) -> Tuple[List[str], List[str]]:
+    """
+    Student answers for a sheet
+
+    Args:
+        answer_key: Key answers (cycled if the sheet has more lines)
+        lines: Answers on the sheet
+        rng: Random generator
+        wrong_rate: Fraction of answers taken from a different question
+        typo_rate: Per-letter chance of a misspelling
+
+    Returns:
+        Tuple (key for this sheet, student answers)
+    """
+    key = [answer_key[i % len(answer_key)] for i in range(lines)]
+    answers = []
+    for i, expected in enumerate(key):
+        text = expected
+        if len(answer_key) > 1 and rng.random() < wrong_rate:
+            others = [a for a in answer_key if a != expected]
+            text = others[int(rng.integers(len(others)))]
+        letters = list(text)
+        for j, char in enumerate(letters):
+            if char.isalpha() and rng.random() < typo_rate:
+                letters[j] = string.ascii_lowercase[int(rng.integers(26))]
+        answers.append("".join(letters))
+    return key, answers
+
+
+def _handwrite(sheet: np.ndarray, text: str, origin: Tuple[int, int], scale: float,
+               rng: np.random.Generator, color: Tuple[int, int, int]):
+    """Draw text word by word with jittered baseline, size and stroke"""
+    x, y = origin
+    space = cv2.getTextSize(" ", cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, scale, 1)[0][0]
+    for word in text.split():
+        word_scale = scale * rng.uniform(0.92, 1.08)
+        thickness = max(1, int(round(scale * rng.uniform(1.6, 2.4))))
+        baseline = y + int(rng.normal(0, scale * 2))
+        cv2.putText(sheet, word, (x, baseline), cv2.FONT_HERSHEY_SCRIPT_SIMPLEX,
+                    word_scale, color, thickness, cv2.LINE_AA)
+        x += cv2.getTextSize(word, cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, word_scale, thickness)[0][0]
+        x += int(space * rng.uniform(0.8, 1.4))
+
+
+def render_answer_sheet(answers: List[str], rng: np.random.Generator,
+                        size=(1240, 1754), ruled: bool = True) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    Render a sheet with one handwritten line per answer ("1. ...")
+
+    Args:
+        answers: Text of each line
+        rng: Random generator
+        size: Sheet size (width, height), A4 at 150 dpi by default
+        ruled: Draw faint ruled lines under the answers
+
+    Returns:
+        Tuple (BGR sheet, [{"question", "text", "y": normalized center}])
+    """
+    width, height = size
+    sheet = np.full((height, width, 3), 245, np.uint8)
+    top, bottom, left = int(height * 0.08), int(height * 0.05), int(width * 0.07)
+    spacing = (height - top - bottom) / max(1, len(answers))
+    color = INK_COLORS[int(rng.integers(len(INK_COLORS)))]
+
+    cv2.putText(sheet, "Name: ____________   Class: ______", (left, top // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, width / 1400, (60, 60, 60), 2, cv2.LINE_AA)
+
+    lines = []
+    for i, answer in enumerate(answers):
+        text = f"{i + 1}. {answer}"
+        natural = cv2.getTextSize(text, cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, 1.0, 2)[0][0]
+        # Long answers are written smaller, like a student squeezing them in
+        scale = min(width / 900, (width - 2 * left) / (natural * 1.15))
+        y = int(top + (i + 0.6) * spacing)
+        if ruled:
+            cv2.line(sheet, (left, y + 8), (width - left, y + 8), (225, 215, 200), 1)
+        _handwrite(sheet, text, (left + int(rng.integers(0, 20)), y), scale, rng, color)
+        lines.append({"question": i + 1, "text": answer, "y": (y - 10 * scale) / height})
+    return sheet, lines
+
+
+def degrade(sheet: np.ndarray, rng: np.random.Generator, skew: float = 3.0,
+            blur: float = 0.0, noise: float = 4.0, photo: bool = True,
+            frame_size=(1920, 1440)) -> np.ndarray:
+    """
+    Turn a clean sheet into a scan or a camera photo
+
+    Args:
+        sheet: Rendered sheet
+        rng: Random generator
+        skew: Max rotation in degrees
+        blur: Gaussian blur sigma (0 = sharp)
+        noise: Gaussian noise sigma (gray levels)
+        photo: Place the sheet on a table under perspective (else a flat scan)
+        frame_size: Photo size (width, height)
+
+    Returns:
+        Degraded BGR image
+    """
+    if photo:
+        image, _ = render_frame(sheet, rng, frame_size, max_angle=skew)
+    else:
+        height, width = sheet.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), rng.uniform(-skew, skew), 1.0)
+        image = cv2.warpAffine(sheet, matrix, (width, height), borderValue=(245, 245, 245))
+
+    if blur > 0:
+        image = cv2.GaussianBlur(image, (0, 0), blur)
+    if noise > 0:
+        grain = rng.normal(0, noise, image.shape[:2])[..., None]
+        image = np.clip(image + grain, 0, 255).astype(np.uint8)
+    return image
+
+
+def main():
+    """Write a few sample sheets and their ground truth"""
+    parser = argparse.ArgumentParser(description='Synthetic answer sheets')
+    parser.add_argument('--answer-file', default=str(RPI_DIR / "example_answers.json"))
+    parser.add_argument('--out', required=True, help='Output folder')
+    parser.add_argument('--sheets', type=int, default=3)
+    parser.add_argument('--lines', type=int, default=5)
+    parser.add_argument('--skew', type=float, default=3.0)
+    parser.add_argument('--blur', type=float, default=0.0)
+    parser.add_argument('--noise', type=float, default=4.0)
+    parser.add_argument('--scan', action='store_true', help='Flat scans instead of photos')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.answer_file) as f:
+        data = json.load(f)
+    answer_key = data if isinstance(data, list) else data.get("answers", [])
+
+    rng = np.random.default_rng(args.seed)
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    for index in range(args.sheets):
+        key, answers = make_responses(answer_key, args.lines, rng)
+        sheet, lines = render_answer_sheet(answers, rng)
+        image = degrade(sheet, rng, args.skew, args.blur, args.noise, photo=not args.scan)
+        cv2.imwrite(str(out / f"sheet_{index:03d}.jpg"), image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        with open(out / f"sheet_{index:03d}.json", 'w') as f:
+            json.dump({"key": key, "lines": lines}, f, indent=2)
+    print(f"✓ {args.sheets} sheets written to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,199 @@ Supports both PiCamera and USB cameras
 """
 
 import cv2
+import json
 import numpy as np
-from typing import Optional, Tuple
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from pathlib import Path
 
+# Camera probe results, reused while the video devices are unchanged
+CAMERA_CACHE = Path(__file__).parent / "cache" / "cameras.json"
+CAMERA_CACHE_TTL = 600
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Background thread that keeps reading frames into a small ring buffer
+    Keeps the driver queue drained so the newest frame is always at hand
+    """
+    
+    def __init__(self, cap, buffer_size: int = 4):
+        """
+        Initialize frame grabber
+        
+        Args:
+            cap: Opened cv2.VideoCapture (or compatible source)
+            buffer_size: Number of recent frames kept
+        """
+        super().__init__(name="frame-grabber", daemon=True)
+        self.cap = cap
+        self.buffer = deque(maxlen=buffer_size)  # (seq, timestamp, frame)
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.eof = False
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        """Read frames until stopped or the source ends"""
+        failures = 0
+        while not self._stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                failures += 1
+                # Replayed sources end; live cameras may glitch briefly
+                if failures >= 30 or not self.cap.isOpened():
+                    break
+                time.sleep(0.01)
+                continue
+            
+            failures = 0
+            with self.condition:
+                self.seq += 1
+                self.buffer.append((self.seq, time.monotonic(), frame))
+                self.condition.notify_all()
+        
+        with self.condition:
+            self.eof = True
+            self.condition.notify_all()
+    
+    def stop(self, timeout: float = 2.0):
+        """Stop the thread and wait for it"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+    
+    def latest(self, after_seq: int = 0, timeout: float = 2.0) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Newest buffered frame, waiting only if none newer than after_seq exists
+        
+        Args:
+            after_seq: Only return frames with a higher sequence number
+            timeout: Maximum wait in seconds
+        
+        Returns:
+            Tuple (seq, timestamp, frame) or None on timeout/end of stream
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: (self.buffer and self.buffer[-1][0] > after_seq) or self.eof,
+                timeout)
+            if self.buffer and self.buffer[-1][0] > after_seq:
+                return self.buffer[-1]
+            return None
+    
+    def recent(self, count: int, timeout: float = 2.0) -> List[Tuple[int, float, np.ndarray]]:
+        """
+        Collect the newest `count` distinct frames (oldest first)
+        Uses what is buffered and waits only for the missing ones
+        
+        Args:
+            count: Number of frames
+            timeout: Maximum total wait in seconds
+        
+        Returns:
+            list: (seq, timestamp, frame) tuples, possibly fewer than count
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            frames = list(self.buffer)[-count:]
+            while len(frames) < count and not self.eof:
+                remaining = deadline - time.monotonic()
+                last_seq = frames[-1][0] if frames else 0
+                if remaining <= 0 or not self.condition.wait_for(
+                        lambda: (self.buffer and self.buffer[-1][0] > last_seq) or self.eof,
+                        remaining):
+                    break
+                frames.extend(f for f in self.buffer if f[0] > last_seq)
+        return frames[-count:]
+
+
+class ReplayCapture:
+    """
+    cv2.VideoCapture stand-in that replays a video file or a list of frames
+    Useful for testing capture code without a camera
+    """
+    
+    def __init__(self, source: Union[str, Sequence[np.ndarray]], fps: float = 30.0,
+                 loop: bool = False, realtime: bool = True):
+        """
+        Initialize replay source
+        
+        Args:
+            source: Video file path or sequence of frames
+            fps: Replay rate
+            loop: Restart at the end instead of reporting end of stream
+            realtime: Pace reads at fps like a live camera
+        """
+        self.fps = fps
+        self.loop = loop
+        self.realtime = realtime
+        self._video = None
+        self._frames = None
+        self._index = 0
+        self._next_time = None
+        self._opened = True
+        
+        if isinstance(source, str):
+            self._video = cv2.VideoCapture(source)
+            self._opened = self._video.isOpened()
+            video_fps = self._video.get(cv2.CAP_PROP_FPS)
+            if video_fps and video_fps > 0:
+                self.fps = video_fps
+        else:
+            self._frames = list(source)
+    
+    def isOpened(self) -> bool:
+        return self._opened
+    
+    def read(self, image: np.ndarray = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._opened:
+            return False, None
+        
+        if self.realtime:
+            now = time.monotonic()
+            if self._next_time is None:
+                self._next_time = now
+            if self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += 1.0 / self.fps
+        
+        if self._video is not None:
+            ret, frame = self._video.read()
+            if not ret and self.loop:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self._video.read()
+        else:
+            if self._index >= len(self._frames):
+                if not self.loop or not self._frames:
+                    return False, None
+                self._index = 0
+            frame = self._frames[self._index].copy()
+            self._index += 1
+            ret = True
+        
+        if ret and image is not None and image.shape == frame.shape:
+            image[...] = frame
+            frame = image
+        return ret, frame if ret else None
+    
+    def set(self, prop_id: int, value) -> bool:
+        return False
+    
+    def get(self, prop_id: int) -> float:
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+    
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+        self._opened = False
+
 
 class RPiCameraCapture:
     """
@@ -15,17 +204,27 @@ class RPiCameraCapture:
     Optimized for low-resource environments
     """
     
-    def __init__(self, camera_id: int = 0, resolution: Tuple[int, int] = (1920, 1440)):
+    def __init__(self, camera_id: int = 0, resolution: Tuple[int, int] = (1920, 1440),
+                 threaded: bool = False, buffer_size: int = 4, source=None):
         """
         Initialize camera capture
         
         Args:
             camera_id: Camera device ID (0 for default, 1+ for USB)
             resolution: Target resolution (width, height)
+            threaded: Read frames continuously in a background thread
+            buffer_size: Frames kept in the ring buffer (threaded mode)
+            source: Already opened VideoCapture-like object (e.g. ReplayCapture)
         """
         self.camera_id = camera_id
         self.resolution = resolution
+        self.threaded = threaded
+        self.buffer_size = buffer_size
+        self.source = source
         self.cap = None
+        self.grabber = None
+        self._last_seq = 0
+        self._frame_shape = None  # Actual frame shape once a capture_to() read differed
         self.connect()
     
     def connect(self) -> bool:
@@ -36,7 +235,7 @@ class RPiCameraCapture:
             bool: True if successful, False otherwise
         """
         try:
-            self.cap = cv2.VideoCapture(self.camera_id)
+            self.cap = self.source if self.source is not None else cv2.VideoCapture(self.camera_id)
             
             if not self.cap.isOpened():
                 print(f"❌ Failed to open camera {self.camera_id}")
@@ -56,6 +255,11 @@ class RPiCameraCapture:
                 pass
             
             print(f"✓ Camera {self.camera_id} connected at {self.resolution}")
+            
+            if self.threaded:
+                self.grabber = FrameGrabber(self.cap, buffer_size=self.buffer_size)
+                self.grabber.start()
+                print(f"✓ Frame grabber started (buffer: {self.buffer_size} frames)")
             return True
             
         except Exception as e:
@@ -76,8 +280,16 @@ class RPiCameraCapture:
             print("❌ Camera not connected")
             return None
         
+        if self.grabber is not None:
+            # Threaded mode: freshest buffered frame, no settle delay
+            latest = self.grabber.latest()
+            if latest is None:
+                print("❌ Failed to capture frame")
+                return None
+            self._last_seq = latest[0]
+            return latest[2]
+        
         try:
-            import time
             time.sleep(delay_ms / 1000.0)
             
             ret, frame = self.cap.read()
@@ -91,6 +303,69 @@ class RPiCameraCapture:
             print(f"❌ Capture error: {e}")
             return None
     
+    def capture_to(self, frames, delay_ms: int = 0, timeout: float = 5.0):
+        """
+        Capture one frame into a shared-memory slot (frame_transport.FramePool)
+        
+        Without the grabber thread the driver writes straight into the slot
+        (VideoCapture.read into a preallocated array). In threaded mode the
+        freshest buffered frame is copied in once.
+        
+        Args:
+            frames: FramePool shared with OCR worker processes
+            delay_ms: Delay before capture (allows focus/exposure settle)
+            timeout: Seconds to wait for a free slot
+        
+        Returns:
+            FrameRef holding one reference (release it when done), or None
+        """
+        shape = self._frame_shape or (self.resolution[1], self.resolution[0], 3)
+        if self.grabber is not None or int(np.prod(shape)) > frames.slot_bytes:
+            # Threaded, or the configured size exceeds a slot: capture, then copy
+            return self._put_frame(frames, self.capture(delay_ms), timeout)
+        
+        if not self.cap or not self.cap.isOpened():
+            print("❌ Camera not connected")
+            return None
+        
+        acquired = frames.acquire(shape, np.uint8, timeout)
+        if acquired is None:
+            print("❌ No free frame slot")
+            return None
+        ref, view = acquired
+        
+        try:
+            time.sleep(delay_ms / 1000.0)
+            ret, frame = self.cap.read(view)
+        except Exception as e:
+            print(f"❌ Capture error: {e}")
+            ret, frame = False, None
+        
+        if not ret:
+            frames.release(ref)
+            print("❌ Failed to capture frame")
+            return None
+        if frame is view or np.shares_memory(frame, view):
+            return ref
+        
+        # The driver delivered another size; remember it and copy this once
+        frames.release(ref)
+        self._frame_shape = frame.shape
+        return self._put_frame(frames, frame, timeout)
+    
+    def _put_frame(self, frames, frame: Optional[np.ndarray], timeout: float):
+        """Copy a captured frame into a slot (None if it failed or does not fit)"""
+        if frame is None:
+            return None
+        try:
+            ref = frames.put(frame, timeout)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return None
+        if ref is None:
+            print("❌ No free frame slot")
+        return ref
+    
     def capture_preview(self, duration_sec: int = 5, show_fps: bool = True) -> Optional[np.ndarray]:
         """
         Show live preview and capture after duration
@@ -106,7 +381,6 @@ class RPiCameraCapture:
             print("❌ Camera not connected")
             return None
         
-        import time
         start_time = time.time()
         frame_count = 0
         
@@ -114,7 +388,7 @@ class RPiCameraCapture:
         
         try:
             while time.time() - start_time < duration_sec:
-                ret, frame = self.cap.read()
+                ret, frame = self._read_next()
                 if not ret:
                     break
                 
@@ -149,6 +423,12 @@ class RPiCameraCapture:
         Returns:
             list: List of frames
         """
+        if self.grabber is not None:
+            # Threaded mode: frames already in the ring buffer, no sleeps
+            frames = [frame for _, _, frame in self.grabber.recent(num_frames)]
+            print(f"✓ Captured {len(frames)}/{num_frames} frames")
+            return frames
+        
         frames = []
         
         for i in range(num_frames):
@@ -161,6 +441,29 @@ class RPiCameraCapture:
         
         return frames
     
+    def capture_best(self, num_frames: int = 5, scorer=None) -> Tuple[Optional[np.ndarray], Optional[dict]]:
+        """
+        Capture a burst and keep only the best frame for OCR
+        
+        Args:
+            num_frames: Number of frames to consider
+            scorer: FrameQualityScorer (default settings if omitted)
+        
+        Returns:
+            Tuple (frame, score dict) or (None, None) if capture failed
+        """
+        if scorer is None:
+            from frame_quality import FrameQualityScorer
+            scorer = FrameQualityScorer()
+        
+        frames = self.capture_burst(num_frames, delay_ms=0 if self.grabber else 100)
+        frame, score = scorer.best(frames)
+        if frame is not None:
+            print(f"✓ Best frame {score['index'] + 1}/{len(frames)} "
+                  f"(score {score['score']:.2f}, sharpness {score['sharpness']:.0f}, "
+                  f"motion {score['motion']:.3f})")
+        return frame, score
+    
     def save_frame(self, frame: np.ndarray, filename: str) -> bool:
         """
         Save frame to disk
@@ -187,28 +490,159 @@ class RPiCameraCapture:
             print(f"❌ Save error: {e}")
             return False
     
+    def get_latest(self) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Freshest frame with its capture timestamp (threaded mode)
+        
+        Returns:
+            Tuple (frame, time.monotonic() timestamp) or None
+        """
+        if self.grabber is None:
+            return None
+        latest = self.grabber.latest()
+        if latest is None:
+            return None
+        return latest[2], latest[1]
+    
+    def next_frame(self) -> Optional[np.ndarray]:
+        """
+        Next frame in sequence (never returns the same frame twice)
+        
+        Returns:
+            np.ndarray or None at end of stream
+        """
+        ret, frame = self._read_next()
+        return frame if ret else None
+    
+    def _read_next(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Next frame from the grabber (threaded) or the device"""
+        if self.grabber is None:
+            return self.cap.read()
+        latest = self.grabber.latest(after_seq=self._last_seq)
+        if latest is None:
+            return False, None
+        self._last_seq = latest[0]
+        return True, latest[2]
+    
     def release(self):
         """Release camera resources"""
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
         if self.cap:
             self.cap.release()
             print("✓ Camera released")
 
 
-def detect_available_cameras() -> list:
+def _video_devices() -> Optional[List[str]]:
+    """
+    V4L2 device nodes with their change times, e.g. ["video0:1733392200123"]
+    
+    Returns:
+        Sorted list, or None where cameras aren't /dev/video* nodes (not Linux)
+    """
+    if not sys.platform.startswith("linux") or not os.path.isdir("/dev"):
+        return None
+    devices = []
+    for name in os.listdir("/dev"):
+        if name.startswith("video") and name[5:].isdigit():
+            try:
+                devices.append(f"{name}:{os.stat('/dev/' + name).st_ctime_ns}")
+            except OSError:
+                continue
+    return sorted(devices)
+
+
+def _probe_camera(index: int, found: Dict[int, bool]):
+    """Open one camera index and try to read a frame (runs on its own thread)"""
+    cap = cv2.VideoCapture(index)
+    try:
+        if cap.isOpened():
+            ret, _ = cap.read()
+            found[index] = bool(ret)
+    finally:
+        cap.release()
+
+
+def _load_camera_cache(cache_path: Path, devices: Optional[List[str]],
+                       max_index: int, ttl_sec: float) -> Optional[list]:
+    """Cached probe result if it is recent and the devices haven't changed"""
+    try:
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("devices") != devices or cached.get("max_index") != max_index:
+        return None
+    if time.time() - cached.get("time", 0) > ttl_sec:
+        return None
+    return cached.get("cameras")
+
+
+def _save_camera_cache(cache_path: Path, devices: Optional[List[str]],
+                       max_index: int, cameras: list):
+    """Store a probe result for later runs (best effort)"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"time": time.time(), "devices": devices,
+                       "max_index": max_index, "cameras": cameras}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def detect_available_cameras(max_index: int = 5, timeout: float = 3.0,
+                             use_cache: bool = True,
+                             cache_path: Path = CAMERA_CACHE,
+                             cache_ttl_sec: float = CAMERA_CACHE_TTL) -> list:
     """
     Detect available cameras on the system
     
+    Indices are probed concurrently, each on its own thread, so one slow or
+    hung device costs at most `timeout` instead of delaying the others.
+    On Linux only indices with a /dev/videoN node are opened. The result is
+    cached on disk and reused until the device nodes change or it expires.
+    
+    Args:
+        max_index: Check indices 0..max_index-1
+        timeout: Seconds to wait for all probes together
+        use_cache: Reuse a recent probe result
+        cache_path: Probe cache file
+        cache_ttl_sec: Age after which the cache is ignored
+    
     Returns:
         list: List of available camera indices
     """
-    available = []
+    devices = _video_devices()
+    if use_cache:
+        cached = _load_camera_cache(cache_path, devices, max_index, cache_ttl_sec)
+        if cached is not None:
+            return cached
     
-    for i in range(5):  # Check first 5 indices
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            ret, _ = cap.read()
-            if ret:
-                available.append(i)
-            cap.release()
+    indices = list(range(max_index))
+    if devices is not None:
+        names = {device.split(":")[0] for device in devices}
+        indices = [i for i in indices if f"video{i}" in names]
+    
+    found: Dict[int, bool] = {}
+    # Daemon threads: a device stuck in open() must not block exit
+    threads = [threading.Thread(target=_probe_camera, args=(i, found),
+                                name=f"camera-probe-{i}", daemon=True)
+               for i in indices]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    
+    hung = [i for i, thread in zip(indices, threads) if thread.is_alive()]
+    for i in hung:
+        print(f"⚠️  Camera {i} did not respond within {timeout:.1f}s")
     
+    available = sorted(i for i, ok in list(found.items()) if ok)
+    if not hung:
+        # A hung device might still come up, so only complete probes are cached
+        _save_camera_cache(cache_path, devices, max_index, available)
     return available
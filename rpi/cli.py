@@ -6,10 +6,19 @@ Simple script to run grading from terminal
 import argparse
 import sys
 import json
+from contextlib import nullcontext
 from pathlib import Path
 
-from pipeline import RPiPipeline
-from camera import RPiCameraCapture, detect_available_cameras
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.profiling.tracer import tracing
+
+# pipeline (torch, transformers, scikit-learn), camera and sheet templates
+# (OpenCV) are imported by the code paths that use them, so --help,
+# --list-cameras and argument errors return in a fraction of a second
+
+SHEET_TEMPLATES_FOLDER = Path(__file__).parent / "sheet_templates"
 
 
 def main():
@@ -25,11 +34,26 @@ Examples:
   # Capture from camera and grade
   python rpi_cli.py --camera 0 --answers "Answer1" "Answer2"
   
+  # Hands-free: grade a stack of sheets as they are placed under the camera
+  python rpi_cli.py --camera 0 --continuous --answer-file answers.json --results-dir graded/
+  
+  # Same, replaying a recorded video
+  python rpi_cli.py --video session.mp4 --continuous --answer-file answers.json
+  
+  # Grade every image dropped into a folder (scanner / phone sync), one warm model
+  python rpi_cli.py --watch ~/scans --answer-file answers.json
+  
   # Show available cameras
   python rpi_cli.py --list-cameras
   
   # Load answers from file
   python rpi_cli.py --image answer.jpg --answer-file answers.json
+  
+  # Read answers from the fixed boxes of a sheet template
+  python rpi_cli.py --image answer.jpg --answer-file answers.json --template example_5q
+  
+  # Profile one sheet (open trace.json in https://ui.perfetto.dev)
+  python rpi_cli.py --image answer.jpg --answer-file answers.json --trace trace.json
         """
     )
     
@@ -39,6 +63,10 @@ Examples:
                             help='Path to answer sheet image')
     input_group.add_argument('--camera', type=int,
                             help='Camera device ID (0 for default)')
+    input_group.add_argument('--video', type=str,
+                            help='Recorded video to use instead of a camera')
+    input_group.add_argument('--watch', type=str, metavar='DIR',
+                            help='Grade new images written to this folder until stopped')
     input_group.add_argument('--list-cameras', action='store_true',
                             help='List available cameras')
     
@@ -56,14 +84,60 @@ Examples:
                        help='Save results to JSON file')
     parser.add_argument('--preview', type=int, default=0,
                        help='Show camera preview for N seconds')
+    parser.add_argument('--burst', type=int, default=5,
+                       help='Frames to score; only the best one is graded (default: 5)')
+    parser.add_argument('--continuous', action='store_true',
+                       help='Grade every new page that settles in view until stopped')
+    parser.add_argument('--ocr-workers', type=int, default=0,
+                       help='Continuous mode: grade in N processes sharing frames via shared memory')
+    parser.add_argument('--max-sheets', type=int,
+                       help='Stop continuous or watch mode after N sheets')
+    parser.add_argument('--results-dir', type=str,
+                       help='Save one results JSON per sheet in this folder '
+                            '(watch mode default: next to each image)')
+    parser.add_argument('--journal', type=str,
+                       help='Watch mode journal (default: DIR/.grading_journal.jsonl)')
+    parser.add_argument('--poll', action='store_true',
+                       help='Watch mode: poll instead of inotify (network shares)')
+    parser.add_argument('--template', type=str,
+                       help='Sheet template JSON file or id in sheet_templates/')
+    parser.add_argument('--no-rectify', action='store_true',
+                       help='OCR the full frame instead of the detected sheet')
+    parser.add_argument('--no-deskew', action='store_true',
+                       help='Skip skew correction before line segmentation')
+    parser.add_argument('--low-memory', action='store_true',
+                       help='Memory-mapped model loading and memory-capped OCR batches')
+    parser.add_argument('--weight-dtype', choices=['fp16', 'bf16'],
+                       help='Keep model weights in half precision (upcast per layer)')
+    parser.add_argument('--target-latency-ms', type=float,
+                       help='Adapt resolution, batch size and decoding to hold this latency per sheet')
+    parser.add_argument('--rescan', action='store_true',
+                       help='List cameras: probe every device instead of using the cached result')
     parser.add_argument('--quiet', action='store_true',
                        help='Minimal output')
+    parser.add_argument('--trace', type=str,
+                       help='Write Chrome trace-event JSON to this file')
+    parser.add_argument('--trace-torch', action='store_true',
+                       help='Include torch profiler operator timings in trace')
     
     args = parser.parse_args()
     
+    # Traces cover one sheet in this process; a long session would grow the
+    # trace without bound and miss the OCR worker processes
+    if args.trace and (args.watch or args.continuous):
+        parser.error("--trace profiles a single sheet; not supported with --watch or --continuous")
+    if args.trace_torch and not args.trace:
+        parser.error("--trace-torch requires --trace")
+    if args.ocr_workers and not args.continuous:
+        parser.error("--ocr-workers is only supported with --continuous")
+    if args.ocr_workers < 0:
+        parser.error("--ocr-workers must be 0 or more")
+    
     # Handle list cameras
     if args.list_cameras:
-        cameras = detect_available_cameras()
+        from camera import detect_available_cameras
+        
+        cameras = detect_available_cameras(use_cache=not args.rescan)
         if cameras:
             print("📷 Available cameras:")
             for cam_id in cameras:
@@ -93,17 +167,119 @@ Examples:
         print("❌ No answer key provided")
         sys.exit(1)
     
+    # Reject unusable sources before the model is loaded
+    if args.watch and not Path(args.watch).is_dir():
+        print(f"❌ Not a folder: {args.watch}")
+        sys.exit(1)
+    if args.continuous and not args.watch and args.video is None and args.camera is None:
+        print("❌ --continuous needs --camera or --video")
+        sys.exit(1)
+    if args.video and not args.continuous:
+        print("❌ --video is only supported with --continuous")
+        sys.exit(1)
+    
+    # Load sheet template
+    template = None
+    if args.template:
+        from src.processing.sheet_template import load_template
+        
+        try:
+            template = load_template(args.template, SHEET_TEMPLATES_FOLDER)
+            print(f"✓ Loaded template {template.template_id} ({template.num_questions} questions)")
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to load template: {e}")
+            sys.exit(1)
+    
     # Initialize pipeline
-    pipeline = RPiPipeline(threshold=args.threshold)
+    from pipeline import RPiPipeline
+    
+    pipeline = RPiPipeline(threshold=args.threshold, rectify=not args.no_rectify,
+                           deskew=not args.no_deskew, low_memory=args.low_memory,
+                           weight_dtype=args.weight_dtype)
+    pipeline.set_template(template)
+    if args.target_latency_ms:
+        from governor import ResourceGovernor
+        
+        pipeline.set_governor(ResourceGovernor(pipeline, target_ms=args.target_latency_ms))
     
     try:
+        # Watch-folder mode: one warm pipeline for every incoming file
+        if args.watch:
+            from watch import FolderWatcher, GradingJournal, WatchGrader
+            
+            def report_file(path, results):
+                summary = results.get("summary")
+                if summary:
+                    print(f"✅ {path.name}: {summary['percentage']:.1f}% "
+                          f"({summary['passed']}/{summary['total_questions']})")
+                else:
+                    print(f"❌ {path.name}: {results.get('error')}")
+            
+            watcher = FolderWatcher(args.watch, use_inotify=not args.poll)
+            journal = GradingJournal(args.journal) if args.journal else None
+            grader = WatchGrader(watcher, pipeline, answer_key, journal=journal,
+                                 results_dir=args.results_dir, on_result=report_file)
+            stats = grader.run(max_sheets=args.max_sheets)
+            
+            print("\n" + "="*60)
+            print(f"📈 {stats['graded']} graded, {stats['failed']} failed in "
+                  f"{stats['elapsed_sec']:.1f}s (mean {stats['mean_grade_sec']:.2f}s per sheet)")
+            sys.exit(0)
+        
+        # Continuous capture-to-grade mode
+        if args.continuous:
+            from camera import RPiCameraCapture, ReplayCapture
+            from continuous import ContinuousGrader
+            
+            # Fork OCR processes before the camera threads start
+            ocr_pool = None
+            if args.ocr_workers > 0:
+                from frame_transport import FramePool, OCRWorkerPool
+                
+                ocr_pool = OCRWorkerPool(pipeline, FramePool(slots=2 * args.ocr_workers),
+                                         workers=args.ocr_workers)
+                ocr_pool.start()
+            
+            if args.video:
+                camera = RPiCameraCapture(source=ReplayCapture(args.video, realtime=False))
+            else:
+                camera = RPiCameraCapture(camera_id=args.camera, threaded=True)
+            
+            def report(sheet, results):
+                summary = results.get("summary")
+                if summary:
+                    print(f"✅ Sheet {sheet}: {summary['percentage']:.1f}% "
+                          f"({summary['passed']}/{summary['total_questions']}) "
+                          f"in {results['ocr_seconds']:.1f}s")
+                else:
+                    print(f"❌ Sheet {sheet}: {results.get('error')}")
+            
+            grader = ContinuousGrader(camera, pipeline, answer_key,
+                                      results_dir=args.results_dir,
+                                      on_result=report, ocr_pool=ocr_pool)
+            stats = grader.run(max_sheets=args.max_sheets)
+            camera.release()
+            if ocr_pool is not None:
+                ocr_pool.stop()
+                ocr_pool.frames.close()
+            
+            print("\n" + "="*60)
+            print(f"📈 {stats['sheets']} sheets ({stats['failed']} failed) in {stats['elapsed_sec']:.1f}s "
+                  f"({stats['sheets_per_minute']:.1f} sheets/min, "
+                  f"mean OCR {stats['mean_ocr_sec']:.2f}s)")
+            sys.exit(0)
+        
         # Handle camera input
         if args.camera is not None:
+            from camera import RPiCameraCapture
+            
             print(f"📷 Initializing camera {args.camera}...")
-            camera = RPiCameraCapture(camera_id=args.camera)
+            camera = RPiCameraCapture(camera_id=args.camera, threaded=True)
             
             if args.preview:
                 frame = camera.capture_preview(duration_sec=args.preview)
+            elif args.burst > 1:
+                frame, _ = camera.capture_best(args.burst)
             else:
                 frame = camera.capture()
             
@@ -122,9 +298,12 @@ Examples:
         else:
             image_path = args.image
         
-        # Run pipeline
-        results = pipeline.full_pipeline(image_path, answer_key, 
-                                        save_output=args.output)
+        # Run pipeline (optionally traced)
+        trace_ctx = (tracing(args.trace, torch_profiler=args.trace_torch)
+                     if args.trace else nullcontext())
+        with trace_ctx:
+            results = pipeline.full_pipeline(image_path, answer_key, 
+                                            save_output=args.output)
         
         # Print results
         if not args.quiet:
@@ -0,0 +1,268 @@
+"""
+Hands-free continuous grading for a stack of answer sheets
+The camera loop detects each new, settled page while OCR of the previous
+page runs concurrently on a worker thread
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from frame_quality import FrameQualityScorer
+
+
+class PageChangeDetector:
+    """
+    Detects when a new page is present and has stopped moving
+
+    A page is accepted once the stream has been still for `still_frames`
+    consecutive frames, the view was disturbed since the last accepted page
+    (a sheet being placed or swapped), and the frame is sharp enough to
+    contain text. Sheets of the same template look almost identical when
+    still, so the disturbance, not the page difference, marks a new sheet.
+    """
+
+    def __init__(self, scorer: FrameQualityScorer = None, still_threshold: float = 0.01,
+                 still_frames: int = 5, change_threshold: float = 0.05,
+                 min_sharpness: float = 30.0):
+        """
+        Initialize detector
+
+        Args:
+            scorer: Frame scorer used for downscaling and measurements
+            still_threshold: Max frame-to-frame difference (0-1) counted as still
+            still_frames: Consecutive still frames before a page is accepted
+            change_threshold: Frame difference (0-1) that counts as a disturbance
+            min_sharpness: Min Laplacian variance (rejects empty table / blur)
+        """
+        self.scorer = scorer or FrameQualityScorer()
+        self.still_threshold = still_threshold
+        self.still_frames = still_frames
+        self.change_threshold = change_threshold
+        self.min_sharpness = min_sharpness
+        self.reset()
+
+    def reset(self):
+        """Forget the previous page and motion history"""
+        self._previous = None
+        self._last_page = None
+        self._still_count = 0
+        self._disturbed = True
+
+    def update(self, frame: np.ndarray) -> bool:
+        """
+        Feed one frame
+
+        Args:
+            frame: Camera frame
+
+        Returns:
+            bool: True if this frame shows a new settled page
+        """
+        small = self.scorer.prepare(frame)
+        previous, self._previous = self._previous, small
+
+        if previous is None:
+            return False
+
+        motion = self.scorer.motion(small, previous)
+        if motion > self.change_threshold:
+            self._disturbed = True
+        if motion > self.still_threshold:
+            self._still_count = 0
+            return False
+
+        self._still_count += 1
+        if self._still_count != self.still_frames:
+            return False  # Not settled yet, or this page was already handled
+
+        if not self._disturbed and self._last_page is not None and \
+                self.scorer.motion(small, self._last_page) < self.change_threshold:
+            return False  # Same page as before
+
+        if self.scorer.sharpness(small) < self.min_sharpness:
+            return False  # Nothing with text in view
+
+        self._last_page = small
+        self._disturbed = False
+        return True
+
+
+class ContinuousGrader:
+    """
+    Overlaps capture and grading: frames stay in memory and are handed to
+    an OCR worker while the camera loop keeps watching for the next page
+    """
+
+    def __init__(self, camera, pipeline, answer_key: List[str],
+                 detector: PageChangeDetector = None, workers: int = 1,
+                 results_dir: Optional[str] = None,
+                 on_result: Optional[Callable[[int, Dict], None]] = None,
+                 ocr_pool=None, max_pending: Optional[int] = None):
+        """
+        Initialize continuous grader
+
+        Args:
+            camera: RPiCameraCapture (threaded for live cameras)
+            pipeline: RPiPipeline
+            answer_key: List of correct answers
+            detector: Page change detector
+            workers: Concurrent OCR workers (only with ocr_pool; one RPiPipeline
+                     grades one sheet at a time)
+            results_dir: Optional folder to save one JSON per sheet
+            on_result: Callback(sheet_number, results) when a sheet is graded
+            ocr_pool: Started frame_transport.OCRWorkerPool; sheets are then
+                      graded in its processes (one worker thread per process)
+            max_pending: Sheets held in memory while waiting for or in OCR
+                         (default: one queued sheet per worker). When full,
+                         the camera loop waits instead of queueing more frames
+        """
+        self.camera = camera
+        self.pipeline = pipeline
+        self.detector = detector or PageChangeDetector()
+        self.ocr_pool = ocr_pool
+        if ocr_pool is not None:
+            self.workers = ocr_pool.workers
+        else:
+            if workers > 1:
+                print("⚠️  In-process grading uses one worker (use ocr_pool for more)")
+            self.workers = 1
+        self.answer_key = answer_key
+        self.results_dir = Path(results_dir) if results_dir else None
+        self.on_result = on_result
+        self.pipeline.set_answer_key(answer_key)
+        self.max_pending = max(1, max_pending or self.workers + 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+        self.sheets = 0
+        self.completed = 0
+        self.failed = 0
+        self.ocr_seconds = 0.0
+        self.backlog_waits = 0
+        self.started = None
+        self._lock = threading.Lock()
+
+    def _grade(self, sheet: int, frame: np.ndarray) -> Dict:
+        """OCR + grading of one sheet (runs on a worker thread)"""
+        start = time.perf_counter()
+        try:
+            if self.ocr_pool is not None:
+                results = self._grade_in_worker(frame)
+            else:
+                results = self.pipeline.grade_frame(frame)
+        except Exception as e:
+            results = {"error": f"Grading failed: {e}", "success": False}
+        elapsed = time.perf_counter() - start
+        results["sheet"] = sheet
+        results["ocr_seconds"] = round(elapsed, 3)
+
+        if self.results_dir is not None:
+            try:
+                self.results_dir.mkdir(parents=True, exist_ok=True)
+                path = self.results_dir / f"sheet_{sheet:04d}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+                with open(path, 'w') as f:
+                    json.dump(results, f, indent=2)
+            except OSError as e:
+                results["success"] = False
+                results["error"] = f"Failed to save result: {e}"
+
+        with self._lock:
+            self.ocr_seconds += elapsed
+            if results.get("success"):
+                self.completed += 1
+            else:
+                self.failed += 1
+
+        if self.on_result:
+            self.on_result(sheet, results)
+        return results
+
+    def _grade_in_worker(self, frame: np.ndarray) -> Dict:
+        """Copy the sheet into a shared-memory slot and grade it in an OCR process"""
+        frames = self.ocr_pool.frames
+        ref = frames.put(frame, timeout=30)
+        if ref is None:
+            return {"error": "No free frame slot", "success": False}
+        try:
+            return self.ocr_pool.grade(ref, self.answer_key)
+        except RuntimeError as e:
+            return {"error": str(e), "success": False}
+        finally:
+            frames.release(ref)
+
+    def run(self, max_sheets: Optional[int] = None,
+            duration_sec: Optional[float] = None) -> Dict:
+        """
+        Watch the camera and grade pages until stopped
+
+        Args:
+            max_sheets: Stop after this many sheets
+            duration_sec: Stop after this many seconds
+
+        Returns:
+            Dict with throughput statistics
+        """
+        self.started = time.time()
+        pending: List[Future] = []
+        frames_seen = 0
+
+        print("🔁 Continuous mode: place sheets one at a time (Ctrl+C to stop)")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr") as pool:
+            try:
+                while True:
+                    if max_sheets is not None and self.sheets >= max_sheets:
+                        break
+                    if duration_sec is not None and time.time() - self.started >= duration_sec:
+                        break
+
+                    frame = self.camera.next_frame()
+                    if frame is None:
+                        break  # End of stream
+                    frames_seen += 1
+
+                    if self.detector.update(frame):
+                        self.sheets += 1
+                        print(f"📄 Sheet {self.sheets} detected, grading in background")
+                        if not self._slots.acquire(blocking=False):
+                            # Full-resolution frames would pile up on a slow Pi
+                            self.backlog_waits += 1
+                            print(f"⏳ {self.max_pending} sheets waiting for OCR, pausing camera")
+                            self._slots.acquire()
+                        future = pool.submit(self._grade, self.sheets, frame)
+                        future.add_done_callback(lambda _: self._slots.release())
+                        pending.append(future)
+                        pending = self._reap(pending)
+            except KeyboardInterrupt:
+                print("\n⏹️  Stopping, finishing queued sheets...")
+
+            for future in pending:
+                future.exception()  # Wait
+            self._reap(pending)
+
+        return self.stats(frames_seen)
+
+    def _reap(self, pending: List[Future]) -> List[Future]:
+        """Surface errors of finished sheets (e.g. in on_result), keep the rest"""
+        for future in pending:
+            if future.done() and future.exception() is not None:
+                print(f"❌ Sheet error: {future.exception()}")
+        return [future for future in pending if not future.done()]
+
+    def stats(self, frames_seen: int = 0) -> Dict:
+        """Throughput statistics"""
+        elapsed = time.time() - self.started if self.started else 0.0
+        return {
+            "sheets": self.completed,
+            "failed": self.failed,
+            "frames": frames_seen,
+            "backlog_waits": self.backlog_waits,
+            "elapsed_sec": round(elapsed, 2),
+            "sheets_per_minute": round(self.completed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "mean_ocr_sec": (round(self.ocr_seconds / (self.completed + self.failed), 3)
+                             if self.completed + self.failed else 0.0)
+        }
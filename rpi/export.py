@@ -0,0 +1,468 @@
+"""
+Bulk gradebook export for Raspberry Pi
+Streams every stored result into a flat student x question gradebook and
+a long per-question table, as CSV or Parquet, one result file at a time
+
+Usage (from rpi/):
+    python3 export.py --out gradebook.csv
+    python3 export.py --out gradebook.parquet --key-id midterm
+    python3 export.py --table answers --out - > answers.csv
+"""
+
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from storage import is_result_file, load_result_file
+
+RESULTS_FOLDER = Path(__file__).parent / "results"
+
+TABLES = ("gradebook", "answers")
+FORMATS = ("csv", "parquet")
+
+# Fixed leading columns of each table and their Parquet types
+SHEET_COLUMNS = [
+    ("result_file", "string"),
+    ("image", "string"),
+    ("graded_at", "string"),
+    ("key_id", "string"),
+    ("key_version", "int64"),
+    ("template_id", "string"),
+]
+GRADEBOOK_COLUMNS = SHEET_COLUMNS + [
+    ("total_questions", "int64"),
+    ("passed", "int64"),
+    ("percentage", "float64"),
+    ("threshold", "float64"),
+]
+ANSWER_COLUMNS = SHEET_COLUMNS + [
+    ("question", "int64"),
+    ("expected", "string"),
+    ("student", "string"),
+    ("similarity", "float64"),
+    ("passed", "int64"),
+]
+
+# result_20251205_103000_123456.json(.gz) as written by the server
+_STAMP = re.compile(r"(\d{8})_(\d{6})")
+
+
+def graded_time(path: Path) -> datetime:
+    """Grading time from the result filename (file mtime if it has none)"""
+    match = _STAMP.search(path.name)
+    if match:
+        try:
+            return datetime.strptime("".join(match.groups()), "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(path.stat().st_mtime).replace(microsecond=0)
+
+
+def graded_at(path: Path) -> str:
+    """Grading time of a result as ISO text"""
+    return graded_time(path).isoformat()
+
+
+def parse_since(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """
+    Parse a --since / ?since= filter
+
+    Args:
+        value: ISO date or date/time (e.g. 2025-12-01 or 2025-12-01T08:30), or None
+
+    Returns:
+        Local naive datetime, or None for no filter
+
+    Raises:
+        ValueError: If value is not an ISO date/time
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            raise ValueError(f"since must be an ISO date or date/time "
+                             f"(e.g. 2025-12-01 or 2025-12-01T08:30), got {value!r}")
+    if value.tzinfo is not None:
+        # Result timestamps are local wall-clock time
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def iter_results(results_dir: Path, key_id: Optional[str] = None,
+                 since: Optional[datetime] = None) -> Iterator[Tuple[Path, Dict]]:
+    """
+    Yield successful stored results, oldest first, one file at a time
+
+    Args:
+        results_dir: Folder with result files (plain or gzip JSON)
+        key_id: Only results graded against this answer key
+        since: Only results graded on or after this time (see parse_since)
+
+    Yields:
+        Tuple (path, result dict)
+    """
+    # Only the names are held in memory, never the results
+    names = sorted(entry.name for entry in os.scandir(results_dir)
+                   if entry.is_file() and is_result_file(entry.name))
+    for name in names:
+        path = Path(results_dir) / name
+        try:
+            if since is not None and graded_time(path) < since:
+                continue
+            result = load_result_file(path)
+        except (OSError, ValueError) as e:
+            # Evicted mid-export or truncated
+            print(f"⚠️  Skipping {name}: {e}", file=sys.stderr)
+            continue
+        if not isinstance(result, dict) or not result.get("success") or "summary" not in result:
+            continue
+        if key_id is not None and str(result.get("key_id")) != key_id:
+            continue
+        yield path, result
+
+
+def question_items(result: Dict) -> Iterator[Tuple[int, Dict]]:
+    """(question number, answer) pairs of a result, in question order"""
+    # JSON turns the int question keys into strings
+    questions = [(int(key), value) for key, value in result.items()
+                 if str(key).isdigit() and isinstance(value, dict)]
+    return iter(sorted(questions, key=lambda item: item[0]))
+
+
+def _sheet_fields(path: Path, result: Dict) -> Dict:
+    """Columns shared by both tables"""
+    return {
+        "result_file": path.name,
+        "image": Path(result["image"]).name if result.get("image") else None,
+        "graded_at": graded_at(path),
+        "key_id": result.get("key_id"),
+        "key_version": result.get("key_version"),
+        "template_id": result.get("template_id"),
+    }
+
+
+def _passed(answer: Dict, threshold: Optional[float]) -> int:
+    """1 if the answer passed, else 0"""
+    if threshold is not None and answer.get("similarity") is not None:
+        return int(answer["similarity"] >= threshold)
+    return int("PASS" in str(answer.get("status", "")))
+
+
+def gradebook_row(path: Path, result: Dict, questions: int) -> Dict:
+    """
+    One gradebook row: sheet fields, summary, then q<N> (1 = pass) and
+    q<N>_similarity for questions 1..questions
+
+    Args:
+        path: Result file
+        result: Stored result
+        questions: Question columns in the table
+
+    Returns:
+        Dict keyed by column name
+    """
+    summary = result.get("summary", {})
+    threshold = summary.get("threshold")
+    row = _sheet_fields(path, result)
+    row.update({
+        "total_questions": summary.get("total_questions"),
+        "passed": summary.get("passed"),
+        "percentage": round(summary["percentage"], 2) if summary.get("percentage") is not None else None,
+        "threshold": threshold,
+    })
+    for number in range(1, questions + 1):
+        row[f"q{number}"] = None
+        row[f"q{number}_similarity"] = None
+    for number, answer in question_items(result):
+        if number <= questions:
+            row[f"q{number}"] = _passed(answer, threshold)
+            if answer.get("similarity") is not None:
+                row[f"q{number}_similarity"] = round(answer["similarity"], 4)
+    return row
+
+
+def answer_rows(path: Path, result: Dict) -> Iterator[Dict]:
+    """
+    Long-table rows: one per answered question
+
+    Args:
+        path: Result file
+        result: Stored result
+
+    Yields:
+        Dict keyed by column name
+    """
+    sheet = _sheet_fields(path, result)
+    threshold = result.get("summary", {}).get("threshold")
+    for number, answer in question_items(result):
+        similarity = answer.get("similarity")
+        yield dict(sheet,
+                   question=number,
+                   expected=answer.get("expected"),
+                   student=answer.get("student"),
+                   similarity=round(similarity, 4) if similarity is not None else None,
+                   passed=_passed(answer, threshold))
+
+
+class _ChunkSink:
+    """Write-only file object collecting bytes until the caller drains them"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class GradebookExporter:
+    """
+    Streams stored results into a gradebook or answers table
+
+    Results are read one file at a time and rows leave in chunks, so memory
+    stays flat however many sheets are stored. The gradebook needs its
+    question columns up front: unless `questions` is given, one extra pass
+    over the files finds the largest sheet first.
+    """
+
+    def __init__(self, results_dir: Path = RESULTS_FOLDER, table: str = "gradebook",
+                 key_id: Optional[str] = None, since: Union[str, datetime, None] = None,
+                 questions: Optional[int] = None, chunk_rows: int = 500):
+        """
+        Initialize exporter
+
+        Args:
+            results_dir: Folder with result files
+            table: 'gradebook' (one row per sheet) or 'answers' (one row per question)
+            key_id: Only results graded against this answer key
+            since: Only results graded on or after this ISO date/time
+            questions: Question columns of the gradebook (scanned if omitted)
+            chunk_rows: Rows per CSV chunk / Parquet row group
+
+        Raises:
+            ValueError: On an unknown table or a malformed since
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table} (expected one of {', '.join(TABLES)})")
+        self.results_dir = Path(results_dir)
+        self.table = table
+        self.key_id = key_id
+        self.since = parse_since(since)
+        self.questions = questions
+        self.chunk_rows = max(1, chunk_rows)
+        self.exported = 0
+
+    def _results(self) -> Iterator[Tuple[Path, Dict]]:
+        return iter_results(self.results_dir, key_id=self.key_id, since=self.since)
+
+    def count_questions(self) -> int:
+        """Largest number of questions on any exported sheet"""
+        if self.questions is None:
+            self.questions = max((number for _, result in self._results()
+                                  for number, _ in question_items(result)), default=0)
+        return self.questions
+
+    def columns(self) -> List[Tuple[str, str]]:
+        """(name, Parquet type) of every column"""
+        if self.table == "answers":
+            return list(ANSWER_COLUMNS)
+        columns = list(GRADEBOOK_COLUMNS)
+        for number in range(1, self.count_questions() + 1):
+            columns += [(f"q{number}", "int64"), (f"q{number}_similarity", "float64")]
+        return columns
+
+    def rows(self) -> Iterator[Dict]:
+        """Table rows, one result file at a time"""
+        questions = self.count_questions() if self.table == "gradebook" else 0
+        self.exported = 0
+        for path, result in self._results():
+            self.exported += 1
+            if self.table == "gradebook":
+                yield gradebook_row(path, result, questions)
+            else:
+                yield from answer_rows(path, result)
+
+    def _chunks(self) -> Iterator[List[Dict]]:
+        """Rows grouped into lists of chunk_rows"""
+        chunk = []
+        for row in self.rows():
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def iter_csv(self) -> Iterator[str]:
+        """CSV text in chunks, header first"""
+        names = [name for name, _ in self.columns()]
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=names, lineterminator="\n")
+        writer.writeheader()
+        for chunk in self._chunks():
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def iter_parquet(self) -> Iterator[bytes]:
+        """Parquet file bytes, one row group at a time (needs pyarrow)"""
+        pa, pq = _require_pyarrow()
+        schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in self.columns()])
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        try:
+            for chunk in self._chunks():
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def iter_bytes(self, fmt: str = "csv") -> Iterator[bytes]:
+        """Encoded output in the given format ('csv' or 'parquet')"""
+        if fmt == "parquet":
+            return self.iter_parquet()
+        if fmt == "csv":
+            return (text.encode("utf-8") for text in self.iter_csv())
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+
+    def write(self, path: str, fmt: Optional[str] = None) -> int:
+        """
+        Write the table to a file ('-' for stdout)
+
+        Args:
+            path: Output file
+            fmt: 'csv' or 'parquet' (from the extension if omitted)
+
+        Returns:
+            int: Result files exported
+        """
+        fmt = fmt or format_for(path)
+        if path == "-":
+            out = sys.stdout.buffer
+            for data in self.iter_bytes(fmt):
+                out.write(data)
+            out.flush()
+            return self.exported
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                for data in self.iter_bytes(fmt):
+                    f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return self.exported
+
+
+def format_for(path: str) -> str:
+    """Output format from a file extension (CSV unless .parquet/.pq)"""
+    return "parquet" if str(path).lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def parquet_available() -> bool:
+    """Whether pyarrow is installed"""
+    try:
+        _require_pyarrow()
+        return True
+    except ImportError:
+        return False
+
+
+def _require_pyarrow():
+    """Import pyarrow lazily (optional dependency)"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def answers_path(path: str) -> str:
+    """Companion answers-table path: gradebook.csv -> gradebook_answers.csv"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_answers{ext}"
+
+
+def main():
+    """Export stored results from the command line"""
+    parser = argparse.ArgumentParser(
+        description='Export stored results as a gradebook (CSV or Parquet)')
+    parser.add_argument('--out', required=True,
+                        help="Output file, .csv or .parquet ('-' for stdout)")
+    parser.add_argument('--table', choices=TABLES + ("both",), default="both",
+                        help="Table to write; 'both' also writes <out>_answers (default)")
+    parser.add_argument('--format', choices=FORMATS,
+                        help='Output format (default: from the extension)')
+    parser.add_argument('--results-dir', default=str(RESULTS_FOLDER),
+                        help='Folder with stored results (default: rpi/results)')
+    parser.add_argument('--key-id', help='Only results graded against this answer key')
+    parser.add_argument('--since',
+                        help='Only results graded on or after this date or time '
+                             '(YYYY-MM-DD or YYYY-MM-DDTHH:MM)')
+    parser.add_argument('--questions', type=int,
+                        help='Question columns in the gradebook (default: scan the results)')
+    args = parser.parse_args()
+    try:
+        since = parse_since(args.since)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not Path(args.results_dir).is_dir():
+        print(f"❌ Not a folder: {args.results_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    fmt = args.format or format_for(args.out)
+    if fmt == "parquet" and not parquet_available():
+        print("❌ Parquet export needs pyarrow: pip install pyarrow", file=sys.stderr)
+        sys.exit(1)
+
+    tables = TABLES if args.table == "both" else (args.table,)
+    if args.out == "-" and len(tables) > 1:
+        tables = tables[:1]  # A single stream holds one table
+
+    for table in tables:
+        out = answers_path(args.out) if table == "answers" and args.table == "both" else args.out
+        exporter = GradebookExporter(args.results_dir, table=table, key_id=args.key_id,
+                                     since=since, questions=args.questions)
+        count = exporter.write(out, fmt)
+        if out != "-":
+            print(f"✓ {table}: {count} results → {out}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
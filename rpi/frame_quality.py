@@ -0,0 +1,147 @@
+"""
+Frame quality scoring for camera capture
+Picks the sharpest, steadiest, well-exposed frame before running OCR
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class FrameQualityScorer:
+    """
+    Scores frames on a small grayscale copy so it keeps up with the camera
+    Combines variance of the Laplacian, frame-to-frame motion and exposure
+    """
+
+    def __init__(self, analysis_width: int = 320, sharpness_ref: float = 100.0,
+                 motion_ref: float = 0.02, clip_low: int = 10, clip_high: int = 245):
+        """
+        Initialize scorer
+
+        Args:
+            analysis_width: Width of the downscaled copy used for scoring
+            sharpness_ref: Laplacian variance that maps to a 0.5 sharpness score
+            motion_ref: Mean absolute difference (0-1) that halves the score
+            clip_low: Gray levels at or below count as underexposed
+            clip_high: Gray levels at or above count as overexposed
+        """
+        self.analysis_width = analysis_width
+        self.sharpness_ref = sharpness_ref
+        self.motion_ref = motion_ref
+        self.clip_low = clip_low
+        self.clip_high = clip_high
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Downscaled grayscale copy of a frame
+
+        Args:
+            frame: BGR or grayscale frame
+
+        Returns:
+            np.ndarray: Small grayscale image
+        """
+        height, width = frame.shape[:2]
+        scale = self.analysis_width / width
+        if scale < 1:
+            frame = cv2.resize(frame, (self.analysis_width, max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def sharpness(self, small: np.ndarray) -> float:
+        """Variance of the Laplacian (higher is sharper)"""
+        return float(cv2.Laplacian(small, cv2.CV_32F).var())
+
+    def motion(self, small: np.ndarray, other: np.ndarray) -> float:
+        """Mean absolute difference between two small frames (0-1)"""
+        if small.shape != other.shape:
+            return 1.0
+        return float(cv2.absdiff(small, other).mean()) / 255.0
+
+    def exposure(self, small: np.ndarray) -> Dict[str, float]:
+        """
+        Histogram-based exposure check
+
+        Returns:
+            Dict with clipped fractions, mean brightness and a 0-1 score
+        """
+        hist = cv2.calcHist([small], [0], None, [256], [0, 256]).ravel()
+        total = hist.sum() or 1.0
+        under = float(hist[:self.clip_low + 1].sum() / total)
+        over = float(hist[self.clip_high:].sum() / total)
+        mean = float(np.dot(hist, np.arange(256)) / total)
+
+        # Penalize clipping, and brightness far from mid-range
+        score = (1.0 - min(1.0, 4 * (under + over))) * (1.0 - abs(mean - 128) / 255.0)
+        return {"underexposed": under, "overexposed": over,
+                "brightness": mean, "score": max(0.0, score)}
+
+    def score(self, frame: np.ndarray, neighbors: Optional[List[np.ndarray]] = None) -> Dict[str, float]:
+        """
+        Score one frame
+
+        Args:
+            frame: Frame to score
+            neighbors: Small grayscale copies of adjacent frames for motion
+
+        Returns:
+            Dict with component scores and the combined 'score'
+        """
+        return self._score_small(self.prepare(frame), neighbors)
+
+    def _score_small(self, small: np.ndarray,
+                     neighbors: Optional[List[np.ndarray]] = None) -> Dict[str, float]:
+        """Score an already downscaled grayscale frame"""
+        sharpness = self.sharpness(small)
+        exposure = self.exposure(small)
+        # A frame is steady if it matches at least one neighbor
+        motion = (min(self.motion(small, n) for n in neighbors)
+                  if neighbors else 0.0)
+
+        sharpness_score = sharpness / (sharpness + self.sharpness_ref)
+        motion_score = 1.0 / (1.0 + motion / self.motion_ref)
+        combined = sharpness_score * motion_score * exposure["score"]
+
+        return {
+            "score": combined,
+            "sharpness": sharpness,
+            "motion": motion,
+            "exposure": exposure["score"],
+            "brightness": exposure["brightness"]
+        }
+
+    def score_burst(self, frames: List[np.ndarray]) -> List[Dict[str, float]]:
+        """
+        Score a burst; motion of each frame is measured against its neighbors
+
+        Args:
+            frames: Frames in capture order
+
+        Returns:
+            list: Score dict per frame
+        """
+        smalls = [self.prepare(frame) for frame in frames]
+        scores = []
+        for i, small in enumerate(smalls):
+            neighbors = [smalls[j] for j in (i - 1, i + 1) if 0 <= j < len(smalls)]
+            scores.append(self._score_small(small, neighbors))
+        return scores
+
+    def best(self, frames: List[np.ndarray]):
+        """
+        Highest-scoring frame of a burst
+
+        Args:
+            frames: Frames in capture order
+
+        Returns:
+            Tuple (frame, score dict) or (None, None) if frames is empty
+        """
+        if not frames:
+            return None, None
+        scores = self.score_burst(frames)
+        index = int(np.argmax([s["score"] for s in scores]))
+        return frames[index], dict(scores[index], index=index)
@@ -0,0 +1,476 @@
+"""
+Shared-memory frame transport for multi-process OCR on Raspberry Pi
+Frames live in a fixed pool of reusable shared-memory slots. Processes pass
+small FrameRef descriptors and map the same pages as NumPy views, so a
+multi-megabyte frame is never pickled through a queue or written to disk
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# One full-resolution BGR camera frame (RPiCameraCapture default 1920x1440)
+DEFAULT_SLOT_BYTES = 1920 * 1440 * 3
+
+
+class FrameRef(NamedTuple):
+    """Descriptor of a frame in a FramePool slot; this is all that crosses processes"""
+    slot: int
+    generation: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _context():
+    """fork where available: children inherit the pool and the loaded model"""
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return mp.get_context()
+
+
+class FramePool:
+    """
+    Fixed pool of equally sized shared-memory frame slots
+
+    One segment holds a small header (reference count and generation per
+    slot) followed by the slots. A slot is taken with acquire()/put() with
+    one reference; every extra holder calls retain(), and each holder calls
+    release() exactly once. The slot is reused when the count drops to 0.
+    The generation changes on every reuse, so a stale FrameRef is rejected
+    instead of silently reading the next frame.
+
+    Create the pool before forking the processes that use it.
+    """
+
+    def __init__(self, slots: int = 4, slot_bytes: int = DEFAULT_SLOT_BYTES, context=None):
+        """
+        Initialize pool and allocate the shared segment
+
+        Args:
+            slots: Frames that can be in flight at once
+            slot_bytes: Capacity of each slot (largest frame in bytes)
+            context: multiprocessing context for the lock (fork if available)
+        """
+        if slots < 1 or slot_bytes < 1:
+            raise ValueError("slots and slot_bytes must be positive")
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        # Keep slots 64-byte aligned after the header
+        self._header_bytes = -(-2 * 8 * slots // 64) * 64
+        self.shm = shared_memory.SharedMemory(create=True,
+                                              size=self._header_bytes + slots * slot_bytes)
+        self._owner_pid = os.getpid()
+        self._cond = (context or _context()).Condition()
+        self._map_header()
+        self.refcounts[:] = 0
+        self.generations[:] = 0
+        self.waits = 0
+
+    def _map_header(self):
+        """Per-slot counters as int64 arrays over the segment header"""
+        self.refcounts = np.ndarray((self.slots,), np.int64, buffer=self.shm.buf, offset=0)
+        self.generations = np.ndarray((self.slots,), np.int64, buffer=self.shm.buf,
+                                      offset=8 * self.slots)
+
+    def __getstate__(self):
+        # Only used with the spawn start method; fork children inherit the pool
+        return {"name": self.shm.name, "slots": self.slots, "slot_bytes": self.slot_bytes,
+                "header": self._header_bytes, "cond": self._cond, "owner": self._owner_pid}
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.slot_bytes = state["slot_bytes"]
+        self._header_bytes = state["header"]
+        self._cond = state["cond"]
+        self._owner_pid = state["owner"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        try:
+            # Attaching registers the segment again; only the owner may unlink it
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+        self._map_header()
+        self.waits = 0
+
+    def _array(self, ref: FrameRef) -> np.ndarray:
+        """ndarray over a slot (no checks)"""
+        offset = self._header_bytes + ref.slot * self.slot_bytes
+        return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=self.shm.buf, offset=offset)
+
+    def _valid(self, ref: FrameRef) -> bool:
+        """Whether ref still names the current, referenced occupant of its slot"""
+        return (0 <= ref.slot < self.slots
+                and int(self.generations[ref.slot]) == ref.generation
+                and int(self.refcounts[ref.slot]) > 0)
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8,
+                timeout: Optional[float] = None) -> Optional[Tuple[FrameRef, np.ndarray]]:
+        """
+        Take a free slot to write a frame into
+
+        Args:
+            shape: Frame shape
+            dtype: Frame dtype
+            timeout: Seconds to wait for a free slot (None = forever)
+
+        Returns:
+            Tuple (FrameRef, writable view) or None if no slot freed up in time
+        """
+        dtype = np.dtype(dtype)
+        shape = tuple(int(size) for size in shape)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {nbytes} bytes exceeds the slot size ({self.slot_bytes})")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                free = np.flatnonzero(self.refcounts == 0)
+                if free.size:
+                    break
+                self.waits += 1
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            slot = int(free[0])
+            self.refcounts[slot] = 1
+            self.generations[slot] += 1
+            ref = FrameRef(slot, int(self.generations[slot]), shape, dtype.str)
+        return ref, self._array(ref)
+
+    def put(self, frame: np.ndarray, timeout: Optional[float] = None) -> Optional[FrameRef]:
+        """
+        Copy a frame into a free slot (the one copy for frames not produced in place)
+
+        Args:
+            frame: Image to store
+            timeout: Seconds to wait for a free slot
+
+        Returns:
+            FrameRef holding one reference, or None if no slot freed up in time
+        """
+        acquired = self.acquire(frame.shape, frame.dtype, timeout)
+        if acquired is None:
+            return None
+        ref, view = acquired
+        np.copyto(view, frame)
+        return ref
+
+    def view(self, ref: FrameRef, writable: bool = False) -> np.ndarray:
+        """
+        Map a referenced frame without copying
+
+        Args:
+            ref: Frame descriptor
+            writable: Allow writes (read-only by default)
+
+        Returns:
+            np.ndarray over the slot; valid until the caller's reference is released
+        """
+        # No lock: the caller's reference pins the slot, and a worker killed
+        # while holding the lock would block every other process
+        if not self._valid(ref):
+            raise ValueError(f"Stale frame reference: slot {ref.slot} was released or reused")
+        array = self._array(ref)
+        if not writable:
+            array.flags.writeable = False
+        return array
+
+    def retain(self, ref: FrameRef) -> FrameRef:
+        """Add a reference for another holder (e.g. before handing ref to a worker)"""
+        with self._cond:
+            if not self._valid(ref):
+                raise ValueError(f"Stale frame reference: slot {ref.slot} was released or reused")
+            self.refcounts[ref.slot] += 1
+        return ref
+
+    def release(self, ref: FrameRef):
+        """Drop one reference; the slot is reused once none are left"""
+        with self._cond:
+            if not self._valid(ref):
+                return  # Already fully released (e.g. cleaned up after a worker died)
+            self.refcounts[ref.slot] -= 1
+            if self.refcounts[ref.slot] == 0:
+                self._cond.notify_all()
+
+    @contextmanager
+    def borrowed(self, ref: FrameRef):
+        """View a frame and release the caller's reference afterwards"""
+        try:
+            yield self.view(ref)
+        finally:
+            self.release(ref)
+
+    def stats(self) -> Dict:
+        """Slot usage"""
+        with self._cond:
+            in_use = int(np.count_nonzero(self.refcounts))
+        return {
+            "slots": self.slots,
+            "slot_mb": round(self.slot_bytes / 1024 ** 2, 2),
+            "in_use": in_use,
+            "free": self.slots - in_use,
+            "waits": self.waits
+        }
+
+    def close(self):
+        """Detach from the segment (and free it in the creating process)"""
+        self.refcounts = self.generations = None
+        try:
+            self.shm.close()
+        except BufferError:
+            print("⚠️  Frame pool closed while frame views are still alive")
+            return
+        if os.getpid() == self._owner_pid:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _worker_main(index: int, pipeline, frames: FramePool, conn,
+                 torch_threads: Optional[int]):
+    """OCR worker process: grade the frames named by tasks on its pipe"""
+    from answer_keys import MatcherCache
+    from prefork import set_torch_threads
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent handles Ctrl+C
+    os.environ["RPI_WORKER_INDEX"] = str(index)
+    if torch_threads:
+        set_torch_threads(torch_threads)
+    matchers = MatcherCache(max_size=8)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        task_id, ref, answer_key, cache_key, template = task
+        try:
+            image = frames.view(ref)
+            cache_key = cache_key or MatcherCache.inline_key(answer_key)
+            outcome = pipeline.grade_frame(image, template=template, answer_key=answer_key,
+                                           matcher=matchers.get(cache_key, answer_key))
+            del image  # The parent releases the slot once the result arrives
+            conn.send(("done", task_id, outcome))
+        except Exception as e:
+            conn.send(("error", task_id, str(e)))
+
+
+class _Worker:
+    """Parent-side handle of one OCR worker: process, pipe and assigned tasks"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.tasks = set()
+
+
+class OCRWorkerPool:
+    """
+    Grades frames from a FramePool in forked worker processes
+
+    The parent loads the model once; workers are forked from it and share
+    the weights copy-on-write (like PreforkServer). A task carries only the
+    FrameRef and the answer key and goes to the worker with the fewest
+    tasks over that worker's own pipe, so a worker that is killed cannot
+    leave a shared queue locked. The pool holds its own reference to the
+    frame while a worker reads it and drops it when the result (or the
+    worker's death) is seen, so the submitter may release its reference at
+    any time. Dead workers are replaced.
+    """
+
+    def __init__(self, pipeline, frames: FramePool, workers: int = 2,
+                 torch_threads: Optional[int] = None):
+        """
+        Initialize worker pool
+
+        Args:
+            pipeline: RPiPipeline with a loaded model
+            frames: FramePool shared with the workers (created before start())
+            workers: Worker processes
+            torch_threads: Torch threads per worker (CPU count / workers if omitted)
+        """
+        self.pipeline = pipeline
+        self.frames = frames
+        self.workers = workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self._ctx = _context()
+        self._workers: Dict[int, _Worker] = {}
+        self._pending: Dict[int, List] = {}  # task_id -> [future, ref, worker index]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._collector = None
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    def start(self):
+        """Fork the workers and start collecting results"""
+        if self._ctx.get_start_method() != "fork":
+            raise RuntimeError("OCR worker processes need the fork start method (Linux)")
+        from prefork import freeze_for_fork
+
+        freeze_for_fork(self.pipeline)
+        for index in range(self.workers):
+            self._workers[index] = self._spawn(index)
+        self._collector = threading.Thread(target=self._collect, name="ocr-results", daemon=True)
+        self._collector.start()
+        print(f"✓ {self.workers} OCR worker processes "
+              f"({self.torch_threads} torch threads each, {self.frames.slots} frame slots)")
+
+    def _spawn(self, index: int) -> _Worker:
+        """Fork one worker with its own pipe"""
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"ocr-worker-{index}", daemon=True,
+            args=(index, self.pipeline, self.frames, child_conn, self.torch_threads))
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def submit(self, ref: FrameRef, answer_key: List[str], cache_key=None,
+               template=None) -> Future:
+        """
+        Queue a frame for grading
+
+        Args:
+            ref: Frame in the shared pool (the caller keeps its own reference)
+            answer_key: List of correct answers
+            cache_key: Matcher cache key, e.g. (key_id, version)
+            template: Sheet template (None for line segmentation)
+
+        Returns:
+            Future resolving to the grading results dict
+
+        Raises:
+            RuntimeError: If the pool was not started or is stopped
+        """
+        task_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            # Check before retaining: a reference taken here must reach _pending
+            if not self._workers or self._stop.is_set():
+                raise RuntimeError("OCR worker pool is not running")
+            index, worker = min(self._workers.items(), key=lambda item: len(item[1].tasks))
+            self.frames.retain(ref)
+            worker.tasks.add(task_id)
+            self._pending[task_id] = [future, ref, index]
+        try:
+            with worker.send_lock:
+                worker.conn.send((task_id, ref, answer_key, cache_key, template))
+        except (OSError, ValueError):
+            pass  # Worker just died; _check_workers fails the task
+        return future
+
+    def grade(self, ref: FrameRef, answer_key: List[str], cache_key=None,
+              template=None, timeout: Optional[float] = None) -> Dict:
+        """Grade a frame and wait for the results"""
+        return self.submit(ref, answer_key, cache_key, template).result(timeout)
+
+    def _collect(self):
+        """Resolve futures from worker messages and replace dead workers"""
+        while not self._stop.is_set():
+            with self._lock:
+                conns = {worker.conn: index for index, worker in self._workers.items()}
+            for conn in wait(list(conns), timeout=0.5):
+                try:
+                    kind, task_id, payload = conn.recv()
+                except (EOFError, OSError):
+                    continue  # Worker died; handled below
+                self._finish(conns[conn], task_id, kind, payload)
+            self._check_workers()
+
+    def _finish(self, index: int, task_id: int, kind: str, payload):
+        """Resolve one task and drop the pool's reference to its frame"""
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+            worker = self._workers.get(index)
+            if worker is not None:
+                worker.tasks.discard(task_id)
+        if entry is None:
+            return
+        future, ref, _ = entry
+        self.frames.release(ref)
+        if kind == "done":
+            self.completed += 1
+            future.set_result(payload)
+        else:
+            self.failed += 1
+            future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        """Fail the tasks of a worker that died and fork a replacement"""
+        for index, worker in list(self._workers.items()):
+            if worker.process.is_alive() or self._stop.is_set():
+                continue
+            print(f"⚠️  OCR worker {index} exited ({worker.process.exitcode}), restarting")
+            replacement = self._spawn(index)
+            with self._lock:
+                # New tasks go to the replacement from here on
+                self._workers[index] = replacement
+                lost = list(worker.tasks)
+            for task_id in lost:
+                self._finish(index, task_id, "error", f"OCR worker {index} died")
+            worker.conn.close()
+            self.restarts += 1
+
+    def stats(self) -> Dict:
+        """Worker and queue state"""
+        with self._lock:
+            pending = len(self._pending)
+            alive = sum(1 for worker in self._workers.values() if worker.process.is_alive())
+        return {
+            "workers": self.workers,
+            "alive": alive,
+            "pending": pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "frames": self.frames.stats()
+        }
+
+    def stop(self, timeout: float = 10.0):
+        """Finish queued tasks, then stop the workers"""
+        deadline = time.monotonic() + timeout
+        # Results of the last tasks may still be in flight
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        if self._collector is not None:
+            self._collector.join(2.0)
+        for worker in self._workers.values():
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers.values():
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(1.0)
+            worker.conn.close()
+        with self._lock:
+            entries = list(self._pending.values())
+            self._pending.clear()
+        for future, ref, _ in entries:
+            self.frames.release(ref)
+            future.set_exception(RuntimeError("OCR worker pool stopped"))
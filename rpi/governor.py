@@ -0,0 +1,340 @@
+"""
+Adaptive resource governor for Raspberry Pi
+Steps working resolution, OCR batch size, torch threads and decoding
+preset up or down to hold a target per-sheet latency as the board heats up
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from prefork import set_torch_threads
+
+
+# Fastest preset last; "balanced" matches the pipeline defaults
+PRESETS: List[Dict] = [
+    {"name": "quality", "working_size": (1600, 1200), "page_size": (1000, 1414),
+     "batch_size": 8, "decoding": {"num_beams": 3, "max_new_tokens": 100}},
+    {"name": "balanced", "working_size": (1280, 960), "page_size": (1000, 1414),
+     "batch_size": 8, "decoding": {"max_new_tokens": 100}},
+    {"name": "fast", "working_size": (1024, 768), "page_size": (800, 1131),
+     "batch_size": 8, "decoding": {"max_new_tokens": 64}},
+    {"name": "economy", "working_size": (800, 600), "page_size": (640, 905),
+     "batch_size": 4, "decoding": {"max_new_tokens": 48}},
+]
+
+# Stage timings (from pipeline.last_stats) tracked as moving averages
+STAGES = ("load_ms", "page_detect_ms", "deskew_ms", "ocr_ms")
+
+# Raspberry Pi firmware throttling flags (under-voltage, freq capped,
+# throttled, soft temperature limit), bits 0-3 = currently active
+THROTTLED_PATH = Path("/sys/devices/platform/soc/soc:firmware/get_throttled")
+
+
+class SystemSensors:
+    """
+    Reads CPU temperature, load, available memory and firmware throttling
+    Each reading is None where the platform doesn't provide it
+    """
+
+    def __init__(self, thermal_root: str = "/sys/class/thermal",
+                 temperature_reader: Optional[Callable[[], Optional[float]]] = None):
+        """
+        Initialize sensors
+
+        Args:
+            thermal_root: sysfs thermal class directory
+            temperature_reader: Replaces the sysfs reading (°C), e.g. for tests
+        """
+        self.thermal_root = Path(thermal_root)
+        self.temperature_reader = temperature_reader
+        self._zone = None
+
+    def _find_zone(self) -> Optional[Path]:
+        """Thermal zone of the CPU (first zone if none is labelled cpu)"""
+        zones = sorted(self.thermal_root.glob("thermal_zone*"))
+        for zone in zones:
+            try:
+                if "cpu" in (zone / "type").read_text().lower():
+                    return zone
+            except OSError:
+                continue
+        return zones[0] if zones else None
+
+    def temperature_c(self) -> Optional[float]:
+        """CPU temperature in °C"""
+        if self.temperature_reader is not None:
+            return self.temperature_reader()
+        if self._zone is None:
+            self._zone = self._find_zone()
+            if self._zone is None:
+                return None
+        try:
+            return int((self._zone / "temp").read_text()) / 1000
+        except (OSError, ValueError):
+            return None
+
+    def load_per_cpu(self) -> Optional[float]:
+        """1-minute load average divided by the CPU count"""
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            return None
+
+    def available_memory_mb(self) -> Optional[float]:
+        """MemAvailable in MB"""
+        try:
+            with open("/proc/meminfo", "r") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) / 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def throttled(self) -> Optional[bool]:
+        """Whether the firmware is throttling right now (Raspberry Pi only)"""
+        try:
+            return bool(int(THROTTLED_PATH.read_text().strip(), 16) & 0xF)
+        except (OSError, ValueError):
+            return None
+
+    def read(self) -> Dict:
+        """All readings"""
+        temperature = self.temperature_c()
+        load = self.load_per_cpu()
+        memory = self.available_memory_mb()
+        return {
+            "temperature_c": round(temperature, 1) if temperature is not None else None,
+            "load_per_cpu": round(load, 2) if load is not None else None,
+            "available_mb": round(memory, 1) if memory is not None else None,
+            "throttled": self.throttled()
+        }
+
+
+class ResourceGovernor:
+    """
+    Holds a target per-sheet latency by moving along PRESETS
+
+    After every sheet the governor looks at the median of recent sheet
+    latencies and the sensors:
+    - too slow, too hot, throttled or short of memory: one preset faster
+    - comfortably fast and cool: one preset slower, if the current median
+      scaled by the cost of that step (measured across the last change
+      between the two presets) still fits the target
+    Changes are at least `cooldown` sheets apart. Torch threads are halved
+    while the CPU is hot or oversubscribed (restored below temp_low), and
+    the OCR batch is halved while memory is short.
+    """
+
+    def __init__(self, pipeline, target_ms: float = 8000,
+                 sensors: Optional[SystemSensors] = None, level: int = 1,
+                 temp_high: float = 75.0, temp_low: float = 68.0,
+                 max_load: float = 1.5, min_free_mb: float = 300,
+                 tolerance: float = 0.15, cooldown: int = 3, window: int = 5,
+                 history: int = 50):
+        """
+        Initialize governor and apply the starting preset
+
+        Args:
+            pipeline: RPiPipeline to tune
+            target_ms: Target latency per sheet
+            sensors: Sensor source (SystemSensors() if omitted)
+            level: Starting index into PRESETS
+            temp_high: Step down and halve threads at or above this (°C);
+                       the Pi firmware throttles at 80 °C
+            temp_low: Stepping up is allowed only at or below this (°C)
+            max_load: Load per CPU above which threads are halved
+            min_free_mb: Available memory below which batches are halved
+            tolerance: Latency band around the target with no change
+            cooldown: Minimum sheets between preset changes
+            window: Sheets in the latency median
+            history: Decisions kept for metrics
+        """
+        self.pipeline = pipeline
+        self.target_ms = target_ms
+        self.sensors = sensors or SystemSensors()
+        self.level = max(0, min(level, len(PRESETS) - 1))
+        self.temp_high = temp_high
+        self.temp_low = temp_low
+        self.max_load = max_load
+        self.min_free_mb = min_free_mb
+        self.tolerance = tolerance
+        self.cooldown = cooldown
+
+        self.latencies = deque(maxlen=window)
+        self.step_ratio: Dict[int, float] = {}  # Latency of preset i / preset i + 1
+        self.stage_ms: Dict[str, float] = {}
+        self.decisions = deque(maxlen=history)
+        self.sheets = 0
+        self.last_reading: Dict = {}
+        self.base_threads = None
+        self.threads = None
+        self.batch_size = None
+        self._since_change = 0
+        self._before_change = None  # (level, median) of the preset just left
+        self._lock = threading.Lock()
+
+        self.apply()
+
+    @property
+    def preset(self) -> Dict:
+        """Active preset"""
+        return PRESETS[self.level]
+
+    def apply(self, threads: Optional[int] = None, memory_short: bool = False):
+        """
+        Push the active preset into the pipeline
+
+        Args:
+            threads: Torch threads (unchanged if omitted)
+            memory_short: Halve the OCR batch size
+        """
+        preset = self.preset
+        pipeline = self.pipeline
+        if pipeline.loader is not None:
+            pipeline.loader.working_size = preset["working_size"]
+        if pipeline.page_detector is not None:
+            pipeline.page_detector.output_size = preset["page_size"]
+        self.batch_size = max(1, preset["batch_size"] // 2) if memory_short else preset["batch_size"]
+        pipeline.batch_size = self.batch_size
+        if pipeline.extractor is not None:
+            pipeline.extractor.generate_kwargs = dict(preset["decoding"])
+        if threads is not None and threads != self.threads:
+            set_torch_threads(threads)
+            self.threads = threads
+
+    def observe(self, sheet_ms: float, stats: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Record one graded sheet and adjust settings
+
+        Args:
+            sheet_ms: End-to-end latency of the sheet
+            stats: Stage timings (pipeline.last_stats)
+
+        Returns:
+            Decision dict if the preset or thread count changed, else None
+        """
+        with self._lock:
+            self.sheets += 1
+            self._since_change += 1
+            self.latencies.append(sheet_ms)
+            for stage in STAGES:
+                value = (stats or {}).get(stage)
+                if value is not None:
+                    previous = self.stage_ms.get(stage, value)
+                    self.stage_ms[stage] = round(0.7 * previous + 0.3 * value, 2)
+
+            reading = self.sensors.read()
+            self.last_reading = reading
+            median = sorted(self.latencies)[len(self.latencies) // 2]
+            if self._before_change and self._since_change >= self.cooldown:
+                # Cost of one step, measured across the last change
+                old_level, old_median = self._before_change
+                ratio = old_median / median if old_level < self.level else median / old_median
+                self.step_ratio[min(old_level, self.level)] = round(ratio, 3)
+                self._before_change = None
+
+            temperature = reading.get("temperature_c")
+            hot = (temperature is not None and temperature >= self.temp_high) or \
+                bool(reading.get("throttled"))
+            cool = temperature is None or temperature <= self.temp_low
+            overloaded = reading.get("load_per_cpu") is not None and \
+                reading["load_per_cpu"] > self.max_load
+            memory_short = reading.get("available_mb") is not None and \
+                reading["available_mb"] < self.min_free_mb
+
+            step, reason = self._decide(median, hot, cool, memory_short)
+
+            if self.base_threads is None:
+                self.base_threads = _torch_threads()
+            old_level, old_threads = self.level, self.threads or self.base_threads
+            threads = old_threads
+            if self.base_threads:
+                if hot or overloaded:
+                    threads = max(1, self.base_threads // 2)
+                elif cool:
+                    threads = self.base_threads  # Restore only once cooled down
+
+            if step:
+                self._before_change = (self.level, median)
+                self.level += step
+                self.latencies.clear()
+                self._since_change = 0
+            self.apply(threads=threads, memory_short=memory_short)
+
+            if not step and threads == old_threads:
+                return None
+            if not step:
+                reason = "hot or overloaded" if threads < old_threads else "cooled down"
+
+            decision = {
+                "time": time.time(),
+                "sheet": self.sheets,
+                "from": PRESETS[old_level]["name"],
+                "to": self.preset["name"],
+                "threads": self.threads,
+                "batch_size": self.batch_size,
+                "reason": reason,
+                "median_ms": round(median, 1),
+                **reading
+            }
+            self.decisions.append(decision)
+            print(f"🌡️  Governor: {decision['from']} → {decision['to']}, "
+                  f"{self.threads} threads ({reason})")
+            return decision
+
+    def _decide(self, median: float, hot: bool, cool: bool, memory_short: bool):
+        """Preset step (+1 faster, -1 slower, 0 stay) and its reason"""
+        if self._since_change < self.cooldown:
+            return 0, None
+
+        if self.level < len(PRESETS) - 1:
+            if hot:
+                return 1, "temperature"
+            if memory_short:
+                return 1, "memory"
+            if median > self.target_ms * (1 + self.tolerance):
+                return 1, f"median {median:.0f} ms > target {self.target_ms:.0f} ms"
+
+        if self.level > 0 and cool and not memory_short:
+            # Scale the current median by the cost ratio measured across the
+            # last change between the two presets (1.5x if never measured)
+            ratio = self.step_ratio.get(self.level - 1, 1.5)
+            expected = median * min(4.0, max(1.1, ratio))
+            if expected < self.target_ms * (1 - self.tolerance):
+                return -1, f"expected {expected:.0f} ms fits target {self.target_ms:.0f} ms"
+
+        return 0, None
+
+    def metrics(self) -> Dict:
+        """Current settings, sensors, stage timings and recent decisions"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                "target_ms": self.target_ms,
+                "preset": self.preset["name"],
+                "working_size": list(self.preset["working_size"]),
+                "page_size": list(self.preset["page_size"]),
+                "batch_size": self.batch_size,
+                "decoding": self.preset["decoding"],
+                "threads": self.threads or self.base_threads,
+                "sheets": self.sheets,
+                "median_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+                "stage_ms": dict(self.stage_ms),
+                "step_ratio": {PRESETS[i]["name"]: ratio for i, ratio in self.step_ratio.items()},
+                "sensors": self.last_reading or self.sensors.read(),
+                "decisions": list(self.decisions)
+            }
+
+
+def _torch_threads() -> Optional[int]:
+    """Current torch intra-op thread count (None without torch)"""
+    try:
+        import torch
+        return torch.get_num_threads()
+    except ImportError:
+        return None
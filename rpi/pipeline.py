@@ -5,6 +5,8 @@ Uses quantized models and efficient processing
 
 import sys
 import os
+import threading
+import time
 from pathlib import Path
 import cv2
 import numpy as np
@@ -15,6 +17,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.ocr.text_extractor import TextExtractor
 from src.grading.similarity_matcher import SimilarityMatcher
+from src.processing.page_detector import PageDetector
+from src.processing.image_processor import ImageProcessor
+from src.processing.sheet_template import SheetTemplate, is_blank
+from src.processing.image_loader import ImageLoader
+from src.profiling.tracer import span
+from procstats import read_memory
 
 
 class RPiPipeline:
@@ -24,75 +32,312 @@ class RPiPipeline:
     """
     
     def __init__(self, model_name: str = "microsoft/trocr-base-handwritten", 
-                 threshold: float = 0.70):
+                 threshold: float = 0.70, rectify: bool = True,
+                 deskew: bool = True, batch_size: int = 8,
+                 fast_load: bool = True, low_memory: bool = False,
+                 weight_dtype: str = None, memory_budget_mb: float = None,
+                 extractor: TextExtractor = None):
         """
         Initialize RPi pipeline
         
         Args:
             model_name: TrOCR model to use
             threshold: Grading threshold (0-1)
+            rectify: Crop and flatten the answer sheet before OCR
+            deskew: Straighten tilted text lines before line segmentation
+            batch_size: Answer-box crops per TrOCR batch (template mode)
+            fast_load: Decode files as grayscale, downscaled by libjpeg to
+                       about the working resolution
+            low_memory: Memory-mapped safetensors loading and a batch size
+                        capped by available memory (2-4 GB boards)
+            weight_dtype: Keep TrOCR weights as 'fp16' or 'bf16'
+            memory_budget_mb: Activation memory allowed per OCR batch
+            extractor: Ready TextExtractor to use instead of loading model_name
+                       (e.g. a stub model for benchmarks)
         """
         print("📱 Initializing RPi Pipeline...")
         
         self.threshold = threshold
         self.extractor = None
-        self.matcher = SimilarityMatcher(threshold=threshold)
+        self.matcher = None
         self.answer_key = []
+        self.page_detector = PageDetector() if rectify else None
+        self.image_processor = ImageProcessor() if deskew else None
+        self.batch_size = batch_size
+        self.loader = ImageLoader() if fast_load else None
+        self.template = None
+        self.governor = None
+        # last_stats / last_error are per thread: the threaded server grades
+        # several sheets on one pipeline at once
+        self._state = threading.local()
+        self.last_sheet: Dict = {}  # Processing stats of the latest graded sheet, any thread
         
-        try:
-            self.extractor = TextExtractor(model_name=model_name)
-            print("✓ TextExtractor initialized")
-        except Exception as e:
-            print(f"⚠️  TextExtractor initialization: {e}")
+        if extractor is not None:
+            self.extractor = extractor
+        else:
+            try:
+                self.extractor = TextExtractor(model_name=model_name, low_memory=low_memory,
+                                               weight_dtype=weight_dtype,
+                                               memory_budget_mb=memory_budget_mb,
+                                               max_batch_size=batch_size)
+                print("✓ TextExtractor initialized")
+            except Exception as e:
+                print(f"⚠️  TextExtractor initialization: {e}")
+        
+        # Steady-state footprint right after the model is loaded
+        self.memory_after_load = read_memory()
+        if self.memory_after_load.get("rss_mb"):
+            print(f"   RSS after load: {self.memory_after_load['rss_mb']:.0f} MB "
+                  f"(peak {self.memory_after_load['peak_rss_mb']:.0f} MB)")
+    
+    @property
+    def last_stats(self) -> Dict:
+        """Timings and pixel counts of this thread's last sheet"""
+        if not hasattr(self._state, "stats"):
+            self._state.stats = {}
+        return self._state.stats
+    
+    @last_stats.setter
+    def last_stats(self, stats: Dict):
+        self._state.stats = stats
+    
+    @property
+    def last_error(self):
+        """Reason this thread's last process_* call failed, if known"""
+        return getattr(self._state, "error", None)
+    
+    @last_error.setter
+    def last_error(self, error):
+        self._state.error = error
     
-    def set_answer_key(self, answer_key: List[str]):
+    def set_answer_key(self, answer_key: List[str],
+                       matcher: SimilarityMatcher = None):
         """
-        Set the answer key for grading
+        Set the default answer key for grading
+        (full_pipeline and grade_frame can take their own key per call)
         
         Args:
             answer_key: List of correct answers
+            matcher: Precompiled matcher for this key (built if omitted)
         """
         self.answer_key = answer_key
+        self.matcher = matcher if matcher is not None else SimilarityMatcher(answer_key)
         print(f"✓ Answer key set ({len(answer_key)} questions)")
     
-    def process_image(self, image_path: str) -> Tuple[List[str], bool]:
+    def set_template(self, template: SheetTemplate = None):
+        """
+        Set the default sheet template (None for line segmentation)
+        
+        Args:
+            template: Answer-box layout of the exam sheet
+        """
+        self.template = template
+        if template is not None:
+            print(f"✓ Sheet template set: {template.name} ({len(template.regions)} boxes)")
+    
+    def set_governor(self, governor=None):
+        """
+        Let a resource governor tune resolution, batch size and decoding
+        
+        Args:
+            governor: ResourceGovernor (None to keep the current settings)
+        """
+        self.governor = governor
+        if governor is not None:
+            print(f"✓ Resource governor: target {governor.target_ms:.0f} ms/sheet, "
+                  f"preset {governor.preset['name']}")
+    
+    def process_image(self, image_path: str,
+                      template: SheetTemplate = None) -> Tuple[List[str], bool]:
         """
         Extract text from image
         
         Args:
             image_path: Path to image file
+            template: Sheet template (defaults to the one set with set_template)
         
         Returns:
             Tuple[extracted_text, success]
         """
+        self.last_error = None
         try:
             if not os.path.exists(image_path):
                 print(f"❌ Image not found: {image_path}")
                 return [], False
             
             print(f"📷 Loading image: {image_path}")
-            image = cv2.imread(image_path)
+            start = time.perf_counter()
+            with span("load_image", path=image_path) as info:
+                image, load_info = self._load(image_path)
+                info.update(load_info)
+            load_ms = round((time.perf_counter() - start) * 1000, 2)
             
             if image is None:
-                print(f"❌ Failed to load image: {image_path}")
+                self.last_error = f"Failed to load image: {image_path}"
+                print(f"❌ {self.last_error}")
                 return [], False
             
             # Get image info
-            height, width = image.shape[:2]
             size_mb = os.path.getsize(image_path) / (1024 * 1024)
-            print(f"   Size: {width}×{height} ({size_mb:.1f} MB)")
+            print(f"   File size: {size_mb:.1f} MB")
+            
+            result = self.process_array(image, template=template)
+            self.last_stats.update(load_ms=load_ms, **load_info)
+            return result
+            
+        except Exception as e:
+            self.last_error = f"Processing error: {e}"
+            print(f"❌ Processing error: {e}")
+            import traceback
+            traceback.print_exc()
+            return [], False
+    
+    def process_bytes(self, data: bytes,
+                      template: SheetTemplate = None) -> Tuple[List[str], bool]:
+        """
+        Extract text from an encoded image held in memory (e.g. an upload body)
+        
+        Args:
+            data: JPEG/PNG bytes
+            template: Sheet template (defaults to the one set with set_template)
+        
+        Returns:
+            Tuple[extracted_text, success]
+        """
+        self.last_error = None
+        try:
+            start = time.perf_counter()
+            with span("load_image", bytes=len(data)) as info:
+                image, load_info = self._load(data)
+                info.update(load_info)
+            load_ms = round((time.perf_counter() - start) * 1000, 2)
+            
+            if image is None:
+                self.last_error = "Failed to decode image"
+                print(f"❌ {self.last_error}")
+                return [], False
+            
+            result = self.process_array(image, template=template)
+            self.last_stats.update(load_ms=load_ms, **load_info)
+            return result
+            
+        except Exception as e:
+            self.last_error = f"Failed to decode image: {e}"
+            print(f"❌ Processing error: {e}")
+            import traceback
+            traceback.print_exc()
+            return [], False
+    
+    def load_image(self, source) -> Tuple[np.ndarray, Dict]:
+        """
+        Decode a path or encoded bytes exactly as process_image does, without OCR
+        (e.g. to hand the image to an OCR worker process)
+        
+        Args:
+            source: File path or JPEG/PNG bytes
+        
+        Returns:
+            Tuple (image or None, load info)
+        """
+        return self._load(source)
+    
+    def _load(self, source) -> Tuple[np.ndarray, Dict]:
+        """Decode a path or bytes with the fast loader (or plain full decode)"""
+        if self.loader is not None:
+            # DCT reduction only comes in powers of two; fit finishes the job so
+            # the working size (stepped by the resource governor) really applies
+            image, info = self.loader.load_with_info(source, fit=True)
+            if image is not None and info["reduction"] > 1:
+                print(f"   Decoded at 1/{info['reduction']} scale "
+                      f"({'grayscale' if info['grayscale'] else 'color'})")
+            return image, info
+        if isinstance(source, (str, Path)):
+            return cv2.imread(str(source)), {"reduction": 1, "grayscale": False}
+        return (cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR),
+                {"reduction": 1, "grayscale": False})
+    
+    def process_array(self, image: np.ndarray,
+                      template: SheetTemplate = None) -> Tuple[List[str], bool]:
+        """
+        Extract text from an in-memory image (e.g. a camera frame)
+        
+        Args:
+            image: BGR or grayscale image
+            template: Sheet template; answers are read from its boxes and
+                      returned in question order (defaults to set_template)
+        
+        Returns:
+            Tuple[extracted_text, success]
+        """
+        self.last_error = None
+        try:
+            template = template or self.template
+            height, width = image.shape[:2]
+            print(f"   Size: {width}×{height}")
+            stats = {"input_pixels": width * height, "page_found": None}
+            if self.loader is not None:
+                # Camera frames skip the loader; hold them to the working size too
+                image = self.loader.fit(image)
+                height, width = image.shape[:2]
+                stats["working_pixels"] = width * height
+            
+            # Crop to the sheet so background never reaches OCR
+            if self.page_detector is not None:
+                with span("detect_page") as info:
+                    page, page_info = self.page_detector.extract_page(image)
+                    info["found"] = page_info["found"]
+                stats["page_found"] = page_info["found"]
+                stats["page_detect_ms"] = page_info["page_detect_ms"]
+                if page is not None:
+                    image = page
+                    height, width = image.shape[:2]
+                    print(f"📄 Page rectified to {width}×{height} "
+                          f"({page_info['page_detect_ms']:.0f} ms)")
+                elif template is not None:
+                    # Box coordinates are relative to the page; on the raw
+                    # frame they would point at the wrong regions
+                    self.last_error = "Sheet page not found; template boxes need the whole page in view"
+                    self.last_stats = stats
+                    print(f"❌ {self.last_error}")
+                    return [], False
+                else:
+                    print("⚠️  Page not found, using full frame")
+            stats["ocr_pixels"] = width * height
+            
+            # Estimate skew on a small binary, rotate once at working resolution
+            # (a rectified page already fixes the template's coordinate frame)
+            if self.image_processor is not None and \
+                    not (template is not None and stats["page_found"]):
+                start = time.perf_counter()
+                with span("deskew") as info:
+                    image, angle = self.image_processor.deskew(image)
+                    info["angle"] = angle
+                stats["skew_deg"] = round(angle, 2)
+                stats["deskew_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                if angle:
+                    print(f"📐 Deskewed by {angle:.2f}°")
             
             # Extract text
             print("🔍 Extracting text...")
-            extracted = self.extractor.extract_text(image)
+            start = time.perf_counter()
+            if template is not None:
+                with span("extract_regions", template=template.template_id):
+                    extracted = self._extract_regions(image, template, stats)
+            else:
+                with span("extract_text", width=width, height=height):
+                    extracted = self.extractor.extract_text(image)
+                stats["line_crops"] = getattr(self.extractor, "last_line_count", None)
+            stats["ocr_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self.last_stats = stats
             
-            if not extracted:
+            if not any(extracted):
                 print("❌ No text extracted")
                 return [], False
             
-            print(f"✓ Extracted {len(extracted)} lines of text")
+            label = "Q" if template is not None else "Line "
+            print(f"✓ Extracted {len(extracted)} {'answers' if template else 'lines of text'}")
             for i, text in enumerate(extracted, 1):
-                print(f"   Line {i}: {text[:50]}...")
+                print(f"   {label}{i}: {text[:50]}...")
             
             return extracted, True
             
@@ -102,21 +347,64 @@ class RPiPipeline:
             traceback.print_exc()
             return [], False
     
+    def _extract_regions(self, page: np.ndarray, template: SheetTemplate,
+                         stats: Dict) -> List[str]:
+        """
+        OCR the template's answer boxes in batches
+        
+        Args:
+            page: Rectified page
+            template: Sheet template
+            stats: Stats dict to update
+        
+        Returns:
+            list: Answer per question number (index 0 = question 1, '' if blank)
+        """
+        with span("crop_regions", regions=len(template.regions)):
+            regions = template.crop_regions(page)
+            # Empty boxes are never sent to TrOCR
+            jobs = [(question, crop) for question, crops in regions
+                    for crop in crops if not is_blank(crop)]
+        
+        with span("recognize_batch", crops=len(jobs)):
+            texts = self.extractor.recognize_batch([crop for _, crop in jobs],
+                                                   batch_size=self.batch_size) if jobs else []
+        
+        answers: Dict[int, List[str]] = {}
+        for (question, _), text in zip(jobs, texts):
+            if text.strip():
+                answers.setdefault(question, []).append(text.strip())
+        
+        stats["template_id"] = template.template_id
+        stats["regions"] = len(regions)
+        stats["line_crops"] = len(jobs)
+        stats["blank_regions"] = sum(1 for question, _ in regions if question not in answers)
+        return [" ".join(answers.get(question, []))
+                for question in range(1, template.num_questions + 1)]
+    
     def grade_answers(self, extracted_text: List[str], 
-                     verbose: bool = True) -> Dict[int, Dict]:
+                     verbose: bool = True, answer_key: List[str] = None,
+                     matcher: SimilarityMatcher = None) -> Dict[int, Dict]:
         """
         Grade extracted answers against key
         
         Args:
             extracted_text: List of extracted answers
             verbose: Print detailed output
+            answer_key: Key for this call (defaults to the one set with set_answer_key)
+            matcher: Precompiled matcher for answer_key
         
         Returns:
             Dict with grading results
         """
-        if not self.answer_key:
+        if answer_key is None:
+            answer_key, matcher = self.answer_key, self.matcher
+        
+        if not answer_key:
             print("❌ Answer key not set")
             return {}
+        if matcher is None:
+            matcher = SimilarityMatcher(answer_key)
         
         if not extracted_text:
             print("❌ No text to grade")
@@ -125,14 +413,16 @@ class RPiPipeline:
         print("📊 Grading answers...")
         results = {}
         passed = 0
-        total = min(len(extracted_text), len(self.answer_key))
+        total = min(len(extracted_text), len(answer_key))
+        
+        # Score all questions in one vectorized pass
+        scores = matcher.score_all(extracted_text[:total])
         
         for i in range(total):
             student_answer = extracted_text[i] if i < len(extracted_text) else ""
-            expected_answer = self.answer_key[i]
+            expected_answer = answer_key[i]
             
-            # Get similarity score
-            score = self.matcher.calculate_similarity(student_answer, expected_answer)
+            score = float(scores[i])
             passed_q = score >= self.threshold
             passed += int(passed_q)
             
@@ -163,7 +453,9 @@ class RPiPipeline:
         return results
     
     def full_pipeline(self, image_path: str, answer_key: List[str],
-                     save_output: str = None) -> Dict:
+                     save_output: str = None,
+                     matcher: SimilarityMatcher = None,
+                     template: SheetTemplate = None) -> Dict:
         """
         Run complete pipeline: load → extract → grade
         
@@ -171,6 +463,8 @@ class RPiPipeline:
             image_path: Path to answer sheet image
             answer_key: List of correct answers
             save_output: Optional path to save results JSON
+            matcher: Precompiled matcher for answer_key (e.g. from MatcherCache)
+            template: Sheet template (defaults to the one set with set_template)
         
         Returns:
             Dict with complete results
@@ -178,19 +472,27 @@ class RPiPipeline:
         print("\n" + "="*60)
         print("🚀 STARTING ANSWER SHEET GRADING PIPELINE")
         print("="*60)
+        start = time.perf_counter()
         
-        # Set answer key
-        self.set_answer_key(answer_key)
-        
-        # Extract text
-        extracted, success = self.process_image(image_path)
-        if not success:
-            return {"error": "Failed to process image", "success": False}
-        
-        # Grade
-        results = self.grade_answers(extracted, verbose=True)
+        with span("full_pipeline", image=image_path):
+            # Key and matcher stay local: concurrent requests may grade other keys
+            if matcher is None:
+                with span("compile_matcher", questions=len(answer_key)):
+                    matcher = SimilarityMatcher(answer_key)
+            
+            # Extract text
+            extracted, success = self.process_image(image_path, template=template)
+            if not success:
+                return {"error": self.last_error or "Failed to process image", "success": False}
+            
+            # Grade
+            with span("grade_answers", answers=len(extracted)):
+                results = self.grade_answers(extracted, verbose=True,
+                                             answer_key=answer_key, matcher=matcher)
         results["success"] = True
         results["image"] = image_path
+        results["processing"] = dict(self.last_stats)
+        self._observe(start, results["processing"])
         
         # Save results if requested
         if save_output:
@@ -202,6 +504,51 @@ class RPiPipeline:
         
         return results
     
+    def grade_frame(self, image: np.ndarray, verbose: bool = False,
+                    template: SheetTemplate = None, answer_key: List[str] = None,
+                    matcher: SimilarityMatcher = None) -> Dict:
+        """
+        Extract and grade an in-memory image against the current answer key
+        No temporary files are written
+        
+        Args:
+            image: BGR or grayscale image
+            verbose: Print per-question details
+            template: Sheet template (defaults to the one set with set_template)
+            answer_key: Key for this call (defaults to the one set with set_answer_key)
+            matcher: Precompiled matcher for answer_key
+        
+        Returns:
+            Dict with grading results
+        """
+        start = time.perf_counter()
+        with span("grade_frame"):
+            extracted, success = self.process_array(image, template=template)
+            if not success:
+                return {"error": self.last_error or "Failed to process image", "success": False}
+            
+            with span("grade_answers", answers=len(extracted)):
+                results = self.grade_answers(extracted, verbose=verbose,
+                                             answer_key=answer_key, matcher=matcher)
+        results["success"] = True
+        results["processing"] = dict(self.last_stats)
+        self._observe(start, results["processing"])
+        return results
+    
+    def _observe(self, start: float, processing: Dict):
+        """
+        Record the sheet latency and report it to the resource governor
+        
+        Args:
+            start: perf_counter() value when the sheet started
+            processing: Processing stats of the sheet (updated in place)
+        """
+        processing["sheet_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        if self.governor is not None:
+            processing["preset"] = self.governor.preset["name"]
+            self.governor.observe(processing["sheet_ms"], processing)
+        self.last_sheet = processing
+    
     def _save_results(self, results: Dict, output_path: str):
         """
         Save grading results to JSON
@@ -237,11 +584,14 @@ def optimize_image_for_rpi(image_path: str, max_width: int = 1280,
     Returns:
         np.ndarray: Resized image
     """
-    image = cv2.imread(image_path)
+    # Let libjpeg drop resolution while decoding, then finish with INTER_AREA
+    loader = ImageLoader((max_width, max_height), grayscale=False)
+    image, info = loader.load_with_info(image_path)
     if image is None:
         return None
     
     height, width = image.shape[:2]
+    original_width, original_height = info["original_size"] or (width, height)
     
     # Calculate scaling factor
     scale = min(max_width / width, max_height / height)
@@ -251,6 +601,9 @@ def optimize_image_for_rpi(image_path: str, max_width: int = 1280,
         new_height = int(height * scale)
         image = cv2.resize(image, (new_width, new_height), 
                           interpolation=cv2.INTER_AREA)
-        print(f"✓ Optimized: {width}×{height} → {new_width}×{new_height}")
+    
+    if image.shape[:2] != (original_height, original_width):
+        print(f"✓ Optimized: {original_width}×{original_height} → "
+              f"{image.shape[1]}×{image.shape[0]}")
     
     return image
@@ -0,0 +1,196 @@
+"""
+Pre-fork multi-worker serving for Raspberry Pi
+The parent loads and freezes the model once, then forks workers that share
+the weight pages copy-on-write
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from procstats import read_memory
+
+
+def freeze_for_fork(pipeline):
+    """
+    Prepare a loaded pipeline for copy-on-write sharing
+
+    Args:
+        pipeline: RPiPipeline with a loaded extractor
+    """
+    if pipeline.extractor is not None:
+        pipeline.extractor.freeze()
+
+    # Move every object to the permanent generation, so the cyclic GC in
+    # the workers never writes to (and thereby copies) the parent's pages
+    gc.collect()
+    gc.freeze()
+
+
+def set_torch_threads(num_threads: int):
+    """Limit torch intra-op threads in this process"""
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Already set once in this process
+    except ImportError:
+        pass
+
+
+class PreforkServer:
+    """
+    Serves a WSGI app from N forked worker processes on one listening socket
+    Dead workers are respawned; SIGTERM/SIGINT stop all workers
+    """
+
+    def __init__(self, app, host: str = "0.0.0.0", port: int = 5000,
+                 workers: int = 2, torch_threads: Optional[int] = None,
+                 report_interval: float = 60,
+                 on_worker_start: Optional[Callable[[int], None]] = None):
+        """
+        Initialize pre-fork server
+
+        Args:
+            app: WSGI application (Flask app)
+            host: Bind address
+            port: Bind port
+            workers: Number of worker processes
+            torch_threads: Torch threads per worker (CPU count / workers if omitted)
+            report_interval: Seconds between memory reports (0 disables)
+            on_worker_start: Called in each worker with its index after fork
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.report_interval = report_interval
+        self.on_worker_start = on_worker_start
+        self.sock = None
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self._stopping = False
+
+    def serve_forever(self):
+        """Bind, fork workers and supervise them until stopped"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(128)
+        self.sock.set_inheritable(True)
+
+        print(f"🍴 Pre-fork server: {self.workers} workers × "
+              f"{self.torch_threads} torch threads on {self.host}:{self.port}")
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGUSR1, lambda *_: self.report())
+
+        last_report = time.time()
+        try:
+            while not self._stopping:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+
+                if pid and pid in self.children:
+                    index = self.children.pop(pid)
+                    if not self._stopping:
+                        print(f"⚠️  Worker {index} (pid {pid}) exited with status {status}, respawning")
+                        self._spawn(index)
+
+                if self.report_interval and time.time() - last_report >= self.report_interval:
+                    self.report()
+                    last_report = time.time()
+
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    def _spawn(self, index: int):
+        """Fork one worker"""
+        pid = os.fork()
+        if pid == 0:
+            # Child: restore default signal handling and serve
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            code = 0
+            try:
+                self._run_worker(index)
+            except Exception as e:
+                print(f"❌ Worker {index} error: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+
+        self.children[pid] = index
+        print(f"✓ Worker {index} started (pid {pid})")
+
+    def _run_worker(self, index: int):
+        """Worker main loop: one request at a time on the shared socket"""
+        from werkzeug.serving import make_server
+
+        set_torch_threads(self.torch_threads)
+        os.environ["RPI_WORKER_INDEX"] = str(index)
+        if self.on_worker_start:
+            self.on_worker_start(index)
+
+        server = make_server(self.host, self.port, self.app,
+                             threaded=False, fd=self.sock.fileno())
+        server.serve_forever()
+
+    def _handle_stop(self, signum, frame):
+        """Signal handler for graceful shutdown"""
+        self._stopping = True
+
+    def stop(self):
+        """Terminate all workers"""
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.time() + 10
+        while self.children and time.time() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+
+        if self.sock is not None:
+            self.sock.close()
+        print("✓ Pre-fork server stopped")
+
+    def report(self) -> Dict:
+        """
+        Print and return memory usage of parent and workers
+
+        Returns:
+            Dict mapping role to memory stats
+        """
+        report = {"parent": read_memory(os.getpid())}
+        for pid, index in sorted(self.children.items(), key=lambda item: item[1]):
+            report[f"worker{index}"] = dict(read_memory(pid), pid=pid)
+
+        print("📊 Memory (MB): " + "; ".join(
+            f"{role} rss={stats.get('rss_mb')} pss={stats.get('pss_mb')} shared={stats.get('shared_mb')}"
+            for role, stats in report.items()))
+        sys.stdout.flush()
+        return report
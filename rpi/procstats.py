@@ -0,0 +1,80 @@
+"""
+Process memory statistics for Raspberry Pi
+Reads /proc on Linux and falls back to getrusage elsewhere
+"""
+
+import os
+import resource
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def _read_kb_fields(path: Path, fields: List[str]) -> Dict[str, int]:
+    """Parse 'Name:   1234 kB' lines from a /proc file"""
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in fields:
+                    values[name] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def read_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Memory usage of a process in MB
+
+    Args:
+        pid: Process id (current process if omitted)
+
+    Returns:
+        Dict with rss_mb, peak_rss_mb and, on Linux, pss_mb and shared_mb
+        (shared pages are what copy-on-write forked workers have in common)
+    """
+    pid = pid or os.getpid()
+    proc = Path(f"/proc/{pid}")
+
+    status = _read_kb_fields(proc / "status", ["VmRSS", "VmHWM"])
+    if not status:
+        # Non-Linux fallback: only peak RSS of the current process
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        return {"rss_mb": None, "peak_rss_mb": round(peak_mb, 1)}
+
+    stats = {
+        "rss_mb": round(status.get("VmRSS", 0) / 1024, 1),
+        "peak_rss_mb": round(status.get("VmHWM", 0) / 1024, 1)
+    }
+
+    rollup = _read_kb_fields(proc / "smaps_rollup",
+                             ["Pss", "Shared_Clean", "Shared_Dirty"])
+    if rollup:
+        stats["pss_mb"] = round(rollup.get("Pss", 0) / 1024, 1)
+        stats["shared_mb"] = round(
+            (rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)) / 1024, 1)
+
+    return stats
+
+
+def child_pids(pid: Optional[int] = None) -> List[int]:
+    """
+    Direct children of a process (Linux only)
+
+    Args:
+        pid: Parent process id (current process if omitted)
+
+    Returns:
+        list: Child process ids
+    """
+    pid = pid or os.getpid()
+    children = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children.extend(int(c) for c in (task / "children").read_text().split())
+        except (OSError, ValueError):
+            continue
+    return sorted(set(children))
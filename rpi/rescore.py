@@ -0,0 +1,370 @@
+"""
+Bulk re-scoring of stored results for Raspberry Pi
+Re-grades the OCR transcripts already kept in each result against a revised
+answer key or threshold, without running OCR again
+
+Usage (from rpi/):
+    python3 rescore.py --key-id bio-midterm                  # latest key version
+    python3 rescore.py --key-id bio-midterm --threshold 0.6 --dry-run
+    python3 rescore.py --all --answer-file fixed_answers.json
+"""
+
+import argparse
+import csv
+import fcntl
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from storage import write_result_file
+from export import iter_results, question_items
+from src.grading.similarity_matcher import SimilarityMatcher
+
+RESULTS_FOLDER = Path(__file__).parent / "results"
+KEYS_FOLDER = Path(__file__).parent / "keys"
+
+# Inside the results folder; not listed as results themselves
+HISTORY_DIR = "history"  # Previous revision of every rewritten result
+JOBS_DIR = "rescore"     # <job_id>/diff.csv and job.json per run
+LOCK_FILE = ".rescore.lock"  # flock'ed while a job runs (any process)
+
+DIFF_COLUMNS = ["result_file", "image", "question", "student",
+                "expected_old", "expected_new", "similarity_old", "similarity_new",
+                "status_old", "status_new", "percentage_old", "percentage_new"]
+
+PASS, FAIL = "✓ PASS", "✗ FAIL"
+
+
+def _split_name(name: str) -> Tuple[str, str]:
+    """result_x.json.gz -> ("result_x", ".json.gz")"""
+    for suffix in (".json.gz", ".json"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)], suffix
+    return name, ""
+
+
+@contextmanager
+def job_lock(results_dir: Path):
+    """
+    Hold the re-score lock of a results folder across processes
+
+    Pre-forked server workers and the CLI each run jobs in their own
+    process, so a thread lock is not enough: two jobs would race on the
+    same history archive names and in-place rewrites.
+
+    Args:
+        results_dir: Folder with stored results
+
+    Yields:
+        True if the lock is held, False if another job is running
+    """
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    lock_path = results_dir / LOCK_FILE
+    with open(lock_path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            os.utime(lock_path)  # Keep it out of storage retention
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RescoreJob:
+    """
+    Re-scores stored results in vectorized batches
+
+    The new key's matcher is built once. Student answers from a batch of
+    sheets go through one TF-IDF transform, and each answer is scored
+    against the key answer of its own question. A result whose grades
+    change is rewritten with `revision` + 1, after its previous revision
+    has been copied to results/history/. Every pass/fail flip is written
+    to results/rescore/<job_id>/diff.csv.
+    """
+
+    def __init__(self, results_dir: Path, answers: List[str],
+                 threshold: Optional[float] = None, key_id: Optional[str] = None,
+                 key_version: Optional[int] = None, select_key_id: Optional[str] = None,
+                 dry_run: bool = False, batch_sheets: int = 512):
+        """
+        Initialize job and compile the matcher
+
+        Args:
+            results_dir: Folder with stored results
+            answers: Revised answer key
+            threshold: New pass threshold (each result keeps its own if omitted)
+            key_id: Key id recorded in rewritten results (kept if omitted)
+            key_version: Key version recorded in rewritten results
+            select_key_id: Only results graded against this key (None = all)
+            dry_run: Compute the diff without rewriting results
+            batch_sheets: Sheets per vectorized scoring batch
+        """
+        if not answers:
+            raise ValueError("answers must be a non-empty list")
+        self.results_dir = Path(results_dir)
+        self.answers = list(answers)
+        self.threshold = threshold
+        self.key_id = key_id
+        self.key_version = key_version
+        self.select_key_id = select_key_id
+        self.dry_run = dry_run
+        self.batch_sheets = max(1, batch_sheets)
+
+        self.matcher = SimilarityMatcher(self.answers)
+        self.job_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        self.job_dir = self.results_dir / JOBS_DIR / self.job_id
+        self.summary: Dict = {}
+
+    def _batches(self) -> Iterator[List[Tuple[Path, Dict]]]:
+        """Selected results in lists of batch_sheets"""
+        batch = []
+        for item in iter_results(self.results_dir, key_id=self.select_key_id):
+            batch.append(item)
+            if len(batch) >= self.batch_sheets:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self) -> Dict:
+        """
+        Re-score every selected result
+
+        Returns:
+            Dict: Job summary (counts, timing, diff file)
+        """
+        start = time.perf_counter()
+        stats = {"sheets": 0, "rewritten": 0, "unchanged": 0, "sheets_score_changed": 0,
+                 "grades_changed": 0, "now_pass": 0, "now_fail": 0, "questions_removed": 0}
+
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        diff_path = self.job_dir / "diff.csv"
+        with open(diff_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=DIFF_COLUMNS)
+            writer.writeheader()
+            for batch in self._batches():
+                self._rescore_batch(batch, writer, stats)
+
+        elapsed = time.perf_counter() - start
+        self.summary = {
+            "job_id": self.job_id,
+            "dry_run": self.dry_run,
+            "key_id": self.key_id,
+            "key_version": self.key_version,
+            "selected_key_id": self.select_key_id,
+            "threshold": self.threshold,
+            **stats,
+            "elapsed_sec": round(elapsed, 3),
+            "sheets_per_sec": round(stats["sheets"] / elapsed, 1) if elapsed > 0 else None,
+            "diff_file": str(diff_path.relative_to(self.results_dir))
+        }
+        with open(self.job_dir / "job.json", "w") as f:
+            json.dump(self.summary, f, indent=2)
+
+        print(f"🔁 Re-scored {stats['sheets']} sheets in {elapsed:.2f}s: "
+              f"{stats['grades_changed']} grades changed on {stats['sheets_score_changed']} sheets"
+              f"{' (dry run)' if self.dry_run else ''}")
+        return self.summary
+
+    def _rescore_batch(self, batch: List[Tuple[Path, Dict]], writer: csv.DictWriter,
+                       stats: Dict):
+        """Score one batch of sheets in a single pass and apply the results"""
+        texts, indices, owners = [], [], []
+        for sheet, (_, result) in enumerate(batch):
+            for number, answer in question_items(result):
+                if number <= len(self.answers):
+                    texts.append(answer.get("student") or "")
+                    indices.append(number - 1)
+                    owners.append((sheet, number))
+
+        scores = self.matcher.score_pairs(texts, indices)
+        sheet_scores: List[Dict[int, float]] = [{} for _ in batch]
+        for (sheet, number), score in zip(owners, scores):
+            sheet_scores[sheet][number] = float(score)
+
+        for (path, result), new_scores in zip(batch, sheet_scores):
+            stats["sheets"] += 1
+            rescored = self._rescored(result, new_scores)
+            changes = self._diff(path, result, rescored)
+            for row in changes:
+                writer.writerow(row)
+                if row["status_new"] is None:
+                    stats["questions_removed"] += 1
+                else:
+                    stats["grades_changed"] += 1
+                    stats["now_pass" if row["status_new"] == PASS else "now_fail"] += 1
+            if result["summary"].get("percentage") != rescored["summary"]["percentage"]:
+                stats["sheets_score_changed"] += 1
+
+            if not self._changed(result, rescored):
+                stats["unchanged"] += 1
+                continue
+            stats["rewritten"] += 1
+            if not self.dry_run:
+                self._write(path, result, rescored)
+
+    def _rescored(self, result: Dict, scores: Dict[int, float]) -> Dict:
+        """New result: re-scored questions first, other fields carried over"""
+        summary = result.get("summary", {})
+        threshold = self.threshold if self.threshold is not None else summary.get("threshold", 0.70)
+        answers = dict(question_items(result))
+
+        rescored = {}
+        passed = 0
+        for number in sorted(scores):
+            score = scores[number]
+            passed += int(score >= threshold)
+            rescored[number] = {
+                "expected": self.answers[number - 1],
+                "student": answers[number].get("student", ""),
+                "similarity": score,
+                "status": PASS if score >= threshold else FAIL
+            }
+
+        total = len(scores)
+        rescored["summary"] = {
+            "total_questions": total,
+            "passed": passed,
+            "percentage": (passed / total * 100) if total > 0 else 0,
+            "threshold": threshold
+        }
+        for field, value in result.items():
+            if not str(field).isdigit() and field != "summary":
+                rescored[field] = value
+        if self.key_id is not None:
+            rescored["key_id"] = self.key_id
+            rescored["key_version"] = self.key_version
+        rescored["revision"] = result.get("revision", 1) + 1
+        rescored["rescored"] = {"job_id": self.job_id, "time": datetime.now().isoformat()}
+        return rescored
+
+    @staticmethod
+    def _diff(path: Path, old: Dict, new: Dict) -> List[Dict]:
+        """Diff rows for questions whose pass/fail status flipped or that were dropped"""
+        rows = []
+        new_answers = {number: answer for number, answer in new.items() if isinstance(number, int)}
+        for number, answer in question_items(old):
+            replacement = new_answers.get(number)
+            if replacement is not None and replacement["status"] == answer.get("status"):
+                continue
+            rows.append({
+                "result_file": path.name,
+                "image": Path(old["image"]).name if old.get("image") else None,
+                "question": number,
+                "student": answer.get("student"),
+                "expected_old": answer.get("expected"),
+                "expected_new": replacement["expected"] if replacement else None,
+                "similarity_old": round(answer.get("similarity", 0.0), 4),
+                "similarity_new": round(replacement["similarity"], 4) if replacement else None,
+                "status_old": answer.get("status"),
+                "status_new": replacement["status"] if replacement else None,
+                "percentage_old": round(old["summary"].get("percentage", 0.0), 2),
+                "percentage_new": round(new["summary"]["percentage"], 2)
+            })
+        return rows
+
+    @staticmethod
+    def _changed(old: Dict, new: Dict) -> bool:
+        """Whether any grade, expected answer, threshold or key version differs"""
+        old_answers = dict(question_items(old))
+        new_answers = {number: answer for number, answer in new.items() if isinstance(number, int)}
+        if old_answers.keys() != new_answers.keys():
+            return True
+        for number, answer in new_answers.items():
+            previous = old_answers[number]
+            if (previous.get("expected") != answer["expected"]
+                    or previous.get("status") != answer["status"]
+                    or abs(previous.get("similarity", 0.0) - answer["similarity"]) > 1e-6):
+                return True
+        return (old["summary"].get("threshold") != new["summary"]["threshold"]
+                or old.get("key_version") != new.get("key_version"))
+
+    def _write(self, path: Path, old: Dict, new: Dict):
+        """Archive the current revision, then atomically replace it"""
+        stem, suffix = _split_name(path.name)
+        history = self.results_dir / HISTORY_DIR
+        history.mkdir(exist_ok=True)
+        archived = history / f"{stem}.r{old.get('revision', 1)}{suffix}"
+        try:
+            os.link(path, archived)
+        except OSError:
+            shutil.copy2(path, archived)
+
+        new_path = path if suffix == ".json.gz" else path.with_name(f"{stem}.json.gz")
+        new["rescored"]["previous"] = f"{HISTORY_DIR}/{archived.name}"
+        write_result_file(new_path, new)
+        if new_path != path:
+            path.unlink()
+
+
+def main():
+    """Re-score stored results from the command line"""
+    parser = argparse.ArgumentParser(
+        description='Re-score stored results against a revised key without re-running OCR')
+    select = parser.add_mutually_exclusive_group(required=True)
+    select.add_argument('--key-id', help='Re-score results graded against this key')
+    select.add_argument('--all', action='store_true',
+                        help='Re-score every stored result (needs --answer-file)')
+    parser.add_argument('--version', type=int,
+                        help='Key version to score against (default: latest)')
+    parser.add_argument('--answer-file', help='JSON file with the revised answers')
+    parser.add_argument('--threshold', type=float, help='New pass threshold (0.0-1.0)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only write the diff, leave results untouched')
+    parser.add_argument('--results-dir', default=str(RESULTS_FOLDER))
+    parser.add_argument('--keys-dir', default=str(KEYS_FOLDER))
+    parser.add_argument('--batch', type=int, default=512, help='Sheets per scoring batch')
+    args = parser.parse_args()
+
+    key_id, key_version = None, None
+    if args.answer_file:
+        try:
+            with open(args.answer_file, 'r') as f:
+                data = json.load(f)
+            answers = data if isinstance(data, list) else data.get('answers', [])
+        except Exception as e:
+            print(f"❌ Failed to load answer file: {e}")
+            sys.exit(1)
+    elif args.key_id:
+        from answer_keys import AnswerKeyRegistry
+
+        key = AnswerKeyRegistry(args.keys_dir).get(args.key_id, args.version)
+        if key is None:
+            print(f"❌ Answer key not found: {args.key_id}")
+            sys.exit(1)
+        answers, key_id, key_version = key["answers"], key["key_id"], key["version"]
+        print(f"✓ Key {key_id} v{key_version}: {len(answers)} questions")
+    else:
+        print("❌ --all needs --answer-file")
+        sys.exit(1)
+
+    with job_lock(args.results_dir) as locked:
+        if not locked:
+            print("❌ A re-score job is already running on these results")
+            sys.exit(1)
+        try:
+            job = RescoreJob(args.results_dir, answers, threshold=args.threshold,
+                             key_id=key_id, key_version=key_version, select_key_id=args.key_id,
+                             dry_run=args.dry_run, batch_sheets=args.batch)
+            summary = job.run()
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
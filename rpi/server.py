@@ -3,15 +3,25 @@ Web server for Raspberry Pi Answer Sheet Checker
 Provides REST API and web UI for grading
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, url_for
 from werkzeug.utils import secure_filename
 import os
 import json
 from pathlib import Path
+import argparse
+import time
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 
 from pipeline import RPiPipeline
+from storage import StorageManager, load_result_file
+from answer_keys import AnswerKeyRegistry, MatcherCache
+from template_store import TemplateStore
+from thumbnails import ThumbnailCache
+from procstats import read_memory
+from governor import ResourceGovernor, SystemSensors
+from export import FORMATS, TABLES, GradebookExporter, parquet_available
+from rescore import JOBS_DIR, RescoreJob, job_lock
 
 
 # Initialize Flask app
@@ -22,18 +32,64 @@ app = Flask(__name__,
 # Configuration
 UPLOAD_FOLDER = Path(__file__).parent / "uploads"
 RESULTS_FOLDER = Path(__file__).parent / "results"
-ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'bmp', 'tiff'}
+KEYS_FOLDER = Path(__file__).parent / "keys"
+SHEET_TEMPLATES_FOLDER = Path(__file__).parent / "sheet_templates"
+THUMBNAIL_FOLDER = Path(__file__).parent / "cache" / "thumbnails"
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+STORAGE_BUDGET = 2 * 1024 * 1024 * 1024  # 2 GB for uploads + results
+RETENTION_DAYS = 30
+MATCHER_CACHE_SIZE = 16  # Compiled answer-key matchers kept in memory
+
+# Model memory (low-memory mode for 2-4 GB boards)
+OCR_MODEL = os.environ.get("OCR_MODEL", "microsoft/trocr-base-handwritten")
+LOW_MEMORY = os.environ.get("RPI_LOW_MEMORY", "0").lower() in ("1", "true", "yes")
+WEIGHT_DTYPE = os.environ.get("RPI_WEIGHT_DTYPE") or None  # fp16 / bf16
+MEMORY_BUDGET_MB = float(os.environ["RPI_MEMORY_BUDGET_MB"]) \
+    if os.environ.get("RPI_MEMORY_BUDGET_MB") else None
+
+# OCR in separate processes fed through shared-memory frame slots
+# (0 = OCR runs in the request thread)
+OCR_WORKERS = int(os.environ.get("RPI_OCR_WORKERS", "0"))
+FRAME_SLOT_MB = float(os.environ.get("RPI_FRAME_SLOT_MB", "8"))
+
+# Resource governor: hold this latency per sheet (unset = fixed settings)
+TARGET_LATENCY_MS = float(os.environ["RPI_TARGET_LATENCY_MS"]) \
+    if os.environ.get("RPI_TARGET_LATENCY_MS") else None
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+# Results mix int question keys with "summary", which can't be sorted
+app.json.sort_keys = False
 
 # Create folders
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 RESULTS_FOLDER.mkdir(exist_ok=True)
 
 # Initialize pipeline
-pipeline = RPiPipeline()
+pipeline = RPiPipeline(model_name=OCR_MODEL, low_memory=LOW_MEMORY,
+                       weight_dtype=WEIGHT_DTYPE, memory_budget_mb=MEMORY_BUDGET_MB)
+if TARGET_LATENCY_MS:
+    pipeline.set_governor(ResourceGovernor(pipeline, target_ms=TARGET_LATENCY_MS))
+
+# OCR worker processes (started in __main__ with --ocr-workers)
+ocr_pool = None
+
+# Bounded storage (eviction runs in a background thread)
+storage = StorageManager(UPLOAD_FOLDER, RESULTS_FOLDER,
+                         max_bytes=STORAGE_BUDGET,
+                         retention_days=RETENTION_DAYS,
+                         on_evict=lambda path: thumbnails.invalidate(path.name))
+
+# Downscaled thumbnails/previews for the web UI
+thumbnails = ThumbnailCache(THUMBNAIL_FOLDER, storage.resolve_upload)
+
+# Answer keys and compiled matchers
+answer_keys = AnswerKeyRegistry(KEYS_FOLDER)
+matcher_cache = MatcherCache(max_size=MATCHER_CACHE_SIZE)
+
+# Answer-box layouts of exam sheets
+sheet_templates = TemplateStore(SHEET_TEMPLATES_FOLDER)
 
 # Session storage
 sessions = {}
@@ -44,6 +100,24 @@ def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def key_version(value) -> Optional[int]:
+    """Answer key version from request input (None = latest); ValueError unless a positive integer"""
+    if value is None or value == '':
+        return None
+    # str() first: rejects True and 2.5 instead of coercing them to 1 and 2
+    version = int(str(value).strip())
+    if version < 1:
+        raise ValueError(value)
+    return version
+
+
+def upload_name(filename: str) -> str:
+    """Listed upload name as-is (spaces, '#' etc.), but never a path outside uploads"""
+    if not filename or filename.startswith('.') or Path(filename).name != filename:
+        return ''
+    return filename
+
+
 @app.route('/')
 def index():
     """Main page"""
@@ -56,7 +130,12 @@ def health():
     return jsonify({
         "status": "ok",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "pid": os.getpid(),
+        "worker": os.environ.get("RPI_WORKER_INDEX"),
+        "memory": read_memory(),
+        "memory_after_load": pipeline.memory_after_load,
+        "model": pipeline.extractor.memory_info() if pipeline.extractor else None
     })
 
 
@@ -82,6 +161,8 @@ def upload_image():
         filepath = UPLOAD_FOLDER / filename
         
         file.save(str(filepath))
+        storage.record_upload(filepath)
+        thumbnails.schedule(filename)
         
         return jsonify({
             "success": True,
@@ -99,28 +180,65 @@ def grade():
     try:
         data = request.json
         
-        if not data or 'image_path' not in data or 'answer_key' not in data:
-            return jsonify({"error": "Missing image_path or answer_key"}), 400
+        if not data or 'image_path' not in data or \
+                ('answer_key' not in data and 'key_id' not in data):
+            return jsonify({"error": "Missing image_path or answer_key/key_id"}), 400
         
         image_path = data['image_path']
-        answer_key = data['answer_key']
         
-        if not isinstance(answer_key, list):
-            return jsonify({"error": "answer_key must be a list"}), 400
+        if 'key_id' in data:
+            try:
+                version = key_version(data.get('key_version'))
+            except ValueError:
+                return jsonify({"error": f"Invalid key_version: {data.get('key_version')}"}), 400
+            key = answer_keys.get(str(data['key_id']), version)
+            if key is None:
+                return jsonify({"error": f"Answer key not found: {data['key_id']}"}), 404
+            answer_key = key['answers']
+            cache_key = (key['key_id'], key['version'])
+        else:
+            key = None
+            answer_key = data['answer_key']
+            if not isinstance(answer_key, list) or not all(isinstance(a, str) for a in answer_key):
+                return jsonify({"error": "answer_key must be a list of strings"}), 400
+            cache_key = MatcherCache.inline_key(answer_key)
         
-        # Validate file exists
-        if not os.path.exists(image_path):
-            return jsonify({"error": f"Image not found: {image_path}"}), 404
+        # Compile (or reuse) the matcher up front so an ungradable key is a 400,
+        # also before it reaches an OCR worker
+        try:
+            matcher = matcher_cache.get(cache_key, answer_key)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid answer key: {e}"}), 400
+        
+        template = None
+        if data.get('template_id'):
+            template = sheet_templates.get(str(data['template_id']))
+            if template is None:
+                return jsonify({"error": f"Sheet template not found: {data['template_id']}"}), 404
         
-        # Run pipeline
-        results = pipeline.full_pipeline(image_path, answer_key)
+        # Validate file exists (originals may have been compacted)
+        if not os.path.exists(image_path):
+            resolved = storage.resolve_upload(Path(image_path).name)
+            if resolved is None:
+                return jsonify({"error": f"Image not found: {image_path}"}), 404
+            image_path = str(resolved)
+        storage.touch(Path(image_path))
         
-        # Save results
-        result_filename = f"result_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        result_path = RESULTS_FOLDER / result_filename
+        if ocr_pool is not None:
+            results = grade_in_worker(image_path, answer_key, cache_key, template)
+        else:
+            # Run pipeline with the cached compiled matcher
+            results = pipeline.full_pipeline(image_path, answer_key, matcher=matcher,
+                                             template=template)
+        if key is not None:
+            results["key_id"] = key['key_id']
+            results["key_version"] = key['version']
+        if template is not None:
+            results["template_id"] = template.template_id
         
-        with open(result_path, 'w') as f:
-            json.dump(results, f, indent=2)
+        # Save results (compressed, compact JSON)
+        result_filename = f"result_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+        result_filename = storage.save_result(results, result_filename)
         
         return jsonify({
             "success": True,
@@ -132,18 +250,157 @@ def grade():
         return jsonify({"error": str(e)}), 500
 
 
+def grade_in_worker(image_path: str, answer_key: list, cache_key, template) -> Dict:
+    """
+    Decode into a shared-memory frame slot and grade in an OCR worker process
+    
+    Args:
+        image_path: Image to grade
+        answer_key: List of correct answers
+        cache_key: Matcher cache key for the workers
+        template: Sheet template or None
+    
+    Returns:
+        Dict with grading results
+    """
+    start = time.perf_counter()
+    image, load_info = pipeline.load_image(image_path)
+    if image is None:
+        return {"error": "Failed to process image", "success": False}
+    load_ms = round((time.perf_counter() - start) * 1000, 2)
+    
+    frames = ocr_pool.frames
+    if image.nbytes > frames.slot_bytes:
+        # Larger than a slot (e.g. full-resolution decoding): grade here
+        matcher = matcher_cache.get(cache_key, answer_key)
+        return pipeline.full_pipeline(image_path, answer_key, matcher=matcher, template=template)
+    
+    ref = frames.put(image, timeout=60)
+    del image
+    if ref is None:
+        return {"error": "Server busy: no free frame slot", "success": False}
+    try:
+        results = ocr_pool.grade(ref, answer_key, cache_key=cache_key, template=template)
+    except RuntimeError as e:
+        return {"error": str(e), "success": False}
+    finally:
+        frames.release(ref)
+    
+    if results.get("success"):
+        results["image"] = image_path
+        results["processing"].update(load_ms=load_ms, **load_info)
+    return results
+
+
+@app.route('/api/keys', methods=['POST'])
+def create_key():
+    """Create an answer key (or a new version of an existing key)"""
+    try:
+        data = request.json
+        
+        if not data or 'answers' not in data:
+            return jsonify({"error": "Missing answers"}), 400
+        
+        try:
+            key = answer_keys.create(data['answers'], name=data.get('name'),
+                                     key_id=data.get('key_id'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({"success": True, "key": key}), 201
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/keys', methods=['GET'])
+def list_keys():
+    """List answer keys"""
+    try:
+        return jsonify({
+            "success": True,
+            "keys": answer_keys.list(),
+            "matcher_cache": matcher_cache.stats()
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/keys/<key_id>', methods=['GET'])
+def get_key(key_id: str):
+    """Fetch an answer key (latest version unless ?version=N)"""
+    try:
+        try:
+            version = key_version(request.args.get('version'))
+        except ValueError:
+            return jsonify({"error": f"Invalid version: {request.args.get('version')}"}), 400
+        
+        key = answer_keys.get(key_id, version)
+        
+        if key is None:
+            return jsonify({"error": "Answer key not found"}), 404
+        
+        return jsonify({"success": True, "key": key})
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/templates', methods=['POST'])
+def create_template():
+    """Store a sheet template (replaces one with the same template_id)"""
+    try:
+        data = request.json
+        
+        if not data:
+            return jsonify({"error": "Missing template"}), 400
+        
+        try:
+            template = sheet_templates.save(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({"success": True, "template": template.to_dict()}), 201
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/templates', methods=['GET'])
+def list_templates():
+    """List sheet templates"""
+    try:
+        return jsonify({"success": True, "templates": sheet_templates.list()})
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/templates/<template_id>', methods=['GET'])
+def get_template(template_id: str):
+    """Fetch a sheet template"""
+    try:
+        template = sheet_templates.get(template_id)
+        
+        if template is None:
+            return jsonify({"error": "Sheet template not found"}), 404
+        
+        return jsonify({"success": True, "template": template.to_dict()})
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/results/<filename>', methods=['GET'])
 def get_result(filename: str):
     """Retrieve grading results"""
     try:
-        result_path = RESULTS_FOLDER / secure_filename(filename)
+        results = storage.load_result(secure_filename(filename))
         
-        if not result_path.exists():
+        if results is None:
             return jsonify({"error": "Result not found"}), 404
         
-        with open(result_path, 'r') as f:
-            results = json.load(f)
-        
         return jsonify(results)
         
     except Exception as e:
@@ -156,9 +413,8 @@ def list_results():
     try:
         results = []
         
-        for file in sorted(RESULTS_FOLDER.glob("*.json"), reverse=True):
-            with open(file, 'r') as f:
-                data = json.load(f)
+        for file in storage.list_results():
+            data = load_result_file(file)
             
             results.append({
                 "filename": file.name,
@@ -175,6 +431,99 @@ def list_results():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/export', methods=['GET'])
+def export_results():
+    """Stream all stored results as a gradebook or answers table (CSV/Parquet)"""
+    try:
+        table = request.args.get('table', 'gradebook')
+        fmt = request.args.get('format', 'csv')
+        if table not in TABLES:
+            return jsonify({"error": f"table must be one of: {', '.join(TABLES)}"}), 400
+        if fmt not in FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
+        if fmt == "parquet" and not parquet_available():
+            return jsonify({"error": "Parquet export needs pyarrow on the server"}), 501
+        
+        questions = request.args.get('questions', type=int)
+        try:
+            exporter = GradebookExporter(RESULTS_FOLDER, table=table,
+                                         key_id=request.args.get('key_id'),
+                                         since=request.args.get('since'),
+                                         questions=questions)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Rows are produced while the response is sent, one result file at a time
+        filename = f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        mimetype = "text/csv" if fmt == "csv" else "application/vnd.apache.parquet"
+        return Response(exporter.iter_bytes(fmt), mimetype=mimetype,
+                        headers={"Content-Disposition": f"attachment; filename={filename}"})
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/rescore', methods=['POST'])
+def rescore():
+    """Re-score stored results of a key against its latest (or given) version"""
+    try:
+        data = request.json
+        
+        if not data or 'key_id' not in data:
+            return jsonify({"error": "Missing key_id"}), 400
+        
+        try:
+            version = key_version(data.get('key_version'))
+        except ValueError:
+            return jsonify({"error": f"Invalid key_version: {data.get('key_version')}"}), 400
+        
+        key = answer_keys.get(str(data['key_id']), version)
+        if key is None:
+            return jsonify({"error": f"Answer key not found: {data['key_id']}"}), 404
+        
+        threshold = data.get('threshold')
+        try:
+            # str() first, as for key versions: true/false is not a threshold
+            threshold = float(str(threshold)) if threshold is not None else None
+        except ValueError:
+            threshold = float('nan')
+        if threshold is not None and not 0.0 <= threshold <= 1.0:
+            return jsonify({"error": "threshold must be a number between 0.0 and 1.0"}), 400
+        
+        # One bulk re-score at a time across all workers (and the CLI)
+        with job_lock(RESULTS_FOLDER) as locked:
+            if not locked:
+                return jsonify({"error": "A re-score job is already running"}), 409
+            try:
+                job = RescoreJob(RESULTS_FOLDER, key['answers'], threshold=threshold,
+                                 key_id=key['key_id'], key_version=key['version'],
+                                 select_key_id=key['key_id'],
+                                 dry_run=bool(data.get('dry_run', False)))
+            except ValueError as e:
+                return jsonify({"error": f"Invalid answer key: {e}"}), 400
+            summary = job.run()
+        
+        return jsonify({"success": True, "job": summary})
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/rescore/<job_id>/diff', methods=['GET'])
+def rescore_diff(job_id: str):
+    """Download the changed grades of a re-score job (CSV)"""
+    try:
+        diff_path = RESULTS_FOLDER / JOBS_DIR / secure_filename(job_id) / "diff.csv"
+        if not diff_path.exists():
+            return jsonify({"error": "Re-score job not found"}), 404
+        
+        return send_file(str(diff_path), mimetype='text/csv', as_attachment=True,
+                         download_name=f"rescore_{secure_filename(job_id)}.csv")
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/images', methods=['GET'])
 def list_images():
     """List uploaded images"""
@@ -186,7 +535,9 @@ def list_images():
                 images.append({
                     "filename": file.name,
                     "timestamp": file.stat().st_mtime,
-                    "size": file.stat().st_size
+                    "size": file.stat().st_size,
+                    "thumbnail": url_for('image_thumbnail', filename=file.name, size='thumb'),
+                    "preview": url_for('image_thumbnail', filename=file.name, size='preview')
                 })
         
         return jsonify({
@@ -202,17 +553,74 @@ def list_images():
 def download_image(filename: str):
     """Download uploaded image"""
     try:
-        image_path = UPLOAD_FOLDER / secure_filename(filename)
+        name = upload_name(filename)
+        image_path = storage.resolve_upload(name) if name else None
         
-        if not image_path.exists():
+        if image_path is None:
             return jsonify({"error": "Image not found"}), 404
         
+        storage.touch(image_path)
         return send_file(str(image_path), as_attachment=True)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/image/<filename>/thumbnail', methods=['GET'])
+def image_thumbnail(filename: str):
+    """Downscaled JPEG of an upload (?size=thumb|preview|<pixels>)"""
+    try:
+        size = request.args.get('size', 'thumb')
+        try:
+            name = upload_name(filename)
+            thumbnail_path = thumbnails.get(name, size) if name else None
+        except ValueError:
+            return jsonify({"error": f"Invalid size: {size}"}), 400
+        
+        if thumbnail_path is None:
+            return jsonify({"error": "Image not found"}), 404
+        
+        # Conditional response: ETag / Last-Modified give 304 on revalidation
+        return send_file(str(thumbnail_path), mimetype='image/jpeg',
+                         conditional=True, etag=True, max_age=86400)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/storage', methods=['GET'])
+def storage_status():
+    """Disk usage and last eviction run"""
+    try:
+        return jsonify({
+            "success": True,
+            "usage": storage.usage(),
+            "retention_days": storage.retention_days,
+            "last_run": storage.last_run
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Resource governor state, sensor readings and latest sheet stats"""
+    try:
+        return jsonify({
+            "success": True,
+            "worker": os.environ.get("RPI_WORKER_INDEX"),
+            "governor": pipeline.governor.metrics() if pipeline.governor else None,
+            "sensors": SystemSensors().read(),
+            "last_sheet": pipeline.last_sheet,
+            "ocr_workers": ocr_pool.stats() if ocr_pool is not None else None,
+            "memory": read_memory()
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/version', methods=['GET'])
 def version():
     """Get version info"""
@@ -237,8 +645,45 @@ def server_error(error):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='RPi Answer Sheet Checker Web Server')
+    parser.add_argument('--host', type=str, default='0.0.0.0',
+                       help='Bind address (default: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=5000,
+                       help='Port (default: 5000)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Pre-forked worker processes sharing the model (default: 1)')
+    parser.add_argument('--torch-threads', type=int,
+                       help='Torch threads per worker (default: CPUs / workers)')
+    parser.add_argument('--ocr-workers', type=int, default=OCR_WORKERS,
+                       help='OCR processes fed through shared-memory frame slots (default: 0)')
+    args = parser.parse_args()
+    
     print("🌐 Starting RPi Answer Sheet Checker Web Server")
-    print("📍 Address: http://localhost:5000")
-    print("📱 Access from other devices: http://<rpi_ip>:5000")
+    print(f"📍 Address: http://localhost:{args.port}")
+    print(f"📱 Access from other devices: http://<rpi_ip>:{args.port}")
+    
+    if args.ocr_workers > 0:
+        if args.workers > 1:
+            parser.error("--ocr-workers needs a single front-end process (--workers 1)")
+        from frame_transport import FramePool, OCRWorkerPool
+        
+        # Fork OCR processes from the loaded model; requests hand them frames
+        frame_pool = FramePool(slots=2 * args.ocr_workers,
+                               slot_bytes=int(FRAME_SLOT_MB * 1024 ** 2))
+        ocr_pool = OCRWorkerPool(pipeline, frame_pool, workers=args.ocr_workers,
+                                 torch_threads=args.torch_threads)
+        ocr_pool.start()
     
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    if args.workers > 1:
+        from prefork import PreforkServer, freeze_for_fork
+        
+        # Model is already loaded at import; freeze it so workers share it
+        freeze_for_fork(pipeline)
+        PreforkServer(app, host=args.host, port=args.port,
+                      workers=args.workers,
+                      torch_threads=args.torch_threads).serve_forever()
+    else:
+        if args.torch_threads:
+            from prefork import set_torch_threads
+            set_torch_threads(args.torch_threads)
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
@@ -15,6 +15,7 @@ const resultsSection = document.getElementById('resultsSection');
 const resultsSummary = document.getElementById('resultsSummary');
 const resultsDetails = document.getElementById('resultsDetails');
 const historyList = document.getElementById('historyList');
+const galleryList = document.getElementById('galleryList');
 
 // State
 let uploadedImagePath = null;
@@ -75,6 +76,7 @@ async function uploadImage(file) {
             uploadedImagePath = data.path;
             showStatus(`✓ Image uploaded: ${file.name}`, 'success');
             gradeBtn.disabled = false;
+            loadGallery();
         } else {
             showStatus(`Upload failed: ${data.error}`, 'error');
         }
@@ -291,8 +293,39 @@ function escapeHtml(text) {
 document.addEventListener('DOMContentLoaded', () => {
     addAnswerField(1);
     loadHistoryFromServer();
+    loadGallery();
 });
 
+// Uploads gallery: thumbnails only, previews and originals on demand
+async function loadGallery() {
+    try {
+        const response = await fetch('/api/images');
+        const data = await response.json();
+        
+        if (!data.success || data.images.length === 0) {
+            galleryList.innerHTML = '<p class="placeholder">No uploads yet</p>';
+            return;
+        }
+        
+        galleryList.innerHTML = data.images.map(image => {
+            const name = encodeURIComponent(image.filename);
+            return `
+                <div class="gallery-item">
+                    <a href="${image.preview}" target="_blank" title="Open preview">
+                        <img src="${image.thumbnail}" loading="lazy" alt="${escapeHtml(image.filename)}">
+                    </a>
+                    <div class="gallery-meta">
+                        ${(image.size / (1024 * 1024)).toFixed(1)} MB ·
+                        <a href="/api/image/${name}">original</a>
+                    </div>
+                </div>
+            `;
+        }).join('');
+    } catch (error) {
+        console.error('Failed to load uploads:', error);
+    }
+}
+
 async function loadHistoryFromServer() {
     try {
         const response = await fetch('/api/results');
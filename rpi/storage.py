@@ -0,0 +1,446 @@
+"""
+Bounded storage for uploads and results
+Enforces a disk budget and retention with background LRU eviction
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.processing.image_loader import ImageLoader
+
+
+# Suffix marking originals that were already re-encoded
+COMPACT_SUFFIX = ".compact"
+
+# Live managers, for the fork hooks registered once below
+_managers = weakref.WeakSet()
+_forking: List = []
+
+
+def _before_fork():
+    """Hold every manager's lock so no child inherits it mid-update"""
+    _forking[:] = list(_managers)
+    for manager in _forking:
+        manager._lock.acquire()
+
+
+def _after_fork_parent():
+    for manager in _forking:
+        manager._lock.release()
+    _forking.clear()
+
+
+def _after_fork_child():
+    for manager in _forking:
+        manager._after_fork_child()
+    _forking.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_parent,
+                        after_in_child=_after_fork_child)
+
+
+class StorageManager:
+    """
+    Manages uploads/ and results/ on small SD cards
+    Grading requests only signal the eviction thread, they never wait on it.
+    The thread starts with the manager and runs one pass right away, so a
+    server restarted on a full card (or left idle) still applies retention.
+    """
+
+    def __init__(self, upload_dir: Path, results_dir: Path,
+                 max_bytes: int = 2 * 1024 ** 3,
+                 retention_days: float = 30,
+                 compact_originals: bool = True,
+                 compact_format: str = "jpg",
+                 working_size: Tuple[int, int] = (1280, 960),
+                 interval_sec: float = 300,
+                 on_evict: Optional[Callable[[Path], None]] = None):
+        """
+        Initialize storage manager
+
+        Args:
+            upload_dir: Folder with uploaded originals
+            results_dir: Folder with result files
+            max_bytes: Disk budget for both folders
+            retention_days: Delete files older than this (0 disables)
+            compact_originals: Re-encode originals before deleting them
+            compact_format: 'jpg' or 'webp'
+            working_size: OCR working resolution (width, height)
+            interval_sec: Periodic eviction interval
+            on_evict: Callback invoked with each removed upload path
+        """
+        self.upload_dir = Path(upload_dir)
+        self.results_dir = Path(results_dir)
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.compact_originals = compact_originals
+        self.compact_format = compact_format
+        self.working_size = working_size
+        self.interval_sec = interval_sec
+        self.on_evict = on_evict
+
+        # LRU index of uploads: name -> last access time
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.last_run: Dict = {}
+
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+        # Forked workers must not inherit _lock while the thread holds it
+        _managers.add(self)
+        self.request_eviction()
+
+    def _after_fork_child(self):
+        """Fresh locks in a forked child; its own thread starts on the next request"""
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load_index(self):
+        """Seed LRU order from file modification times"""
+        files = [f for f in self.upload_dir.iterdir() if f.is_file()]
+        files.sort(key=lambda f: f.stat().st_mtime)
+        with self._lock:
+            for f in files:
+                self._lru[f.name] = f.stat().st_mtime
+
+    # ------------------------------------------------------------------
+    # Request-path API (cheap, never blocks on eviction)
+    # ------------------------------------------------------------------
+
+    def record_upload(self, path: Path):
+        """Register a new upload and schedule eviction"""
+        self.touch(path)
+        self.request_eviction()
+
+    def touch(self, path: Path):
+        """Mark an upload as recently used"""
+        name = Path(path).name
+        with self._lock:
+            self._lru[name] = time.time()
+            self._lru.move_to_end(name)
+
+    def resolve_upload(self, filename: str) -> Optional[Path]:
+        """
+        Find an upload by its original name, following compaction
+
+        Args:
+            filename: Upload filename as returned by /api/upload
+
+        Returns:
+            Path or None if the file was evicted
+        """
+        path = self.upload_dir / filename
+        if path.exists():
+            return path
+        # <name>.compact.<ext>; older compactions dropped the original extension
+        for base in (filename, Path(filename).stem):
+            for ext in (".jpg", ".webp"):
+                compact_path = self.upload_dir / f"{base}{COMPACT_SUFFIX}{ext}"
+                if compact_path.exists():
+                    return compact_path
+        return None
+
+    def request_eviction(self):
+        """Wake the background eviction thread"""
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def save_result(self, results: Dict, filename: str) -> str:
+        """
+        Save results as compressed compact JSON
+
+        Args:
+            results: Grading results
+            filename: Base filename (e.g. result_20251205_103000.json)
+
+        Returns:
+            str: Stored filename
+        """
+        if not filename.endswith(".gz"):
+            filename += ".gz"
+        write_result_file(self.results_dir / filename, results)
+
+        self.request_eviction()
+        return filename
+
+    def load_result(self, filename: str) -> Optional[Dict]:
+        """
+        Load a stored result (plain or gzip JSON)
+
+        Args:
+            filename: Result filename
+
+        Returns:
+            Dict or None if not found
+        """
+        path = self.results_dir / filename
+        if not path.exists():
+            return None
+        return load_result_file(path)
+
+    def list_results(self) -> List[Path]:
+        """List stored result files, newest first"""
+        files = [f for f in self.results_dir.iterdir()
+                 if f.is_file() and is_result_file(f.name)]
+        return sorted(files, key=lambda f: f.name, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Background eviction
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self):
+        """Start the eviction thread if this process has none (e.g. after fork)"""
+        if (self._thread is not None and self._thread.is_alive()
+                and self._thread_pid == os.getpid()):
+            return
+        with self._lock:
+            if (self._thread is not None and self._thread.is_alive()
+                    and self._thread_pid == os.getpid()):
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name="storage-eviction",
+                                            daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        """Eviction loop: runs on wakeup or every interval_sec"""
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval_sec)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.enforce()
+            except Exception as e:
+                print(f"⚠️  Storage eviction error: {e}")
+
+    def stop(self):
+        """Stop the eviction thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(timeout=5)
+
+    def usage(self) -> Dict:
+        """Return current disk usage of managed folders"""
+        uploads = sum(f.stat().st_size for f in self.upload_dir.iterdir() if f.is_file())
+        # Includes re-score history and job folders under results/
+        results = sum(f.stat().st_size for f in self.results_dir.rglob("*") if f.is_file())
+        return {
+            "uploads_bytes": uploads,
+            "results_bytes": results,
+            "total_bytes": uploads + results,
+            "budget_bytes": self.max_bytes
+        }
+
+    def enforce(self) -> Dict:
+        """
+        Apply retention, then compact/evict least recently used originals
+        until the folders fit in the budget
+
+        Returns:
+            Dict: Summary of actions taken
+        """
+        stats = {"expired": 0, "compacted": 0, "evicted": 0, "freed_bytes": 0}
+        now = time.time()
+
+        # 1. Age-based retention of uploads and results; re-score history and
+        # job folders are only trimmed by the budget, and dot-files (the
+        # re-score lock) are never touched
+        if self.retention_days:
+            cutoff = now - self.retention_days * 86400
+            for folder in (self.upload_dir, self.results_dir):
+                for f in list(folder.iterdir()):
+                    if f.name.startswith('.'):
+                        continue
+                    if f.is_file() and f.stat().st_mtime < cutoff:
+                        stats["freed_bytes"] += f.stat().st_size
+                        self._remove(f)
+                        stats["expired"] += 1
+
+        # 2. Disk budget: archived revisions and re-score diffs go first, oldest first
+        total = self.usage()["total_bytes"]
+        if total > self.max_bytes:
+            for path in self._derived_results():
+                if total <= self.max_bytes:
+                    break
+                size = path.stat().st_size
+                self._remove(path)
+                total -= size
+                stats["freed_bytes"] += size
+                stats["evicted"] += 1
+
+        # 3. LRU eviction of originals
+        if total > self.max_bytes:
+            for name in self._lru_order():
+                if total <= self.max_bytes:
+                    break
+                path = self.upload_dir / name
+                if not path.exists():
+                    self._forget(name)
+                    continue
+
+                size_before = path.stat().st_size
+                if self.compact_originals and not is_compacted(path.name):
+                    compact_path = self.compact(path)
+                    if compact_path is not None:
+                        freed = size_before - compact_path.stat().st_size
+                        total -= freed
+                        stats["freed_bytes"] += freed
+                        stats["compacted"] += 1
+                        continue
+
+                self._remove(path)
+                total -= size_before
+                stats["freed_bytes"] += size_before
+                stats["evicted"] += 1
+
+        self._prune_empty_dirs()
+        stats["timestamp"] = now
+        stats["total_bytes"] = total
+        self.last_run = stats
+        if stats["expired"] or stats["compacted"] or stats["evicted"]:
+            print(f"🧹 Storage: {stats['expired']} expired, {stats['compacted']} compacted, "
+                  f"{stats['evicted']} evicted ({stats['freed_bytes'] / 1e6:.1f} MB freed)")
+        return stats
+
+    def compact(self, path: Path) -> Optional[Path]:
+        """
+        Re-encode an original as grayscale JPEG/WebP at working resolution
+
+        Args:
+            path: Original image path
+
+        Returns:
+            Path of compact image, or None if it did not save space
+        """
+        image = ImageLoader(self.working_size, grayscale=True).load(path, fit=True)
+        if image is None:
+            return None
+
+        if self.compact_format == "webp":
+            ext, params = ".webp", [cv2.IMWRITE_WEBP_QUALITY, 80]
+        else:
+            ext, params = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, 85]
+
+        ok, encoded = cv2.imencode(ext, image, params)
+        if not ok or encoded.nbytes >= path.stat().st_size:
+            return None
+
+        # Keep the original extension so a.jpg and a.png stay distinct
+        compact_path = path.with_name(f"{path.name}{COMPACT_SUFFIX}{ext}")
+        compact_path.write_bytes(encoded.tobytes())
+        os.utime(compact_path, (path.stat().st_atime, path.stat().st_mtime))
+
+        self._remove(path)
+        with self._lock:
+            # Keep LRU position of the original
+            self._lru[compact_path.name] = time.time()
+            self._lru.move_to_end(compact_path.name, last=False)
+        return compact_path
+
+    def _derived_results(self) -> List[Path]:
+        """Files in results/ subfolders (re-score history and diffs), oldest first"""
+        files = [f for f in self.results_dir.rglob("*")
+                 if f.is_file() and f.parent != self.results_dir
+                 and not any(part.startswith('.')
+                             for part in f.relative_to(self.results_dir).parts)]
+        return sorted(files, key=lambda f: f.stat().st_mtime)
+
+    def _prune_empty_dirs(self, min_age_sec: float = 60):
+        """Remove per-job folders (results/<dir>/<job>/) left empty on an earlier pass"""
+        cutoff = time.time() - min_age_sec  # Don't race a job that just created its folder
+        for folder in self.results_dir.glob("*/*"):
+            try:
+                if folder.is_dir() and folder.stat().st_mtime < cutoff:
+                    folder.rmdir()
+            except OSError:
+                pass  # Not empty
+
+    def _lru_order(self) -> List[str]:
+        """Upload names, least recently used first"""
+        with self._lock:
+            known = list(self._lru.keys())
+        on_disk = {f.name for f in self.upload_dir.iterdir() if f.is_file()}
+        # Files not seen through the API are treated as oldest
+        unknown = sorted(on_disk - set(known))
+        return unknown + [name for name in known if name in on_disk]
+
+    def _forget(self, name: str):
+        """Drop a name from the LRU index"""
+        with self._lock:
+            self._lru.pop(name, None)
+
+    def _remove(self, path: Path):
+        """Delete a file and notify listeners"""
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        if path.parent == self.upload_dir:
+            self._forget(path.name)
+            if self.on_evict:
+                self.on_evict(path)
+
+
+def is_compacted(filename: str) -> bool:
+    """Check whether an upload name is a re-encoded original"""
+    return COMPACT_SUFFIX in Path(filename).stem
+
+
+def original_name(filename: str) -> str:
+    """Upload name a compacted file was made from (a.png.compact.jpg -> a.png)"""
+    path = Path(filename)
+    if COMPACT_SUFFIX in path.stem:
+        return path.stem.replace(COMPACT_SUFFIX, "")
+    return filename
+
+
+def is_result_file(filename: str) -> bool:
+    """Check whether filename is a stored result (plain or compressed)"""
+    return filename.endswith(".json") or filename.endswith(".json.gz")
+
+
+def load_result_file(path: Path) -> Dict:
+    """Load a result file, decompressing if needed"""
+    if str(path).endswith(".gz"):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_result_file(path: Path, results: Dict):
+    """Atomically write a result as compressed compact JSON"""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    data = json.dumps(results, separators=(',', ':')).encode('utf-8')
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
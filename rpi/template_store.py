@@ -0,0 +1,101 @@
+"""
+Sheet template store for Raspberry Pi server
+Keeps answer-box templates as JSON files and caches the parsed objects
+"""
+
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.processing.sheet_template import SheetTemplate, TEMPLATE_ID_PATTERN
+
+
+class TemplateStore:
+    """
+    Sheet templates persisted as <template_id>.json
+    Parsed templates are reused until their file changes
+    """
+
+    def __init__(self, folder: Path):
+        """
+        Initialize store
+
+        Args:
+            folder: Folder holding template files
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._cache: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def save(self, data: Dict) -> SheetTemplate:
+        """
+        Validate and store a template (replaces one with the same id)
+
+        Args:
+            data: Template JSON object
+
+        Returns:
+            SheetTemplate
+
+        Raises:
+            ValueError: If the template is malformed
+        """
+        template = SheetTemplate.from_dict(data)
+        path = self.folder / f"{template.template_id}.json"
+        tmp_path = path.with_name(path.name + ".tmp")
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(template.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+            self._cache.pop(template.template_id, None)
+        return template
+
+    def get(self, template_id: str) -> Optional[SheetTemplate]:
+        """
+        Fetch a template by id
+
+        Args:
+            template_id: Template id
+
+        Returns:
+            SheetTemplate or None if not found
+        """
+        if not TEMPLATE_ID_PATTERN.match(template_id):
+            return None
+        path = self.folder / f"{template_id}.json"
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(template_id)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        template = SheetTemplate.load(str(path))
+        with self._lock:
+            self._cache[template_id] = (mtime, template)
+        return template
+
+    def list(self) -> List[Dict]:
+        """List stored templates"""
+        templates = []
+        for path in sorted(self.folder.glob("*.json")):
+            template = self.get(path.stem)
+            if template is None:
+                continue
+            templates.append({
+                "template_id": template.template_id,
+                "name": template.name,
+                "questions": template.num_questions,
+                "regions": len(template.regions)
+            })
+        return templates
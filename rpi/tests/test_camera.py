@@ -0,0 +1,69 @@
+"""
+Threaded frame grabber and best-frame capture against replayed frames
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from camera import RPiCameraCapture, ReplayCapture
+
+
+def _numbered(count: int) -> list:
+    """Frames whose pixel value is their index"""
+    return [np.full((48, 64, 3), i, np.uint8) for i in range(count)]
+
+
+def test_grabber_starts_threaded_and_stops_on_release():
+    camera = RPiCameraCapture(source=ReplayCapture(_numbered(10), fps=100, loop=True),
+                              threaded=True)
+    grabber = camera.grabber
+    assert grabber is not None and grabber.is_alive()
+
+    camera.release()
+
+    assert camera.grabber is None
+    assert not grabber.is_alive()
+
+
+def test_capture_returns_the_freshest_frame():
+    camera = RPiCameraCapture(source=ReplayCapture(_numbered(10), realtime=False),
+                              threaded=True)
+    camera.grabber.join(5)  # Source replayed to the end
+    try:
+        assert camera.grabber.eof
+        assert camera.capture()[0, 0, 0] == 9
+        assert camera.next_frame() is None  # Nothing newer than what was returned
+    finally:
+        camera.release()
+
+
+def test_burst_larger_than_the_ring_buffer():
+    camera = RPiCameraCapture(source=ReplayCapture(_numbered(10), fps=100, loop=True),
+                              threaded=True, buffer_size=4)
+    try:
+        frames = camera.capture_burst(5)
+    finally:
+        camera.release()
+
+    assert len(frames) == 5
+    # Consecutive frames of the replay (the value wraps at 10)
+    values = [int(frame[0, 0, 0]) for frame in frames]
+    assert [(b - a) % 10 for a, b in zip(values, values[1:])] == [1] * 4
+
+
+def test_capture_best_keeps_the_sharp_frame():
+    rng = np.random.default_rng(0)
+    sharp = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    blurred = cv2.GaussianBlur(sharp, (15, 15), 5)
+    camera = RPiCameraCapture(source=ReplayCapture([blurred, sharp, blurred], realtime=False))
+
+    frame, score = camera.capture_best(num_frames=3)
+
+    assert score["index"] == 1
+    assert np.array_equal(frame, sharp)
+    camera.release()
@@ -0,0 +1,92 @@
+"""
+Continuous mode: page change detection and a bounded OCR backlog
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from camera import RPiCameraCapture, ReplayCapture
+from continuous import ContinuousGrader, PageChangeDetector
+
+STILL = PageChangeDetector().still_frames
+
+
+def _page(seed: int) -> np.ndarray:
+    """Textured frame, sharp enough to count as a page with text"""
+    return np.random.default_rng(seed).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+
+
+def _session(pages: list) -> list:
+    """Each page is placed (empty table in between), then held still"""
+    blank = np.zeros((240, 320, 3), np.uint8)
+    frames = []
+    for page in pages:
+        frames += [blank, blank] + [page] * (STILL + 3)
+    return frames
+
+
+def _detections(frames: list) -> list:
+    detector = PageChangeDetector()
+    return [i for i, frame in enumerate(frames) if detector.update(frame)]
+
+
+def test_each_settled_page_is_detected_once():
+    frames = _session([_page(1), _page(2)])
+    assert len(_detections(frames)) == 2
+
+
+def test_same_template_swapped_in_is_a_new_sheet():
+    # Identical sheets still count: the swap disturbed the view
+    assert len(_detections(_session([_page(1), _page(1)]))) == 2
+
+
+def test_empty_table_is_not_a_page():
+    blank = np.zeros((240, 320, 3), np.uint8)
+    assert _detections([blank] * (3 * STILL)) == []
+
+
+class BlockingPipeline:
+    """Grades only when the test allows it, like OCR on a slow Pi"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def set_answer_key(self, answer_key, matcher=None):
+        pass
+
+    def grade_frame(self, frame):
+        self.release.wait(10)
+        return {"success": True, "summary": {"percentage": 100.0}}
+
+
+def test_backlog_is_bounded_and_no_sheet_is_dropped():
+    pipeline = BlockingPipeline()
+    camera = RPiCameraCapture(source=ReplayCapture(_session([_page(i) for i in range(6)]),
+                                                   realtime=False))
+    grader = ContinuousGrader(camera, pipeline, ["photosynthesis"], max_pending=2)
+
+    in_flight = []
+    next_frame = camera.next_frame
+
+    def watched_next_frame():
+        in_flight.append(grader.sheets - grader.completed - grader.failed)
+        return next_frame()
+
+    def release_when_paused():
+        while not grader.backlog_waits:
+            time.sleep(0.01)
+        pipeline.release.set()  # The camera loop paused; let OCR catch up
+
+    camera.next_frame = watched_next_frame
+    threading.Thread(target=release_when_paused, daemon=True).start()
+    stats = grader.run()
+
+    assert stats["sheets"] == 6 and stats["failed"] == 0
+    assert stats["backlog_waits"] >= 1
+    assert max(in_flight) <= grader.max_pending
@@ -0,0 +1,91 @@
+"""
+Gradebook export: filters, both tables and streamed formats
+"""
+
+import csv
+import io
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from export import GradebookExporter, parse_since
+from storage import write_result_file
+
+
+def _result(passed: list, key_id: str = "bio") -> dict:
+    result = {str(number): {"expected": f"answer {number}", "student": f"answer {number}",
+                            "similarity": 1.0 if ok else 0.2,
+                            "status": "✓ PASS" if ok else "✗ FAIL"}
+              for number, ok in enumerate(passed, 1)}
+    result["summary"] = {"total_questions": len(passed), "passed": sum(passed),
+                         "percentage": 100.0 * sum(passed) / len(passed), "threshold": 0.7}
+    result.update(success=True, key_id=key_id, key_version=1, image="/uploads/sheet.jpg")
+    return result
+
+
+@pytest.fixture
+def results_dir(tmp_path):
+    write_result_file(tmp_path / "result_20250105_080000_000000.json.gz", _result([True, False]))
+    write_result_file(tmp_path / "result_20250105_133000_000000.json.gz",
+                      _result([True, True, True]))
+    write_result_file(tmp_path / "result_20250210_090000_000000.json.gz",
+                      _result([False], key_id="chem"))
+    write_result_file(tmp_path / "result_20250211_090000_000000.json.gz",
+                      {"success": False, "error": "No text extracted"})
+    return tmp_path
+
+
+def _csv(exporter: GradebookExporter) -> list:
+    return list(csv.DictReader(io.StringIO("".join(exporter.iter_csv()))))
+
+
+def test_gradebook_has_one_row_per_successful_sheet(results_dir):
+    rows = _csv(GradebookExporter(results_dir))
+
+    assert [row["result_file"][7:22] for row in rows] == \
+        ["20250105_080000", "20250105_133000", "20250210_090000"]
+    assert rows[0]["graded_at"] == "2025-01-05T08:00:00"
+    assert (rows[0]["q1"], rows[0]["q2"], rows[0]["q3"]) == ("1", "0", "")
+    assert rows[1]["percentage"] == "100.0"
+
+
+def test_answers_table_has_one_row_per_question(results_dir):
+    rows = _csv(GradebookExporter(results_dir, table="answers", key_id="bio"))
+    assert len(rows) == 5
+    assert {row["key_id"] for row in rows} == {"bio"}
+
+
+def test_since_compares_times_not_text(results_dir):
+    def files(since):
+        return [row["result_file"][7:22] for row in _csv(GradebookExporter(results_dir, since=since))]
+
+    assert files("2025-01-05T12:00") == ["20250105_133000", "20250210_090000"]
+    assert files("2025-01-05") == ["20250105_080000", "20250105_133000", "20250210_090000"]
+    assert files(datetime(2025, 2, 1)) == ["20250210_090000"]
+
+
+@pytest.mark.parametrize("since", ["2025-1-5", "yesterday", "05/01/2025"])
+def test_malformed_since_is_rejected(results_dir, since):
+    with pytest.raises(ValueError):
+        GradebookExporter(results_dir, since=since)
+
+
+def test_parse_since_accepts_timezones():
+    assert parse_since(None) is None
+    assert parse_since("") is None
+    assert parse_since("2025-12-01T08:30+00:00").tzinfo is None
+
+
+def test_parquet_streams_in_row_groups(results_dir):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = results_dir / "gradebook.parquet"
+
+    count = GradebookExporter(results_dir, chunk_rows=1).write(str(out))
+
+    table = pq.read_table(out)
+    assert count == 3 and table.num_rows == 3
+    assert pq.ParquetFile(out).num_row_groups == 3
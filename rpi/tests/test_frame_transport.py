@@ -0,0 +1,129 @@
+"""
+FramePool reference counting and generations, and OCRWorkerPool hand-off
+"""
+
+import gc
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from frame_transport import FramePool, OCRWorkerPool
+from pipeline import RPiPipeline
+
+STUDENT = ["photosynthesis in the leaves", "mitochondria make energy"]
+
+
+class MeanExtractor:
+    """Stub OCR: reads the answers, or nothing from a black frame"""
+
+    last_line_count = 2
+
+    def extract_text(self, image):
+        return list(STUDENT) if image.mean() > 0 else []
+
+    def freeze(self):
+        pass
+
+
+@pytest.fixture
+def frames():
+    pool = FramePool(slots=2, slot_bytes=64 * 64 * 3)
+    yield pool
+    pool.close()
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((64, 64, 3), value, np.uint8)
+
+
+def test_put_and_view_in_a_forked_process(frames):
+    ref = frames.put(_frame(7))
+    pid = os.fork()
+    if pid == 0:
+        view = frames.view(ref)
+        ok = view.shape == (64, 64, 3) and int(view.sum()) == 7 * view.size
+        del view
+        frames.release(ref)
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    # The child's release dropped the only reference
+    assert frames.stats()["in_use"] == 0
+
+
+def test_slot_is_reused_only_after_the_last_release(frames):
+    ref = frames.put(_frame(1))
+    frames.retain(ref)
+    frames.release(ref)
+    assert frames.stats()["in_use"] == 1
+    assert frames.view(ref)[0, 0, 0] == 1
+
+    frames.release(ref)
+    assert frames.stats()["in_use"] == 0
+
+
+def test_stale_reference_is_rejected_after_reuse(frames):
+    old = frames.put(_frame(1))
+    frames.release(old)
+    new = frames.put(_frame(2))
+    assert new.slot == old.slot and new.generation == old.generation + 1
+
+    with pytest.raises(ValueError):
+        frames.view(old)
+    with pytest.raises(ValueError):
+        frames.retain(old)
+    frames.release(old)  # No-op: must not drop the new occupant's reference
+    assert frames.view(new)[0, 0, 0] == 2
+
+
+def test_full_pool_times_out_and_oversized_frames_are_refused(frames):
+    refs = [frames.put(_frame(i)) for i in range(2)]
+    assert frames.put(_frame(3), timeout=0.05) is None
+    assert frames.stats()["waits"] >= 1
+    with pytest.raises(ValueError):
+        frames.acquire((65, 64, 3))
+    for ref in refs:
+        frames.release(ref)
+
+
+def test_submit_without_running_workers_keeps_no_reference(frames):
+    pipeline = RPiPipeline(extractor=MeanExtractor(), rectify=False, deskew=False)
+    pool = OCRWorkerPool(pipeline, frames, workers=1)
+    ref = frames.put(_frame(1))
+
+    with pytest.raises(RuntimeError):
+        pool.submit(ref, STUDENT)
+    frames.release(ref)
+    assert frames.stats()["in_use"] == 0
+
+
+def test_worker_pool_grades_and_frees_slots(frames):
+    pipeline = RPiPipeline(extractor=MeanExtractor(), rectify=False, deskew=False)
+    pool = OCRWorkerPool(pipeline, frames, workers=2, torch_threads=1)
+    pool.start()
+    try:
+        ref = frames.put(_frame(200))
+        future = pool.submit(ref, STUDENT)
+        frames.release(ref)  # The pool keeps its own reference
+        assert future.result(timeout=30)["summary"]["percentage"] == 100.0
+
+        ref = frames.put(_frame(0))
+        results = pool.grade(ref, STUDENT, timeout=30)
+        frames.release(ref)
+        assert results["success"] is False
+    finally:
+        pool.stop()
+        gc.unfreeze()  # start() froze the test process for copy-on-write
+
+    assert frames.stats()["in_use"] == 0
+    assert pool.stats()["completed"] == 2
+    ref = frames.put(_frame(1))
+    with pytest.raises(RuntimeError):
+        pool.submit(ref, STUDENT)
+    frames.release(ref)
+    assert frames.stats()["in_use"] == 0
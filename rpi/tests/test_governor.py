@@ -0,0 +1,46 @@
+"""
+Governor presets change the resolution the pipeline actually works at
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from governor import PRESETS, ResourceGovernor, SystemSensors
+from pipeline import RPiPipeline
+
+
+class LineExtractor:
+    """Stub OCR that reads one line"""
+
+    last_line_count = 1
+
+    def extract_text(self, image):
+        return ["photosynthesis"]
+
+
+def _governed(level: int) -> RPiPipeline:
+    pipeline = RPiPipeline(extractor=LineExtractor(), rectify=False, deskew=False)
+    sensors = SystemSensors(temperature_reader=lambda: 50.0)
+    pipeline.set_governor(ResourceGovernor(pipeline, sensors=sensors, level=level))
+    return pipeline
+
+
+def test_each_preset_sets_working_resolution(tmp_path):
+    frame = np.full((1440, 1920, 3), 230, np.uint8)
+    image_path = tmp_path / "sheet.jpg"
+    cv2.imwrite(str(image_path), frame)
+
+    for level, preset in enumerate(PRESETS):
+        pipeline = _governed(level)
+        width, height = preset["working_size"]
+
+        pipeline.process_array(frame)
+        assert pipeline.last_stats["working_pixels"] == width * height
+
+        pipeline.process_image(str(image_path))
+        assert pipeline.last_stats["decoded_size"] == [width, height]
@@ -0,0 +1,48 @@
+"""
+Decode-time downscaling picks a safe reduction, even for corrupt headers
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.processing.image_loader import ImageLoader, read_image_size
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    ok, data = cv2.imencode(".jpg", np.full((height, width, 3), 200, np.uint8))
+    assert ok
+    return data.tobytes()
+
+
+def _zero_size_header(data: bytes) -> bytes:
+    """Same JPEG with the SOF0 height and width overwritten with 0"""
+    sof = data.index(b"\xff\xc0")
+    return data[:sof + 5] + b"\x00\x00\x00\x00" + data[sof + 9:]
+
+
+def test_reduction_keeps_working_size():
+    loader = ImageLoader((1280, 960))
+    assert loader.reduction_for(4056, 3040) == 2
+    assert loader.reduction_for(1920, 1440) == 1
+    assert loader.reduction_for(10240, 7680) == 8
+
+
+def test_zero_dimensions_do_not_raise():
+    loader = ImageLoader((1280, 960))
+    assert loader.reduction_for(0, 3040) == 1
+    assert loader.reduction_for(4056, 0) == 1
+
+    data = _zero_size_header(_jpeg(64, 48))
+    assert read_image_size(data) is None
+    image, info = loader.load_with_info(data)
+    assert info["reduction"] == 1
+    assert info["original_size"] is None
+
+
+def test_header_size_without_decoding():
+    assert read_image_size(_jpeg(640, 480)) == (640, 480)
@@ -0,0 +1,78 @@
+"""
+One pipeline shared by concurrent requests grades each against its own key
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pipeline import RPiPipeline
+from src.processing.image_loader import ImageLoader
+
+STUDENT = ["photosynthesis in the leaves", "mitochondria make energy"]
+OTHER_KEY = ["volcanic eruptions", "tectonic plates"]
+
+
+class SlowExtractor:
+    """Stub OCR: always reads STUDENT, slowly enough for requests to overlap"""
+
+    last_line_count = 2
+
+    def extract_text(self, image):
+        time.sleep(0.02)
+        return list(STUDENT)
+
+
+def _pipeline() -> RPiPipeline:
+    return RPiPipeline(extractor=SlowExtractor(), rectify=False, deskew=False, fast_load=False)
+
+
+def test_concurrent_grades_keep_their_own_key():
+    pipeline = _pipeline()
+    page = np.full((200, 200), 255, np.uint8)
+    scores = {"own": [], "other": []}
+
+    def grade(name, key):
+        for _ in range(5):
+            results = pipeline.grade_frame(page, answer_key=key)
+            scores[name].append(results["summary"]["percentage"])
+
+    threads = [threading.Thread(target=grade, args=("own", STUDENT)),
+               threading.Thread(target=grade, args=("other", OTHER_KEY))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert scores["own"] == [100.0] * 5
+    assert scores["other"] == [0.0] * 5
+    assert pipeline.answer_key == []  # Per-call keys never replace the default
+
+
+def test_full_pipeline_does_not_replace_default_key(tmp_path):
+    image_path = tmp_path / "sheet.png"
+    cv2.imwrite(str(image_path), np.full((200, 200), 255, np.uint8))
+    pipeline = _pipeline()
+    pipeline.set_answer_key(OTHER_KEY)
+
+    results = pipeline.full_pipeline(str(image_path), STUDENT)
+
+    assert results["summary"]["percentage"] == 100.0
+    assert pipeline.answer_key == OTHER_KEY
+    assert pipeline.last_sheet["sheet_ms"] >= 0
+
+
+def test_process_bytes_reports_undecodable_upload():
+    pipeline = _pipeline()
+    pipeline.loader = ImageLoader()
+
+    extracted, success = pipeline.process_bytes(b"\xff\xd8\xff\xc0\x00\x11\x08\x00\x00\x00\x00 junk")
+
+    assert (extracted, success) == ([], False)
+    assert pipeline.last_error.startswith("Failed to decode image")
@@ -0,0 +1,104 @@
+"""
+Bulk re-scoring: diff of flipped grades, revision history and the job lock
+"""
+
+import csv
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rescore import HISTORY_DIR, JOBS_DIR, RescoreJob, job_lock
+from storage import load_result_file, write_result_file
+
+OLD_KEY = ["photosynthesis in the leaves", "volcanic eruptions"]
+NEW_KEY = ["photosynthesis in the leaves", "mitochondria make energy"]
+STUDENT = ["photosynthesis in the leaves", "mitochondria make energy"]
+
+
+def _result(key: list) -> dict:
+    """Graded result as the pipeline stores it: Q1 passes, Q2 fails against OLD_KEY"""
+    result = {}
+    for number, (expected, student) in enumerate(zip(key, STUDENT), 1):
+        ok = expected == student
+        result[str(number)] = {"expected": expected, "student": student,
+                               "similarity": 1.0 if ok else 0.0,
+                               "status": "✓ PASS" if ok else "✗ FAIL"}
+    result["summary"] = {"total_questions": 2, "passed": 1, "percentage": 50.0,
+                         "threshold": 0.7}
+    result.update(success=True, key_id="bio", key_version=1, image="/uploads/sheet.jpg")
+    return result
+
+
+def _results_dir(tmp_path: Path) -> Path:
+    write_result_file(tmp_path / "result_20250105_080000_000000.json.gz", _result(OLD_KEY))
+    with open(tmp_path / "result_20250105_090000_000000.json", "w") as f:
+        json.dump(_result(OLD_KEY), f)  # Stored before results were compressed
+    return tmp_path
+
+
+def _job(results_dir: Path, **kwargs) -> RescoreJob:
+    return RescoreJob(results_dir, NEW_KEY, key_id="bio", key_version=2,
+                      select_key_id="bio", **kwargs)
+
+
+def test_fixed_key_flips_grades_and_writes_diff(tmp_path):
+    results_dir = _results_dir(tmp_path)
+
+    summary = _job(results_dir).run()
+
+    assert (summary["sheets"], summary["rewritten"], summary["grades_changed"]) == (2, 2, 2)
+    assert summary["now_pass"] == 2 and summary["now_fail"] == 0
+
+    job_dir = results_dir / JOBS_DIR / summary["job_id"]
+    assert json.loads((job_dir / "job.json").read_text()) == summary
+    with open(results_dir / summary["diff_file"], newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["question"], row["status_old"], row["status_new"]) for row in rows] == \
+        [("2", "✗ FAIL", "✓ PASS")] * 2
+    assert rows[0]["expected_new"] == NEW_KEY[1]
+
+
+def test_rewritten_result_keeps_previous_revision(tmp_path):
+    results_dir = _results_dir(tmp_path)
+    _job(results_dir).run()
+
+    result = load_result_file(results_dir / "result_20250105_080000_000000.json.gz")
+    assert result["revision"] == 2 and result["key_version"] == 2
+    assert result["summary"]["percentage"] == 100.0
+    previous = load_result_file(results_dir / result["rescored"]["previous"])
+    assert previous["summary"]["percentage"] == 50.0
+
+    # The uncompressed result is replaced by a compressed revision
+    assert not (results_dir / "result_20250105_090000_000000.json").exists()
+    assert (results_dir / HISTORY_DIR / "result_20250105_090000_000000.r1.json").exists()
+    assert (results_dir / "result_20250105_090000_000000.json.gz").exists()
+
+
+def test_rescoring_again_ignores_history_and_changes_nothing(tmp_path):
+    results_dir = _results_dir(tmp_path)
+    _job(results_dir).run()
+
+    summary = _job(results_dir).run()
+
+    assert (summary["sheets"], summary["rewritten"], summary["grades_changed"]) == (2, 0, 0)
+
+
+def test_dry_run_leaves_results_untouched(tmp_path):
+    results_dir = _results_dir(tmp_path)
+    before = load_result_file(results_dir / "result_20250105_080000_000000.json.gz")
+
+    summary = _job(results_dir, dry_run=True).run()
+
+    assert summary["rewritten"] == 2 and summary["grades_changed"] == 2
+    assert load_result_file(results_dir / "result_20250105_080000_000000.json.gz") == before
+    assert not (results_dir / HISTORY_DIR).exists()
+
+
+def test_only_one_job_holds_the_lock(tmp_path):
+    with job_lock(tmp_path) as first:
+        with job_lock(tmp_path) as second:
+            assert first and not second
+    with job_lock(tmp_path) as again:
+        assert again
@@ -0,0 +1,144 @@
+"""
+Storage budget covers re-score output under results/; retention leaves it alone
+"""
+
+import gc
+import os
+import sys
+import time
+import weakref
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rescore import HISTORY_DIR, JOBS_DIR, LOCK_FILE, RescoreJob, job_lock
+from storage import StorageManager, write_result_file
+
+ANSWERS = ["photosynthesis in the leaves", "mitochondria make energy"]
+
+
+def _seed_results(results_dir: Path, count: int = 20):
+    """Results whose second answer only passes at a low threshold"""
+    for i in range(count):
+        write_result_file(results_dir / f"result_20250101_0000{i:02d}_000000.json.gz", {
+            "1": {"expected": ANSWERS[0], "student": ANSWERS[0],
+                  "similarity": 1.0, "status": "✓ PASS"},
+            "2": {"expected": ANSWERS[1], "student": "mitochondria store water",
+                  "similarity": 0.0, "status": "✗ FAIL"},
+            "summary": {"total_questions": 2, "passed": 1, "percentage": 50.0,
+                        "threshold": 0.7},
+            "success": True
+        })
+
+
+def _rescore_twice(results_dir: Path):
+    """Two real re-score runs: each archives a revision and writes a job folder"""
+    RescoreJob(results_dir, ANSWERS, threshold=0.1).run()
+    time.sleep(0.01)  # Distinct job ids
+    RescoreJob(results_dir, ANSWERS, threshold=0.9).run()
+
+
+def _derived(results_dir: Path):
+    return [f for f in results_dir.rglob("*") if f.is_file() and f.parent != results_dir]
+
+
+def test_usage_counts_rescore_output(tmp_path):
+    storage = StorageManager(tmp_path / "uploads", tmp_path / "results")
+    storage.stop()  # Enforce explicitly below, not from the background thread
+    _seed_results(storage.results_dir)
+    before = storage.usage()["results_bytes"]
+
+    _rescore_twice(storage.results_dir)
+
+    archived = list((storage.results_dir / HISTORY_DIR).iterdir())
+    assert len(archived) == 40
+    derived_bytes = sum(f.stat().st_size for f in _derived(storage.results_dir))
+    assert storage.usage()["results_bytes"] >= before + derived_bytes - 1024
+
+
+def test_budget_evicts_rescore_output_before_originals(tmp_path):
+    storage = StorageManager(tmp_path / "uploads", tmp_path / "results", retention_days=0)
+    storage.stop()
+    _seed_results(storage.results_dir)
+    upload = storage.upload_dir / "sheet.jpg"
+    upload.write_bytes(b"\xff" * 4096)
+    storage.touch(upload)
+
+    _rescore_twice(storage.results_dir)
+    assert _derived(storage.results_dir)
+
+    current = sum(f.stat().st_size for f in storage.results_dir.glob("result_*"))
+    storage.max_bytes = current + upload.stat().st_size
+    stats = storage.enforce()
+
+    assert not _derived(storage.results_dir)
+    assert stats["evicted"] > 0
+    assert upload.exists()
+    assert len(list(storage.results_dir.glob("result_*"))) == 20
+
+    # Emptied job folders go on a later pass
+    old = time.time() - 2 * 86400
+    for job_dir in (storage.results_dir / JOBS_DIR).iterdir():
+        os.utime(job_dir, (old, old))
+    storage.enforce()
+    assert not list((storage.results_dir / JOBS_DIR).iterdir())
+
+
+def test_retention_keeps_rescore_output_and_lock(tmp_path):
+    storage = StorageManager(tmp_path / "uploads", tmp_path / "results", retention_days=1)
+    storage.stop()
+    _seed_results(storage.results_dir)
+    _rescore_twice(storage.results_dir)
+    with job_lock(storage.results_dir):
+        pass
+    lock_file = storage.results_dir / LOCK_FILE
+    derived = _derived(storage.results_dir)
+
+    old = time.time() - 2 * 86400
+    for f in storage.results_dir.rglob("*"):
+        os.utime(f, (old, old))
+    stats = storage.enforce()
+
+    assert stats["expired"] == 20
+    assert not list(storage.results_dir.glob("result_*"))
+    assert lock_file.exists()
+    assert sorted(_derived(storage.results_dir)) == sorted(derived)
+
+
+def test_manager_is_not_kept_alive_by_fork_hooks(tmp_path):
+    storage = StorageManager(tmp_path / "uploads", tmp_path / "results")
+    storage.stop()
+    ref = weakref.ref(storage)
+    del storage
+    gc.collect()
+    assert ref() is None
+
+
+def test_retention_runs_at_startup(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    stale = uploads / "old.jpg"
+    stale.write_bytes(b"\xff" * 16)
+    old = time.time() - 40 * 86400
+    os.utime(stale, (old, old))
+
+    storage = StorageManager(uploads, tmp_path / "results", retention_days=30)
+    deadline = time.time() + 5
+    while stale.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    storage.stop()
+    assert not stale.exists()
+
+
+def test_forked_child_gets_its_own_eviction_thread(tmp_path):
+    storage = StorageManager(tmp_path / "uploads", tmp_path / "results")
+    pid = os.fork()
+    if pid == 0:
+        # The child must not deadlock on a lock copied while held
+        upload = storage.upload_dir / "child.jpg"
+        upload.write_bytes(b"\xff")
+        storage.record_upload(upload)
+        os._exit(0 if storage._thread.is_alive() else 1)
+    _, status = os.waitpid(pid, 0)
+    storage.stop()
+    assert os.WEXITSTATUS(status) == 0
@@ -0,0 +1,126 @@
+"""
+Watch-folder journal: graded files are skipped, failed files are retried
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from watch import FolderWatcher, GradingJournal, WatchGrader
+
+
+class FakePipeline:
+    """Grades every file except those named bad*"""
+
+    matcher = None
+
+    def __init__(self):
+        self.calls = []
+
+    def set_answer_key(self, answer_key, matcher=None):
+        pass
+
+    def full_pipeline(self, image_path, answer_key, matcher=None):
+        self.calls.append(Path(image_path).name)
+        if Path(image_path).name.startswith("bad"):
+            return {"error": "No text extracted", "success": False}
+        return {"success": True, "summary": {"percentage": 100.0}}
+
+
+def _grader(folder: Path, retry_after_sec: float = 0, **kwargs) -> WatchGrader:
+    watcher = FolderWatcher(str(folder), settle_sec=0, use_inotify=False)
+    journal = GradingJournal(folder / ".journal.jsonl", retry_after_sec=retry_after_sec)
+    return WatchGrader(watcher, FakePipeline(), ["photosynthesis"], journal=journal, **kwargs)
+
+
+def test_results_keep_the_image_extension(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"jpg")
+    (tmp_path / "a.png").write_bytes(b"png")
+    grader = _grader(tmp_path)
+
+    grader.handle(tmp_path / "a.jpg")
+    grader.handle(tmp_path / "a.png")
+
+    assert (tmp_path / "a.jpg.result.json").exists()
+    assert (tmp_path / "a.png.result.json").exists()
+
+
+def test_graded_file_is_skipped_after_restart(tmp_path):
+    sheet = tmp_path / "sheet.jpg"
+    sheet.write_bytes(b"jpg")
+    _grader(tmp_path).handle(sheet)
+
+    grader = _grader(tmp_path)
+    assert grader.handle(sheet) is None
+    assert grader.skipped == 1 and grader.pipeline.calls == []
+
+    # Replaced under the same name: graded again
+    sheet.write_bytes(b"new scan")
+    assert grader.handle(sheet)["status"] == "graded"
+
+
+def test_failed_file_is_retried_up_to_max_attempts(tmp_path):
+    sheet = tmp_path / "bad.jpg"
+    sheet.write_bytes(b"jpg")
+    grader = _grader(tmp_path)
+
+    for _ in range(5):
+        grader.handle(sheet)
+
+    assert grader.pipeline.calls == ["bad.jpg"] * grader.journal.max_attempts
+    assert grader.journal.entries["bad.jpg"]["attempts"] == grader.journal.max_attempts
+
+    # A changed file starts over
+    sheet.write_bytes(b"rescanned")
+    entry = grader.handle(sheet)
+    assert entry["status"] == "failed" and entry["attempts"] == 1
+
+
+def test_failed_file_waits_before_retry(tmp_path):
+    sheet = tmp_path / "bad.jpg"
+    sheet.write_bytes(b"jpg")
+    grader = _grader(tmp_path, retry_after_sec=60)
+
+    grader.handle(sheet)
+    assert grader.journal.is_done(sheet, sheet.stat())
+
+    entry = dict(grader.journal.entries["bad.jpg"], handled_at="2000-01-01T00:00:00")
+    grader.journal.entries["bad.jpg"] = entry
+    assert not grader.journal.is_done(sheet, sheet.stat())
+
+
+def test_result_write_error_is_journalled_as_failed(tmp_path):
+    sheet = tmp_path / "sheet.jpg"
+    sheet.write_bytes(b"jpg")
+    blocker = tmp_path / "results"
+    blocker.write_text("not a folder")  # mkdir of the results folder fails
+    grader = _grader(tmp_path, results_dir=str(blocker))
+
+    entry = grader.handle(sheet)
+
+    assert entry["status"] == "failed" and entry["attempts"] == 1
+    assert entry["error"].startswith("Could not store result")
+    assert grader.failed == 1 and grader.graded == 0
+
+
+def test_callback_error_does_not_stop_the_session(tmp_path):
+    for name in ("a.jpg", "b.jpg"):
+        (tmp_path / name).write_bytes(name.encode())
+        time.sleep(0.01)  # Distinct mtimes keep the grading order stable
+
+    def on_result(path, results):
+        if path.name == "a.jpg":
+            raise RuntimeError("display unplugged")
+
+    grader = _grader(tmp_path, on_result=on_result)
+    stats = grader.run(max_sheets=2, idle_exit_sec=2)
+
+    assert stats["graded"] == 1 and stats["failed"] == 1
+    journal = [json.loads(line) for line in open(tmp_path / ".journal.jsonl")]
+    assert {e["file"]: e["status"] for e in journal} == {"a.jpg": "failed", "b.jpg": "graded"}
+    assert "display unplugged" in journal[0]["error"]
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
@@ -0,0 +1,167 @@
+"""
+Derived image cache for the web UI
+Generates downscaled thumbnails and previews once and keeps them on disk
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import cv2
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.processing.image_loader import ImageLoader
+from storage import original_name
+
+
+# Allowed output sizes (longest side, pixels); requests snap to these
+THUMBNAIL_SIZES = (128, 256, 512, 1024)
+NAMED_SIZES = {"thumb": 256, "preview": 1024}
+
+
+class ThumbnailCache:
+    """
+    Generates and caches downscaled JPEG copies of uploads
+    Source files are looked up through a resolver so compacted originals work
+    """
+
+    def __init__(self, cache_dir: Path, resolve_source: Callable[[str], Optional[Path]],
+                 quality: int = 80):
+        """
+        Initialize thumbnail cache
+
+        Args:
+            cache_dir: Folder for derived images
+            resolve_source: Maps an upload filename to its current path
+            quality: JPEG quality for derived images
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.resolve_source = resolve_source
+        self.quality = quality
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def snap_size(size) -> int:
+        """
+        Map a requested size (pixels or name) onto an allowed size
+
+        Args:
+            size: Integer longest side, or 'thumb' / 'preview'
+
+        Returns:
+            int: Allowed size
+        """
+        if isinstance(size, str):
+            if size in NAMED_SIZES:
+                return NAMED_SIZES[size]
+            size = int(size)
+        for allowed in THUMBNAIL_SIZES:
+            if size <= allowed:
+                return allowed
+        return THUMBNAIL_SIZES[-1]
+
+    def _cache_path(self, filename: str, size: int) -> Path:
+        """Path of a derived image (shared by original and compacted names)"""
+        # Full upload name: a.jpg and a.png must not share thumbnails
+        return self.cache_dir / f"{original_name(filename)}_{size}.jpg"
+
+    def get(self, filename: str, size=256) -> Optional[Path]:
+        """
+        Return path of a derived image, generating it if missing or stale
+
+        Args:
+            filename: Upload filename
+            size: Requested longest side (snapped to THUMBNAIL_SIZES)
+
+        Returns:
+            Path or None if the source image does not exist
+        """
+        size = self.snap_size(size)
+        source = self.resolve_source(filename)
+        if source is None:
+            return None
+
+        path = self._cache_path(filename, size)
+        if path.exists() and path.stat().st_mtime >= source.stat().st_mtime:
+            return path
+
+        generated = self.generate(filename, sizes=(size,))
+        return generated.get(size)
+
+    def generate(self, filename: str, sizes=tuple(NAMED_SIZES.values())) -> Dict[int, Path]:
+        """
+        Decode the source once and write every requested size
+
+        Args:
+            filename: Upload filename
+            sizes: Sizes to generate
+
+        Returns:
+            Dict mapping size to derived image path
+        """
+        source = self.resolve_source(filename)
+        if source is None:
+            return {}
+
+        sizes = sorted({self.snap_size(s) for s in sizes}, reverse=True)
+        # JPEG sources are decoded directly at (about) the largest size
+        image = ImageLoader((sizes[0], sizes[0]), grayscale=False).load(source)
+        if image is None:
+            return {}
+
+        generated = {}
+        # Largest first, so each step downsamples the previous result
+        for size in sizes:
+            height, width = image.shape[:2]
+            scale = size / max(width, height)
+            if scale < 1:
+                image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                   interpolation=cv2.INTER_AREA)
+
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                continue
+
+            path = self._cache_path(filename, size)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(encoded.tobytes())
+            os.replace(tmp_path, path)
+            generated[size] = path
+
+        return generated
+
+    def schedule(self, filename: str):
+        """Generate default sizes in the background (e.g. right after upload)"""
+        self._get_executor().submit(self._generate_quietly, filename)
+
+    def _generate_quietly(self, filename: str):
+        """Background task wrapper that logs instead of raising"""
+        try:
+            self.generate(filename)
+        except Exception as e:
+            print(f"⚠️  Thumbnail generation failed for {filename}: {e}")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Single background worker, recreated after fork"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1,
+                                                    thread_name_prefix="thumbnails")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def invalidate(self, filename: str):
+        """Remove all derived images of an upload (original or compacted name)"""
+        for size in THUMBNAIL_SIZES:
+            try:
+                self._cache_path(filename, size).unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,469 @@
+"""
+Watch-folder ingestion for Raspberry Pi
+Grades every image that lands in a folder (scanner output, phone sync)
+with one warm pipeline, and keeps a journal so restarts never regrade
+or skip a file
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+# Partial downloads / sync temp files are never graded
+TEMP_SUFFIXES = ('.tmp', '.part', '.crdownload', '.partial')
+JOURNAL_NAME = ".grading_journal.jsonl"
+RESULT_SUFFIX = ".result.json"
+# Failed files are retried (unchanged file: up to MAX_ATTEMPTS, RETRY_AFTER_SEC apart)
+MAX_ATTEMPTS = 3
+RETRY_AFTER_SEC = 60
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Minimal inotify binding through libc (Linux only)"""
+
+    def __init__(self, folder: Path, mask: int):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(folder)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def read(self, timeout: float) -> List[tuple]:
+        """Wait up to `timeout` seconds and return (mask, name) events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events, offset = [], 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Reports image files in a folder once they are completely written
+
+    New files are seen through inotify where available and by rescanning
+    the folder otherwise (or for network shares, where inotify misses
+    remote writes). A file is ready once its size and mtime have not
+    changed for `settle_sec`, so slow scanners and sync clients that write
+    in chunks are never read half-written.
+    """
+
+    def __init__(self, folder: str, settle_sec: float = 1.0, poll_interval: float = 1.0,
+                 use_inotify: bool = True, rescan_sec: float = 60,
+                 known: Optional[Callable[[Path, os.stat_result], bool]] = None):
+        """
+        Initialize watcher
+
+        Args:
+            folder: Folder to watch (not recursive)
+            settle_sec: Time a file must stay unchanged before it is ready
+            poll_interval: Rescan interval without inotify
+            use_inotify: Use inotify when available
+            rescan_sec: Safety rescan interval with inotify
+            known: Files for which this returns True are skipped by scans
+        """
+        self.folder = Path(folder)
+        self.settle_sec = settle_sec
+        self.poll_interval = poll_interval
+        self.rescan_sec = rescan_sec
+        self.known = known
+        self._pending: Dict[Path, tuple] = {}  # path -> (size, mtime_ns, unchanged since)
+        self._inotify = None
+        self._last_scan = 0.0
+
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(self.folder, IN_CLOSE_WRITE | IN_MOVED_TO |
+                                         IN_CREATE | IN_MODIFY)
+            except (OSError, AttributeError) as e:
+                print(f"⚠️  inotify unavailable ({e}), polling every {poll_interval}s")
+
+    @property
+    def mode(self) -> str:
+        """'inotify' or 'polling'"""
+        return "inotify" if self._inotify is not None else "polling"
+
+    @staticmethod
+    def is_candidate(path: Path) -> bool:
+        """Image file that isn't hidden or a temporary download"""
+        name = path.name.lower()
+        return not name.startswith('.') and not name.endswith(TEMP_SUFFIXES) and \
+            path.suffix.lower() in IMAGE_EXTENSIONS
+
+    def scan(self):
+        """Queue every image currently in the folder"""
+        self._last_scan = time.monotonic()
+        try:
+            entries = list(os.scandir(self.folder))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            path = Path(entry.path)
+            if not entry.is_file() or not self.is_candidate(path) or path in self._pending:
+                continue
+            try:
+                if self.known is not None and self.known(path, entry.stat()):
+                    continue
+            except FileNotFoundError:
+                continue
+            self._pending[path] = (-1, -1, time.monotonic())
+
+    def forget(self, path: Path):
+        """Stop tracking a file (e.g. after it was handled)"""
+        self._pending.pop(path, None)
+
+    def wait(self, timeout: float = 1.0) -> List[Path]:
+        """
+        Wait for file activity and return files that became ready
+
+        Args:
+            timeout: Max seconds to wait for new events
+
+        Returns:
+            list: Ready files, oldest first
+        """
+        # Don't sleep past the moment a pending file settles
+        if self._pending:
+            timeout = min(timeout, self.settle_sec / 2)
+
+        if self._inotify is not None:
+            for mask, name in self._inotify.read(timeout):
+                if mask & IN_Q_OVERFLOW:
+                    self.scan()  # Events were dropped; fall back to a full listing
+                    continue
+                path = self.folder / name
+                if self.is_candidate(path):
+                    # Any write restarts the settle timer
+                    self._pending[path] = (-1, -1, time.monotonic())
+            if time.monotonic() - self._last_scan >= self.rescan_sec:
+                self.scan()
+        else:
+            time.sleep(timeout if self._pending else max(timeout, self.poll_interval))
+            self.scan()
+
+        return self._settled()
+
+    def _settled(self) -> List[Path]:
+        """Files whose size and mtime have been stable for settle_sec"""
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime, since) in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                self._pending.pop(path)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif stat.st_size > 0 and now - since >= self.settle_sec:
+                ready.append((stat.st_mtime_ns, path))
+        return [path for _, path in sorted(ready)]
+
+    def close(self):
+        """Release the inotify descriptor"""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+class GradingJournal:
+    """
+    Append-only JSONL record of handled files
+
+    A file counts as handled while its name, size and mtime match the
+    journal entry, so a replaced file with the same name is graded again.
+    A failed file is retried once it changes, or else every
+    `retry_after_sec` until it has failed `max_attempts` times.
+    Each entry is flushed and fsynced before the next file is started.
+    """
+
+    def __init__(self, path: str, max_attempts: int = MAX_ATTEMPTS,
+                 retry_after_sec: float = RETRY_AFTER_SEC):
+        """
+        Initialize journal and load previous entries
+
+        Args:
+            path: JSONL file
+            max_attempts: Failed grading attempts before an unchanged file is given up
+            retry_after_sec: Minimum time between attempts on an unchanged file
+        """
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.retry_after_sec = retry_after_sec
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["file"]] = entry
+                    except (ValueError, KeyError):
+                        continue  # Torn last line after a crash
+        except FileNotFoundError:
+            pass
+
+    def _same_version(self, entry: Optional[Dict], stat: os.stat_result) -> bool:
+        """Check whether a journal entry is for this size and mtime"""
+        return entry is not None and entry.get("size") == stat.st_size and \
+            entry.get("mtime_ns") == stat.st_mtime_ns
+
+    def attempts(self, path: Path, stat: os.stat_result) -> int:
+        """Failed attempts recorded for this version of the file"""
+        entry = self.entries.get(path.name)
+        if not self._same_version(entry, stat) or entry.get("status") != "failed":
+            return 0
+        return entry.get("attempts", 1)
+
+    def is_done(self, path: Path, stat: os.stat_result) -> bool:
+        """Check whether this version of the file needs no (further) grading"""
+        entry = self.entries.get(path.name)
+        if not self._same_version(entry, stat):
+            return False
+        if entry.get("status") != "failed":
+            return True
+        if self.attempts(path, stat) >= self.max_attempts:
+            return True
+        try:
+            last = datetime.fromisoformat(entry["handled_at"])
+        except (KeyError, ValueError):
+            return False
+        return (datetime.now() - last).total_seconds() < self.retry_after_sec
+
+    def record(self, path: Path, stat: os.stat_result, status: str, **fields) -> Dict:
+        """
+        Append an entry for a handled file
+
+        Args:
+            path: Image file
+            stat: Its stat at grading time
+            status: 'graded' or 'failed'
+            fields: Extra fields (result path, score, error)
+
+        Returns:
+            Dict: The entry
+        """
+        entry = {
+            "file": path.name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "status": status,
+            "handled_at": datetime.now().isoformat(),
+            **fields
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[path.name] = entry
+        return entry
+
+
+class WatchGrader:
+    """
+    Grades files from a FolderWatcher with one warm pipeline
+    Results go next to each image (<name>.<ext>.result.json) or into results_dir
+    """
+
+    def __init__(self, watcher: FolderWatcher, pipeline, answer_key: List[str],
+                 journal: Optional[GradingJournal] = None,
+                 results_dir: Optional[str] = None,
+                 on_result: Optional[Callable[[Path, Dict], None]] = None):
+        """
+        Initialize watch grader
+
+        Args:
+            watcher: Folder watcher
+            pipeline: RPiPipeline (loaded once for the whole session)
+            answer_key: List of correct answers
+            journal: Grading journal (<folder>/.grading_journal.jsonl if omitted)
+            results_dir: Optional folder for result files
+            on_result: Callback(path, results) when a file is handled
+        """
+        self.watcher = watcher
+        self.pipeline = pipeline
+        self.answer_key = answer_key
+        self.journal = journal or GradingJournal(watcher.folder / JOURNAL_NAME)
+        self.results_dir = Path(results_dir) if results_dir else None
+        self.on_result = on_result
+        self.pipeline.set_answer_key(answer_key)
+        if self.watcher.known is None:
+            self.watcher.known = self.journal.is_done
+
+        self.graded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.grade_seconds = 0.0
+        self.started = None
+
+    def result_path(self, path: Path) -> Path:
+        """Where the result of an image is written (full name: a.jpg and a.png differ)"""
+        folder = self.results_dir if self.results_dir is not None else path.parent
+        return folder / f"{path.name}{RESULT_SUFFIX}"
+
+    def handle(self, path: Path) -> Optional[Dict]:
+        """
+        Grade one settled file unless the journal already has it
+
+        Args:
+            path: Image file
+
+        Returns:
+            Journal entry, or None if skipped
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if self.journal.is_done(path, stat):
+            self.skipped += 1
+            return None
+
+        start = time.perf_counter()
+        try:
+            # Reuse the matcher compiled once for this session
+            results = self.pipeline.full_pipeline(str(path), self.answer_key,
+                                                  matcher=self.pipeline.matcher)
+        except Exception as e:
+            results = {"error": f"Grading error: {e}", "success": False}
+        elapsed = time.perf_counter() - start
+        self.grade_seconds += elapsed
+
+        if not results.get("success"):
+            entry = self._record_failure(path, stat, results.get("error", "unknown error"))
+            if self.on_result:
+                try:
+                    self.on_result(path, results)
+                except Exception as e:
+                    print(f"⚠️  Result callback failed for {path.name}: {e}")
+            return entry
+
+        # A full SD card or a failing callback must not end the session:
+        # the file is journalled as failed and retried like a grading error
+        try:
+            result_path = self.write_result(path, results)
+            if self.on_result:
+                self.on_result(path, results)
+        except Exception as e:
+            return self._record_failure(path, stat, f"Could not store result: {e}")
+
+        self.graded += 1
+        return self.journal.record(path, stat, "graded", result=str(result_path),
+                                   percentage=results["summary"]["percentage"],
+                                   seconds=round(elapsed, 3))
+
+    def write_result(self, path: Path, results: Dict) -> Path:
+        """Write the result file atomically and return its path"""
+        result_path = self.result_path(path)
+        result_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = result_path.with_name(result_path.name + ".tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(results, f, indent=2)
+            os.replace(tmp_path, result_path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return result_path
+
+    def _record_failure(self, path: Path, stat: os.stat_result, error: str) -> Dict:
+        """Journal a failed attempt (the journal decides when to retry)"""
+        self.failed += 1
+        attempts = self.journal.attempts(path, stat) + 1
+        entry = self.journal.record(path, stat, "failed", attempts=attempts, error=error)
+        if attempts >= self.journal.max_attempts:
+            print(f"❌ {path.name}: giving up after {attempts} attempts "
+                  f"({error}); replace the file to retry")
+        else:
+            print(f"❌ {path.name}: {error} (attempt {attempts}, will retry)")
+        return entry
+
+    def run(self, max_sheets: Optional[int] = None,
+            idle_exit_sec: Optional[float] = None) -> Dict:
+        """
+        Grade existing and incoming files until stopped
+
+        Args:
+            max_sheets: Stop after grading this many files
+            idle_exit_sec: Stop after this long without new files
+
+        Returns:
+            Dict with throughput statistics
+        """
+        self.started = time.time()
+        last_activity = time.monotonic()
+        print(f"👀 Watching {self.watcher.folder} ({self.watcher.mode}, "
+              f"{len(self.journal.entries)} files in journal, Ctrl+C to stop)")
+
+        # Files that arrived while we were down are not lost
+        self.watcher.scan()
+        try:
+            while max_sheets is None or self.graded + self.failed < max_sheets:
+                ready = self.watcher.wait(timeout=1.0)
+                for path in ready:
+                    self.watcher.forget(path)
+                    try:
+                        entry = self.handle(path)
+                    except OSError as e:
+                        # Journal not writable (e.g. disk full): the next scan retries
+                        print(f"⚠️  Could not journal {path.name}: {e}")
+                        entry = None
+                    if entry is not None:
+                        last_activity = time.monotonic()
+                    if max_sheets is not None and self.graded + self.failed >= max_sheets:
+                        break
+                if idle_exit_sec is not None and not ready and \
+                        time.monotonic() - last_activity >= idle_exit_sec:
+                    break
+        except KeyboardInterrupt:
+            print("\n⏹️  Stopping watch mode")
+        finally:
+            self.watcher.close()
+
+        return self.stats()
+
+    def stats(self) -> Dict:
+        """Throughput statistics"""
+        elapsed = time.time() - self.started if self.started else 0.0
+        handled = self.graded + self.failed
+        return {
+            "graded": self.graded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_sec": round(elapsed, 2),
+            "sheets_per_minute": round(self.graded / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "mean_grade_sec": round(self.grade_seconds / handled, 3) if handled else 0.0
+        }
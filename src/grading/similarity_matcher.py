@@ -21,12 +21,21 @@ class SimilarityMatcher:
     }
     
     def __init__(self, answer_key: List[str], similarity_threshold: float = 0.70):
-        """Initialize matcher with answer key"""
+        """
+        Initialize matcher with answer key
+        
+        Raises:
+            ValueError: If no answer has a meaningful word to match against
+        """
         self.answer_key = answer_key
         self.similarity_threshold = similarity_threshold
         
         # Filter answer key to keep only meaningful words
         filtered_answers = [self._filter_meaningful_words(answer) for answer in answer_key]
+        if not any(filtered_answers):
+            # TfidfVectorizer would fail with an opaque "empty vocabulary"
+            raise ValueError("answer key has nothing to grade against: every answer is only "
+                             "stop words or single letters")
         
         self.vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(2, 3), lowercase=True, max_features=500)
         self.answer_vectors = self.vectorizer.fit_transform(filtered_answers)
@@ -53,6 +62,27 @@ class SimilarityMatcher:
         except:
             return 0.0
     
+    def score_all(self, student_answers: List[str]) -> np.ndarray:
+        """Score each student answer against the key answer at the same position"""
+        count = min(len(student_answers), self.answer_vectors.shape[0])
+        if count == 0:
+            return np.zeros(0)
+        
+        return self.score_pairs(student_answers[:count], np.arange(count))
+    
+    def score_pairs(self, student_answers: List[str], question_indices) -> np.ndarray:
+        """Score answers from many sheets at once, each against the key answer at its question index"""
+        if len(student_answers) == 0:
+            return np.zeros(0)
+        
+        filtered = [self._filter_meaningful_words(answer) for answer in student_answers]
+        student_vectors = self.vectorizer.transform(filtered)
+        key_vectors = self.answer_vectors[np.asarray(question_indices, dtype=np.intp)]
+        
+        # TF-IDF rows are L2-normalized, so the row-wise dot product is the cosine
+        scores = student_vectors.multiply(key_vectors).sum(axis=1)
+        return np.clip(np.asarray(scores).ravel(), 0.0, 1.0)
+    
     def is_correct(self, student_answer: str) -> bool:
         """Check if answer meets threshold"""
         return self.match(student_answer) >= self.similarity_threshold
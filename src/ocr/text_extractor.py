@@ -1,34 +1,211 @@
 """Text extraction using TrOCR for handwritten text recognition"""
+import threading
 import numpy as np
-from typing import List
+from typing import Dict, List, Optional
 import cv2
+import torch
 from PIL import Image
 from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 
+from src.profiling.tracer import span
+
+
+WEIGHT_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
 
 class TextExtractor:
     """Extract handwritten text using TrOCR"""
     
-    def __init__(self, languages: List[str] = ['en'], gpu: bool = False):
-        """Initialize TrOCR"""
-        self.processor = TrOCRProcessor.from_pretrained("microsoft/trocr-base-handwritten")
-        self.model = VisionEncoderDecoderModel.from_pretrained("microsoft/trocr-base-handwritten")
+    def __init__(self, languages: List[str] = ['en'], gpu: bool = False,
+                 model_name: str = "microsoft/trocr-base-handwritten",
+                 low_memory: bool = False, weight_dtype: Optional[str] = None,
+                 memory_budget_mb: Optional[float] = None, max_batch_size: int = 8):
+        """
+        Initialize TrOCR
+        
+        Args:
+            languages: Unused (kept for compatibility)
+            gpu: Run on CUDA
+            model_name: Hugging Face model id or local directory
+            low_memory: Load weights memory-mapped from safetensors straight into
+                        an uninitialized model (no second copy of the weights)
+            weight_dtype: Keep weights as 'fp16' or 'bf16'; on CPU each layer is
+                          upcast to float32 only while it runs
+            memory_budget_mb: Activation memory allowed per batch (default: half
+                              of available memory in low-memory mode)
+            max_batch_size: Upper bound for crops per TrOCR batch
+        """
+        if weight_dtype is not None and weight_dtype not in WEIGHT_DTYPES:
+            raise ValueError(f"weight_dtype must be one of {sorted(WEIGHT_DTYPES)}")
+        
+        self.model_name = model_name
+        self.low_memory = low_memory
+        self.weight_dtype = weight_dtype
+        self.memory_budget_mb = memory_budget_mb
+        self.max_batch_size = max_batch_size
         self.device = "cuda" if gpu else "cpu"
-        self.model.to(self.device)
+        
+        self.processor = TrOCRProcessor.from_pretrained(model_name)
+        self.model = self._load_model(model_name)
+        if self.device != "cpu":
+            self.model.to(self.device)
+        self.last_line_count = 0
+        # Decoding preset for model.generate (adjusted by the resource governor)
+        self.generate_kwargs = {"max_new_tokens": 100}
+        self._upcast_local = None
+        self.freeze()
+        if weight_dtype is not None and self.device == "cpu":
+            self._install_upcast_hooks()
+    
+    def _load_model(self, model_name: str) -> VisionEncoderDecoderModel:
+        """Load weights, trying the lowest-memory options first"""
+        if not self.low_memory and self.weight_dtype is None:
+            return VisionEncoderDecoderModel.from_pretrained(model_name)
+        
+        base = {"torch_dtype": WEIGHT_DTYPES[self.weight_dtype]} if self.weight_dtype else {}
+        attempts = [base]
+        if self.low_memory:
+            # use_safetensors needs a .safetensors checkpoint and
+            # low_cpu_mem_usage needs accelerate; fall back step by step
+            attempts = [dict(base, low_cpu_mem_usage=True, use_safetensors=True),
+                        dict(base, low_cpu_mem_usage=True),
+                        base]
+        
+        for index, kwargs in enumerate(attempts):
+            try:
+                return VisionEncoderDecoderModel.from_pretrained(model_name, **kwargs)
+            except (ImportError, OSError, TypeError, ValueError) as e:
+                if index == len(attempts) - 1:
+                    raise
+                print(f"⚠️  Low-memory load option unavailable ({e}), retrying")
+    
+    def _install_upcast_hooks(self):
+        """
+        Run low-precision weights in float32 one layer at a time
+        Each module's own parameters are upcast right before its forward and
+        restored right after, so only one layer is ever held in float32.
+        A per-module count keeps concurrent requests from restoring early.
+        Each thread also keeps a stack of the modules it upcast: a forward
+        that raises skips the restore hook, and _generate() unwinds the rest.
+        """
+        lock = threading.Lock()
+        self._upcast_lock = lock
+        self._upcast_local = threading.local()
+        
+        def upcast(module, args, kwargs):
+            with lock:
+                if module._upcast_users == 0:
+                    module._low_precision = [param.data for param in module.parameters(recurse=False)]
+                    for param in module.parameters(recurse=False):
+                        param.data = param.data.float()
+                module._upcast_users += 1
+            self._upcast_stack().append(module)
+            args = tuple(a.float() if torch.is_tensor(a) and a.is_floating_point() else a
+                         for a in args)
+            kwargs = {k: v.float() if torch.is_tensor(v) and v.is_floating_point() else v
+                      for k, v in kwargs.items()}
+            return args, kwargs
+        
+        def restore(module, args, output):
+            self._upcast_stack().pop()
+            self._restore_module(module)
+        
+        for module in self.model.modules():
+            if any(True for _ in module.parameters(recurse=False)):
+                module._upcast_users = 0
+                module.register_forward_pre_hook(upcast, with_kwargs=True)
+                module.register_forward_hook(restore)
+    
+    def _upcast_stack(self) -> List:
+        """Modules upcast by the calling thread whose forward hasn't returned"""
+        if not hasattr(self._upcast_local, "modules"):
+            self._upcast_local.modules = []
+        return self._upcast_local.modules
+    
+    def _restore_module(self, module):
+        """Drop one upcast user and put low-precision weights back after the last"""
+        with self._upcast_lock:
+            module._upcast_users -= 1
+            if module._upcast_users == 0:
+                for param, data in zip(module.parameters(recurse=False), module._low_precision):
+                    param.data = data
+                module._low_precision = None
+    
+    def _generate(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """model.generate that never leaves layers in float32 when a forward raises"""
+        try:
+            with torch.inference_mode():
+                return self.model.generate(pixel_values, **self.generate_kwargs)
+        finally:
+            if self._upcast_local is not None:
+                stack = self._upcast_stack()
+                while stack:
+                    self._restore_module(stack.pop())
+    
+    def batch_limit(self) -> int:
+        """
+        Crops per batch that fit the activation memory budget
+        
+        Returns:
+            int: Batch size between 1 and max_batch_size
+        """
+        budget_mb = self.memory_budget_mb
+        if budget_mb is None:
+            if not self.low_memory:
+                return self.max_batch_size
+            available = _available_memory_mb()
+            if available is None:
+                return self.max_batch_size
+            budget_mb = available / 2
+        
+        per_item_mb = self._activation_mb_per_item()
+        return int(max(1, min(self.max_batch_size, budget_mb // per_item_mb)))
+    
+    def _activation_mb_per_item(self) -> float:
+        """Rough peak activation size of one crop through the encoder (float32)"""
+        encoder = self.model.config.encoder
+        tokens = (encoder.image_size // encoder.patch_size) ** 2 + 1
+        hidden = encoder.hidden_size
+        # Attention scores of one layer plus hidden/MLP buffers; x2 for the
+        # cached encoder states and decoder steps
+        elements = tokens * (encoder.num_attention_heads * tokens
+                             + encoder.intermediate_size + 4 * hidden)
+        return max(1.0, 2 * elements * 4 / 1e6)
+    
+    def memory_info(self) -> Dict:
+        """Model memory configuration and parameter footprint"""
+        params = sum(p.numel() * p.element_size() for p in self.model.parameters())
+        return {
+            "model": self.model_name,
+            "low_memory": self.low_memory,
+            "weight_dtype": self.weight_dtype or "fp32",
+            "weights_mb": round(params / 1e6, 1),
+            "batch_limit": self.batch_limit()
+        }
+    
+    def freeze(self):
+        """Put the model in inference-only state (no dropout, no autograd)"""
+        self.model.eval()
+        for param in self.model.parameters():
+            param.requires_grad_(False)
     
     def extract_text(self, image: np.ndarray) -> List[str]:
         """Extract handwritten text lines from image"""
         try:
             # Detect text lines using horizontal line detection
-            lines = self._detect_text_lines(image)
+            with span("detect_text_lines") as info:
+                lines = self._detect_text_lines(image)
+                info["lines"] = len(lines)
+            self.last_line_count = len(lines)
             
             text_lines = []
-            for y_start, y_end in lines:
+            for index, (y_start, y_end) in enumerate(lines):
                 # Extract line region
                 line_image = image[y_start:y_end, :]
                 
                 # Recognize with TrOCR
-                text = self._recognize_line(line_image)
+                with span("recognize_line", line=index, height=y_end - y_start):
+                    text = self._recognize_line(line_image)
                 if text.strip():
                     text_lines.append(text)
             
@@ -41,16 +218,24 @@ class TextExtractor:
         """Detect horizontal text lines"""
         try:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+            height, width = gray.shape
             
-            # Binarize
-            _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
+            # Binarize (Otsu adapts to paper brightness and ink color)
+            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+            binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
             
-            # Use smaller morphological kernel for text line detection
-            kernel_height = max(3, gray.shape[0] // 30)  # Height of typical text
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, kernel_height))
+            # Drop blobs much taller than the typical character (a hand, a pen,
+            # the page border) so they cannot merge several lines into one
+            count, labels, boxes, _ = cv2.connectedComponentsWithStats(binary)
+            if count > 2:
+                tall = boxes[1:, cv2.CC_STAT_HEIGHT] > 4 * np.median(boxes[1:, cv2.CC_STAT_HEIGHT])
+                if tall.any():
+                    binary[np.isin(labels, np.flatnonzero(tall) + 1)] = 0
             
-            eroded = cv2.erode(binary, kernel, iterations=1)
-            dilated = cv2.dilate(eroded, kernel, iterations=2)
+            # Join the characters of a line with a wide, flat kernel; a flat
+            # kernel never bridges the gap to the next line
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, width // 25), 3))
+            dilated = cv2.dilate(binary, kernel, iterations=2)
             
             # Find contours
             contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -58,8 +243,8 @@ class TextExtractor:
             lines = []
             for contour in contours:
                 x, y, w, h = cv2.boundingRect(contour)
-                # More permissive line height detection
-                if h > 5:  # Very permissive
+                # Skip specks and short fragments
+                if h > max(5, height // 100) and w > width // 20:
                     lines.append((y, y + h))
             
             # Sort and merge overlapping lines
@@ -82,19 +267,55 @@ class TextExtractor:
             h = image.shape[0]
             return [(i*h//5, (i+1)*h//5) for i in range(5)]
     
+    def recognize_batch(self, line_images: List[np.ndarray], batch_size: int = 8) -> List[str]:
+        """Recognize several line crops, running TrOCR once per batch"""
+        batch_size = max(1, min(batch_size, self.batch_limit()))
+        texts = []
+        for start in range(0, len(line_images), batch_size):
+            chunk = [self._to_pil(image) for image in line_images[start:start + batch_size]]
+            try:
+                with span("trocr_preprocess", batch=len(chunk)):
+                    pixel_values = self.processor(images=chunk, return_tensors="pt").pixel_values.to(self.device)
+                with span("model.generate", batch=len(chunk)):
+                    generated_ids = self._generate(pixel_values)
+                texts.extend(self.processor.batch_decode(generated_ids, skip_special_tokens=True))
+            except Exception as e:
+                print(f"OCR error: {e}")
+                texts.extend([""] * len(chunk))
+        return texts
+    
+    @staticmethod
+    def _to_pil(line_image: np.ndarray) -> Image.Image:
+        """Convert a BGR or grayscale crop to an RGB PIL image"""
+        if len(line_image.shape) == 3 and line_image.shape[2] == 3:
+            line_image = cv2.cvtColor(line_image, cv2.COLOR_BGR2RGB)
+        return Image.fromarray(line_image).convert("RGB")
+    
     def _recognize_line(self, line_image: np.ndarray) -> str:
         """Recognize a single line using TrOCR"""
         try:
             # Convert to PIL Image
-            if len(line_image.shape) == 3 and line_image.shape[2] == 3:
-                line_image = cv2.cvtColor(line_image, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(line_image)
+            pil_image = self._to_pil(line_image)
             
             # TrOCR inference
-            pixel_values = self.processor(images=pil_image, return_tensors="pt").pixel_values.to(self.device)
-            generated_ids = self.model.generate(pixel_values, max_new_tokens=100)
+            with span("trocr_preprocess"):
+                pixel_values = self.processor(images=pil_image, return_tensors="pt").pixel_values.to(self.device)
+            with span("model.generate"):
+                generated_ids = self._generate(pixel_values)
             generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
             
             return generated_text
         except Exception as e:
             return ""
+
+
+def _available_memory_mb() -> Optional[float]:
+    """MemAvailable from /proc/meminfo in MB (None off Linux)"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
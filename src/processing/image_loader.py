@@ -0,0 +1,186 @@
+"""Image loading with decode-time downscaling (JPEG DCT scaling) and grayscale fast path"""
+import io
+import struct
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple, Union
+
+
+# JPEG start-of-frame markers carrying the image dimensions
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+_GRAY_FLAGS = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+               4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+_COLOR_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+ImageSource = Union[str, Path, bytes, bytearray, memoryview]
+
+
+def _jpeg_size(stream: BinaryIO) -> Optional[Tuple[int, int]]:
+    """Walk JPEG segments up to the SOF marker without decoding"""
+    if stream.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = stream.read(1)
+        while marker == b'\xff':  # Fill bytes
+            marker = stream.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue  # Markers without a length field
+        if code in (0xD9, 0xDA):
+            return None  # End of image / scan data before any SOF
+        length_bytes = stream.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if code in _SOF_MARKERS:
+            header = stream.read(5)
+            if len(header) < 5:
+                return None
+            _, height, width = struct.unpack('>BHH', header)
+            return width, height
+        stream.seek(length - 2, io.SEEK_CUR)
+
+
+def read_image_size(source: ImageSource) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from a JPEG or PNG header
+
+    Args:
+        source: File path or encoded bytes
+
+    Returns:
+        Tuple (width, height), or None for other formats or a corrupt header
+    """
+    try:
+        if isinstance(source, (str, Path)):
+            with open(source, 'rb') as f:
+                head = f.read(24)
+                if head.startswith(_PNG_SIGNATURE):
+                    size = struct.unpack('>II', head[16:24])
+                else:
+                    f.seek(0)
+                    size = _jpeg_size(f)
+        else:
+            data = memoryview(source)
+            if bytes(data[:8]) == _PNG_SIGNATURE:
+                size = struct.unpack('>II', bytes(data[16:24]))
+            else:
+                size = _jpeg_size(io.BytesIO(data))
+    except (OSError, struct.error):
+        return None
+    # A header claiming a 0-pixel side is corrupt; let the decoder decide
+    if size is None or min(size) <= 0:
+        return None
+    return size
+
+
+class ImageLoader:
+    """
+    Loads answer sheets at (about) the working resolution
+
+    For JPEGs, libjpeg scales the DCT by 1/2, 1/4 or 1/8 while decoding, so a
+    12 MP photo is never materialized at full size. The largest reduction that
+    still covers the working size is chosen from the header dimensions.
+    """
+
+    def __init__(self, working_size: Tuple[int, int] = (1280, 960), grayscale: bool = True):
+        """
+        Initialize loader
+
+        Args:
+            working_size: Target resolution (width, height); orientation-agnostic
+            grayscale: Decode straight to one channel
+        """
+        self.working_size = working_size
+        self.grayscale = grayscale
+
+    def reduction_for(self, width: int, height: int) -> int:
+        """
+        Largest decode reduction (1, 2, 4 or 8) that keeps the working size
+
+        Args:
+            width: Encoded image width
+            height: Encoded image height
+
+        Returns:
+            int: Reduction factor
+        """
+        if width <= 0 or height <= 0:
+            return 1
+        target_long, target_short = max(self.working_size), min(self.working_size)
+        scale = min(target_long / max(width, height), target_short / min(width, height))
+        for factor in (8, 4, 2):
+            if factor * scale <= 1.0:
+                return factor
+        return 1
+
+    def fit(self, image: np.ndarray) -> np.ndarray:
+        """
+        Downscale an image to fit inside the working size (never upscales)
+
+        Args:
+            image: Decoded image or camera frame
+
+        Returns:
+            np.ndarray: Resized image, or the same array if it already fits
+        """
+        height, width = image.shape[:2]
+        target_long, target_short = max(self.working_size), min(self.working_size)
+        scale = min(target_long / max(width, height), target_short / min(width, height))
+        if scale >= 1:
+            return image
+        return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def load(self, source: ImageSource, fit: bool = False) -> Optional[np.ndarray]:
+        """
+        Decode an image from a path or in-memory bytes
+
+        Args:
+            source: File path, or encoded bytes (no copy is made of the buffer)
+            fit: Also resize what remains to fit inside the working size
+
+        Returns:
+            np.ndarray (grayscale or BGR) or None if decoding failed
+        """
+        image, _ = self.load_with_info(source, fit=fit)
+        return image
+
+    def load_with_info(self, source: ImageSource, fit: bool = False):
+        """
+        Decode an image and report how it was decoded
+
+        Returns:
+            Tuple (image or None, info dict with original size and reduction)
+        """
+        size = read_image_size(source)
+        factor = self.reduction_for(*size) if size else 1
+        flag = (_GRAY_FLAGS if self.grayscale else _COLOR_FLAGS)[factor]
+
+        if isinstance(source, (str, Path)):
+            image = cv2.imread(str(source), flag)
+        else:
+            image = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), flag)
+
+        if image is not None and fit:
+            image = self.fit(image)
+
+        info = {
+            "original_size": list(size) if size else None,
+            "decoded_size": [image.shape[1], image.shape[0]] if image is not None else None,
+            "reduction": factor,
+            "grayscale": self.grayscale
+        }
+        return image, info
@@ -0,0 +1,157 @@
+"""Page localization: find the answer sheet quadrilateral and rectify it"""
+import time
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+class PageDetector:
+    """Detects the sheet on a downscaled frame and warps it to an upright page"""
+
+    def __init__(self, detect_width: int = 500, output_size: Tuple[int, int] = (1000, 1414),
+                 min_area_ratio: float = 0.2, max_saturation: int = 60,
+                 gray_margin: int = 45):
+        """
+        Initialize page detector
+
+        Args:
+            detect_width: Width of the downscaled copy used for detection
+            output_size: Canonical portrait page size (width, height)
+            min_area_ratio: Minimum page area as a fraction of the frame
+            max_saturation: Max HSV saturation counted as paper (0-255)
+            gray_margin: Gray levels below the paper white still counted as
+                         paper when the frame has no color
+        """
+        self.detect_width = detect_width
+        self.output_size = output_size
+        self.min_area_ratio = min_area_ratio
+        self.max_saturation = max_saturation
+        self.gray_margin = gray_margin
+
+    def detect(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Find the page corners
+
+        Args:
+            image: BGR or grayscale frame
+
+        Returns:
+            np.ndarray: 4×2 float32 corners (tl, tr, br, bl) in frame coordinates, or None
+        """
+        height, width = image.shape[:2]
+        scale = min(1.0, self.detect_width / width)
+        small = cv2.resize(image, (int(width * scale), int(height * scale)),
+                           interpolation=cv2.INTER_AREA) if scale < 1 else image
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        min_area = self.min_area_ratio * gray.shape[0] * gray.shape[1]
+        quad = None
+
+        # 1. Paper is bright and unsaturated; hands and tables are not
+        quad = self._find_quad(self._paper_mask(small), min_area)
+
+        # 2. Edge contours approximated by a convex quadrilateral
+        if quad is None:
+            edges = cv2.Canny(gray, 50, 150)
+            edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+            quad = self._find_quad(edges, min_area)
+
+        # 3. Fallback: paper is the brightest large region
+        if quad is None:
+            _, bright = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            quad = self._find_quad(bright, min_area, allow_rect=True)
+
+        if quad is None:
+            return None
+        return self.order_corners(quad / scale)
+
+    def _paper_mask(self, small: np.ndarray) -> np.ndarray:
+        """Binary mask of bright, low-saturation pixels"""
+        if small.ndim == 3:
+            hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+            saturation, value = hsv[:, :, 1], cv2.GaussianBlur(hsv[:, :, 2], (5, 5), 0)
+            threshold, _ = cv2.threshold(value, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            mask = ((saturation < self.max_saturation) & (value > threshold)).astype(np.uint8) * 255
+        else:
+            # Grayscale: no saturation cue, so keep only levels close to the paper white
+            value = cv2.GaussianBlur(small, (5, 5), 0)
+            threshold, _ = cv2.threshold(value, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            threshold = max(threshold, float(np.percentile(value, 95)) - self.gray_margin)
+            mask = (value > threshold).astype(np.uint8) * 255
+        # Close gaps left by handwriting so the sheet is one blob
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+    def _find_quad(self, mask: np.ndarray, min_area: float,
+                   allow_rect: bool = False) -> Optional[np.ndarray]:
+        """Largest 4-point contour in a mask"""
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+            if cv2.contourArea(contour) < min_area:
+                break
+            # Hull bridges notches where fingers or clips cover the edge
+            hull = cv2.convexHull(contour)
+            perimeter = cv2.arcLength(hull, True)
+            approx = cv2.approxPolyDP(hull, 0.02 * perimeter, True)
+            if len(approx) == 4 and cv2.isContourConvex(approx):
+                return approx.reshape(4, 2).astype(np.float32)
+            if allow_rect:
+                return cv2.boxPoints(cv2.minAreaRect(contour)).astype(np.float32)
+        return None
+
+    @staticmethod
+    def order_corners(points: np.ndarray) -> np.ndarray:
+        """Order 4 points as top-left, top-right, bottom-right, bottom-left"""
+        points = points.reshape(4, 2).astype(np.float32)
+        sums = points.sum(axis=1)
+        diffs = np.diff(points, axis=1).ravel()
+        return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                         points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+    def rectify(self, image: np.ndarray, corners: np.ndarray) -> np.ndarray:
+        """
+        Warp the page to the canonical working resolution
+
+        Args:
+            image: Full frame
+            corners: Ordered page corners
+
+        Returns:
+            np.ndarray: Upright page (landscape sheets keep landscape orientation)
+        """
+        tl, tr, br, bl = corners
+        page_width = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+        page_height = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+
+        out_w, out_h = self.output_size
+        if page_width > page_height:
+            out_w, out_h = out_h, out_w
+
+        target = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]],
+                          dtype=np.float32)
+        matrix = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(image, matrix, (out_w, out_h),
+                                   flags=cv2.INTER_AREA, borderMode=cv2.BORDER_REPLICATE)
+
+    def extract_page(self, image: np.ndarray) -> Tuple[Optional[np.ndarray], Dict]:
+        """
+        Detect and rectify the page
+
+        Args:
+            image: Full frame
+
+        Returns:
+            Tuple (page or None if not found, info dict with timing and corners)
+        """
+        start = time.perf_counter()
+        corners = self.detect(image)
+        page = self.rectify(image, corners) if corners is not None else None
+        info = {
+            "found": page is not None,
+            "page_detect_ms": round((time.perf_counter() - start) * 1000, 2),
+            "input_pixels": int(image.shape[0] * image.shape[1]),
+            "output_pixels": int(page.shape[0] * page.shape[1]) if page is not None else None,
+            "corners": corners.round(1).tolist() if corners is not None else None
+        }
+        return page, info
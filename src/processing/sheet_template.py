@@ -0,0 +1,178 @@
+"""Sheet templates: fixed answer boxes in normalized page coordinates"""
+import json
+import re
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+TEMPLATE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def _is_int(value) -> bool:
+    """Integer that isn't a bool"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class SheetTemplate:
+    """
+    Answer regions of a printed exam sheet
+
+    Boxes are [x, y, width, height] as fractions of the rectified page, so one
+    template works at any working resolution. Each region is bound to its
+    question number, so OCR results never depend on line order.
+    """
+
+    def __init__(self, template_id: str, regions: List[Dict], name: str = None,
+                 padding: float = 0.005):
+        """
+        Initialize template
+
+        Args:
+            template_id: Template id (letters, digits, '-' and '_')
+            regions: [{"question": 1, "box": [x, y, w, h], "lines": 1}, ...]
+            name: Human-readable name
+            padding: Extra margin around each box (fraction of page size, 0 <= padding < 0.5)
+
+        Raises:
+            ValueError: If the template is malformed
+        """
+        if not TEMPLATE_ID_PATTERN.match(str(template_id)):
+            raise ValueError("template_id may only contain letters, digits, '-' and '_'")
+        if not isinstance(regions, list) or not regions:
+            raise ValueError("regions must be a non-empty list")
+        # bool is an int subclass: true/false in the JSON must not pass as 1/0
+        if isinstance(padding, bool) or not isinstance(padding, (int, float)) or \
+                not 0 <= padding < 0.5:
+            raise ValueError("padding must be a number with 0 <= padding < 0.5")
+
+        seen = set()
+        for region in regions:
+            if not isinstance(region, dict):
+                raise ValueError("each region must be an object")
+            question = region.get("question")
+            box = region.get("box")
+            if not _is_int(question) or question < 1 or question in seen:
+                raise ValueError(f"invalid or duplicate question number: {question}")
+            if not isinstance(box, list) or len(box) != 4 or \
+                    not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in box):
+                raise ValueError(f"question {question}: box must be [x, y, w, h]")
+            x, y, w, h = box
+            if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > 1.0001 or y + h > 1.0001:
+                raise ValueError(f"question {question}: box must lie within 0-1")
+            lines = region.get("lines", 1)
+            if not _is_int(lines) or lines < 1:
+                raise ValueError(f"question {question}: lines must be an integer >= 1")
+            seen.add(question)
+
+        self.template_id = str(template_id)
+        self.name = name or self.template_id
+        self.padding = padding
+        self.regions = sorted(regions, key=lambda r: r["question"])
+
+    @property
+    def num_questions(self) -> int:
+        """Highest question number on the sheet"""
+        return self.regions[-1]["question"]
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SheetTemplate":
+        """Build a template from its JSON representation"""
+        if not isinstance(data, dict):
+            raise ValueError("template must be a JSON object")
+        return cls(data.get("template_id"), data.get("regions"),
+                   name=data.get("name"), padding=data.get("padding", 0.005))
+
+    @classmethod
+    def load(cls, path: str) -> "SheetTemplate":
+        """Load a template JSON file"""
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> Dict:
+        """JSON representation"""
+        return {
+            "template_id": self.template_id,
+            "name": self.name,
+            "padding": self.padding,
+            "regions": self.regions
+        }
+
+    def crop_regions(self, page: np.ndarray) -> List[Tuple[int, List[np.ndarray]]]:
+        """
+        Cut every answer box out of a rectified page
+
+        Args:
+            page: Rectified page image
+
+        Returns:
+            List of (question number, line crops); boxes with several
+            lines are split into equal bands for line-level OCR
+        """
+        height, width = page.shape[:2]
+        crops = []
+        for region in self.regions:
+            x, y, w, h = region["box"]
+            x0 = max(0, int((x - self.padding) * width))
+            y0 = max(0, int((y - self.padding) * height))
+            x1 = min(width, int(np.ceil((x + w + self.padding) * width)))
+            y1 = min(height, int(np.ceil((y + h + self.padding) * height)))
+            box = page[y0:y1, x0:x1]
+
+            lines = int(region.get("lines", 1))
+            bounds = np.linspace(0, box.shape[0], lines + 1).astype(int)
+            crops.append((region["question"],
+                          [box[bounds[i]:bounds[i + 1]] for i in range(lines)]))
+        return crops
+
+
+def is_blank(crop: np.ndarray, min_ink: float = 0.004) -> bool:
+    """
+    Check whether an answer box is empty (no OCR needed)
+
+    Args:
+        crop: Box image
+        min_ink: Minimum fraction of dark pixels counted as writing
+
+    Returns:
+        bool: True if the box has no handwriting
+    """
+    if crop.size == 0:
+        return True
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    ink = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                cv2.THRESH_BINARY_INV, 25, 15)
+    # Printed box borders and ruled lines are not writing
+    height, width = ink.shape
+    horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (max(1, width // 8), 1))
+    vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(1, height // 3)))
+    rules = cv2.morphologyEx(ink, cv2.MORPH_OPEN, horizontal) | \
+        cv2.morphologyEx(ink, cv2.MORPH_OPEN, vertical)
+    rules = cv2.dilate(rules, np.ones((3, 3), np.uint8))
+    ink = cv2.bitwise_and(ink, cv2.bitwise_not(rules))
+    return cv2.countNonZero(ink) < min_ink * ink.size
+
+
+def load_template(source: str, folder: Path = None) -> SheetTemplate:
+    """
+    Load a template from a file path or by id from a template folder
+
+    Args:
+        source: JSON path or template id
+        folder: Folder searched for <id>.json
+
+    Returns:
+        SheetTemplate
+
+    Raises:
+        FileNotFoundError: If neither a file nor a stored template matches
+    """
+    path = Path(source)
+    if path.is_file():
+        return SheetTemplate.load(str(path))
+    if folder is not None and TEMPLATE_ID_PATTERN.match(source):
+        stored = Path(folder) / f"{source}.json"
+        if stored.is_file():
+            return SheetTemplate.load(str(stored))
+    raise FileNotFoundError(f"Sheet template not found: {source}")
@@ -0,0 +1,215 @@
+"""Chrome trace-event recording for profiling single grading runs"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# Active tracer (None when tracing is disabled)
+_active_tracer = None
+
+
+class _NullSpan:
+    """No-op span used when tracing is disabled"""
+
+    def __enter__(self) -> Dict:
+        return {}
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+# Shared no-op context returned by span() when tracing is disabled
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects nested spans as Chrome trace events (viewable in Perfetto)"""
+
+    def __init__(self, torch_profiler: bool = False):
+        """
+        Initialize tracer
+
+        Args:
+            torch_profiler: Also record torch operator timings
+        """
+        self.torch_profiler = torch_profiler
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._profiler = None
+        self._anchor_ts = None
+
+    @staticmethod
+    def _now_us() -> float:
+        """Monotonic timestamp in microseconds"""
+        return time.perf_counter_ns() / 1000.0
+
+    def _register_thread(self, pid: int, tid: int):
+        """Emit thread-name metadata once per thread"""
+        if (pid, tid) in self._threads:
+            return
+        name = threading.current_thread().name
+        self._threads[(pid, tid)] = name
+        self.events.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": name}
+        })
+
+    def add_event(self, name: str, start_us: float, end_us: float,
+                  category: str = "pipeline", args: Optional[Dict] = None):
+        """
+        Record a completed span
+
+        Args:
+            name: Span name
+            start_us: Start timestamp (µs)
+            end_us: End timestamp (µs)
+            category: Event category
+            args: Extra attributes shown in the trace viewer
+        """
+        pid = os.getpid()
+        tid = threading.get_native_id()
+        event = {
+            "name": name, "cat": category, "ph": "X",
+            "ts": start_us, "dur": end_us - start_us,
+            "pid": pid, "tid": tid
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._register_thread(pid, tid)
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "pipeline", **args):
+        """Context manager recording one span"""
+        record = None
+        if self._profiler is not None:
+            import torch
+            record = torch.profiler.record_function(name)
+            record.__enter__()
+        start = self._now_us()
+        try:
+            yield args
+        finally:
+            end = self._now_us()
+            if record is not None:
+                record.__exit__(None, None, None)
+            self.add_event(name, start, end, category, args)
+
+    def start(self):
+        """Start optional torch profiler"""
+        if not self.torch_profiler:
+            return
+        try:
+            import torch
+            self._profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU])
+            self._profiler.__enter__()
+            # Anchor span used to align torch timestamps with ours
+            self._anchor_ts = self._now_us()
+            with torch.profiler.record_function("trace_anchor"):
+                pass
+        except Exception as e:
+            print(f"⚠️  Torch profiler unavailable: {e}")
+            self._profiler = None
+
+    def stop(self):
+        """Stop torch profiler and merge its events"""
+        if self._profiler is None:
+            return
+        profiler, self._profiler = self._profiler, None
+        try:
+            profiler.__exit__(None, None, None)
+            with tempfile.TemporaryDirectory() as tmp:
+                torch_trace = Path(tmp) / "torch_trace.json"
+                profiler.export_chrome_trace(str(torch_trace))
+                with open(torch_trace, 'r') as f:
+                    data = json.load(f)
+            self._merge_torch_events(data.get("traceEvents", []))
+        except Exception as e:
+            print(f"⚠️  Failed to collect torch profile: {e}")
+
+    def _merge_torch_events(self, torch_events: List[Dict]):
+        """Shift torch events onto our clock and append them"""
+        anchor = next((e for e in torch_events
+                       if e.get("name") == "trace_anchor" and "ts" in e), None)
+        offset = self._anchor_ts - float(anchor["ts"]) if anchor else 0.0
+
+        for event in torch_events:
+            if "ts" in event:
+                event["ts"] = float(event["ts"]) + offset
+            event.setdefault("cat", "torch")
+            self.events.append(event)
+
+    def to_dict(self) -> Dict:
+        """Return trace in Chrome trace-event format"""
+        with self._lock:
+            events = list(self.events)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, output_path: str):
+        """
+        Write trace JSON (open in https://ui.perfetto.dev)
+
+        Args:
+            output_path: Path to trace file
+        """
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        print(f"✓ Trace saved: {output_path} ({len(self.events)} events)")
+
+
+def span(name: str, category: str = "pipeline", **args):
+    """
+    Record a span if tracing is active, otherwise do nothing
+
+    Args:
+        name: Span name
+        category: Event category
+        **args: Extra attributes attached to the span
+
+    Returns:
+        Context manager
+    """
+    tracer = _active_tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, category, **args)
+
+
+def is_tracing() -> bool:
+    """Check whether a tracer is active"""
+    return _active_tracer is not None
+
+
+@contextmanager
+def tracing(output_path: Optional[str] = None, torch_profiler: bool = False):
+    """
+    Enable tracing for the enclosed block
+
+    Args:
+        output_path: Where to write trace JSON (None to keep in memory)
+        torch_profiler: Also capture torch operator timings
+
+    Yields:
+        Tracer: Active tracer
+    """
+    global _active_tracer
+    tracer = Tracer(torch_profiler=torch_profiler)
+    previous = _active_tracer
+    _active_tracer = tracer
+    tracer.start()
+    try:
+        yield tracer
+    finally:
+        tracer.stop()
+        _active_tracer = previous
+        if output_path:
+            tracer.save(output_path)